@@ -0,0 +1,58 @@
+""" Encoding speed of many small grids and points: one GeometryBuilder each against BulkGeometryBuilder.
+
+    Run from the repository root:
+
+        python benchmarks/bench_bulk.py [--count N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import klab.engine
+from klab.geometry import BulkGeometryBuilder, GeometryBuilder
+
+RESOLUTION = "100 m"
+
+
+def timed(function) -> tuple:
+    start = time.perf_counter()
+    ret = function()
+    return ret, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=10000)
+    args = parser.parse_args()
+
+    random.seed(1)
+    xs = [random.uniform(33.0, 36.0) for _ in range(args.count)]
+    ys = [random.uniform(-10.0, -7.0) for _ in range(args.count)]
+    x2s, y2s = [x + 0.01 for x in xs], [y + 0.01 for y in ys]
+
+    def grids():
+        return [GeometryBuilder().grid(x1, x2, y1, y2, resolution=RESOLUTION).years(2010).build().encode()
+                for x1, x2, y1, y2 in zip(xs, x2s, ys, y2s)]
+
+    def points():
+        return [GeometryBuilder().region(f"EPSG:4326 POINT({x} {y})").years(2010).build().encode()
+                for x, y in zip(xs, ys)]
+
+    bulk = BulkGeometryBuilder(resolution=RESOLUTION).years(2010)
+    print(f"{args.count} geometries   one by one       bulk")
+    for label, single, many in (("grids:", grids, lambda: bulk.boxes(xs, x2s, ys, y2s)),
+                                ("points:", points, lambda: bulk.points(xs, ys))):
+        expected, seconds = timed(single)
+        specs, bulkSeconds = timed(many)
+        assert specs == expected
+        print(f"{label:16} {seconds * 1000:9.1f} ms {bulkSeconds * 1000:9.1f} ms  ({seconds / bulkSeconds:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
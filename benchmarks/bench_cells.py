@@ -0,0 +1,68 @@
+""" Sampling an exported grid at many points: per-point arithmetic against Dimension.getOffsetAt().
+
+    Uses the space dimension of a 5000 x 4000 grid and a random raster with its shape, as
+    read from an exported GeoTIFF, and looks up the value under each of N random points.
+    Run from the repository root:
+
+        python benchmarks/bench_cells.py [--points N]
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import klab.engine
+import numpy
+from klab.geometry import KlabGeometry
+
+SPEC = "S2(5000,4000){bbox=[33.0 38.0 -11.0 -7.0],proj=EPSG:4326}"
+
+
+def perPoint(space, raster, xs, ys) -> list:
+    nx, ny = space.shape
+    x1, x2, y1, y2 = space.getParameters()["bbox"]
+    dx, dy = (x2 - x1) / nx, (y2 - y1) / ny
+    ret = []
+    for x, y in zip(xs, ys):
+        ix, iy = math.floor((x - x1) / dx), math.floor((y - y1) / dy)
+        ret.append(raster[ny - iy - 1, ix] if 0 <= ix < nx and 0 <= iy < ny else math.nan)
+    return ret
+
+
+def vectorized(space, raster, xs, ys):
+    offsets = space.getOffsetAt(xs, ys)
+    return numpy.where(offsets >= 0, raster.ravel()[offsets], numpy.nan)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, default=1000000)
+    args = parser.parse_args()
+
+    space = KlabGeometry.create(SPEC).dimensions[0]
+    nx, ny = space.shape
+    rng = numpy.random.default_rng(1)
+    raster = rng.random((ny, nx))
+    xs = rng.uniform(32.9, 38.1, args.points)
+    ys = rng.uniform(-11.1, -6.9, args.points)
+
+    start = time.perf_counter()
+    expected = perPoint(space, raster, xs.tolist(), ys.tolist())
+    loop = time.perf_counter() - start
+    fast = math.inf
+    for _ in range(3):
+        start = time.perf_counter()
+        values = vectorized(space, raster, xs, ys)
+        fast = min(fast, time.perf_counter() - start)
+    assert numpy.allclose(values, expected, equal_nan=True)
+    print(f"{args.points} points on {nx} x {ny} cells: {loop * 1000:8.1f} ms per point, "
+          f"{fast * 1000:8.1f} ms vectorized ({loop / fast:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+""" Decoding of the semantics of observation references into KimConceptType sets.
+
+    Compares the lookup tables and interned sets of klab.types with a linear scan of the
+    enum members, on 100k semantics lists drawn from a few dozen distinct combinations as
+    in a real catalog. Run from the repository root:
+
+        python benchmarks/bench_enums.py [--count N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from klab.types import KimConceptType
+
+
+def scan(value: str):
+    for kct in KimConceptType:
+        if kct.value.lower() == value.lower():
+            return kct
+
+
+def scanSet(values: list) -> set:
+    return {scan(v) for v in values if v}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=100000)
+    args = parser.parse_args()
+
+    random.seed(1)
+    names = [kct.value for kct in KimConceptType]
+    combinations = [random.sample(names, random.randint(1, 6)) for _ in range(50)]
+    lists = [list(random.choice(combinations)) for _ in range(args.count)]
+
+    for label, decode in (("linear scan", scanSet), ("lookup table", KimConceptType.fromListToSet)):
+        start = time.perf_counter()
+        sets = [decode(values) for values in lists]
+        seconds = time.perf_counter() - start
+        distinct = len({id(s) for s in sets})
+        print(f"{label:>12}: {seconds * 1000:8.1f} ms  {args.count / seconds:12,.0f} lists/s  {distinct} set objects")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+""" Parse and encode speed of geometry specs.
+
+    Builds specs shaped like those sent to the engine (time dimension, grid with bounding
+    box and projection) whose shape is a hex WKB polygon of growing size, then times
+    KlabGeometry.create on specs never seen before and on a spec that was parsed already,
+    then encode() of fresh geometries and of one already encoded. Run from the repository
+    root:
+
+        python benchmarks/bench_geometry.py [--sizes KB ...]
+"""
+
+import argparse
+import os
+import random
+import struct
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import klab.engine
+from klab.geometry import KlabGeometry
+
+
+def wkbPolygon(points: int) -> str:
+    coordinates = b"".join(struct.pack(">dd", random.uniform(33, 36), random.uniform(-10, -7))
+                           for _ in range(points))
+    return (struct.pack(">bIII", 0, 3, 1, points) + coordinates).hex().upper()
+
+
+def spec(shape: str, i: int) -> str:
+    return f"T1(1){{tend=1293840000000,tstart={1262304000000 + i}}}S2(520,297){{bbox=[33.796 35.946 -9.41 " \
+           f"-7.086],proj=EPSG:4326,sgrid=1 km,shape={shape}}}"
+
+
+def timed(call, count: int) -> float:
+    start = time.perf_counter()
+    for i in range(count):
+        call(i)
+    return (time.perf_counter() - start) / count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 500])
+    args = parser.parse_args()
+
+    random.seed(1)
+    print(f"{'spec KB':>8} {'parse ms':>10} {'cached ms':>10} {'encode ms':>10} {'cached ms':>10}")
+    for size in args.sizes:
+        shape = wkbPolygon(max(size * 1024 // 32, 4))
+        count = max(2000 // size, 5)
+        specs = [spec(shape, i) for i in range(count)]
+        parse = timed(lambda i: KlabGeometry.create(specs[i]), count)
+        cached = timed(lambda i: KlabGeometry.create(specs[0]), count)
+        geometries = [KlabGeometry.create(specs[0]) for _ in range(count)]
+        encode = timed(lambda i: geometries[i].encode(), count)
+        encoded = timed(lambda i: geometries[0].encode(), count)
+        print(f"{len(specs[0]) / 1024:8.0f} {parse * 1e3:10.3f} {cached * 1e3:10.3f} {encode * 1e3:10.3f} "
+              f"{encoded * 1e3:10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+""" Parsing of numeric array parameters, like time transitions and bounding boxes.
+
+    Compares the per-element conversion that NumberUtils used for every array (int, then
+    float, then bool, catching the failures) with podArrayFromString and
+    typedArrayFromString. Run from the repository root:
+
+        python benchmarks/bench_numbers.py [--length N]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import klab.engine
+from klab.utils import NumberUtils
+
+
+def perElement(array: str) -> list:
+    ret = []
+    for token in re.split(r"\s+", array[1:-1]):
+        try:
+            ret.append(int(token))
+        except ValueError:
+            try:
+                ret.append(float(token))
+            except ValueError:
+                ret.append(bool(token))
+    return ret
+
+
+def timed(function, array: str) -> float:
+    repeat = max(1, 200000 // len(array))
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(array)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--length", type=int, default=10000)
+    args = parser.parse_args()
+
+    random.seed(1)
+    arrays = {
+        "bbox": "[-7.256596802202454 -4.408874148363334 38.39721372248553 40.02677860935444]",
+        f"{args.length} transitions": "[" + " ".join(str(1262304000000 + i * 86400000) for i in range(args.length)) + "]",
+        f"{args.length} floats": "[" + " ".join(repr(random.uniform(-180, 180)) for _ in range(args.length)) + "]",
+    }
+    print(f"{'':20} {'per element':>12} {'pod':>12} {'typed':>12}   (us)")
+    for label, array in arrays.items():
+        times = [timed(perElement, array), timed(lambda a: NumberUtils.podArrayFromString(a, r"\s+", None), array),
+                 timed(NumberUtils.typedArrayFromString, array)]
+        print(f"{label:20} " + " ".join(f"{t:12,.1f}" for t in times))
+
+
+if __name__ == "__main__":
+    main()
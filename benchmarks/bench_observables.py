@@ -0,0 +1,57 @@
+""" Observables and ranges as keys: building, printing and deduplicating many observables, and
+    filtering values and ranges by a Range one at a time against all at once.
+
+    Run from the repository root:
+
+        python benchmarks/bench_observables.py [--count N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import klab.engine
+from klab.observable import Observable, Range
+
+SEMANTICS = ["geography:Elevation", "landcover:LandCoverType", "im:Net value of ecology:Pollination",
+             "es.nca:Condition of earth:Region", "hydrology:Precipitation"]
+
+
+def timed(label: str, function):
+    start = time.perf_counter()
+    ret = function()
+    print(f"{label:36} {(time.perf_counter() - start) * 1000:9.1f} ms")
+    return ret
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=200000)
+    args = parser.parse_args()
+
+    random.seed(1)
+    picks = [(random.choice(SEMANTICS), random.choice(["m", "mm", None]), f"o{random.randrange(50)}")
+             for _ in range(args.count)]
+    observables = timed(f"create {args.count} observables:",
+                        lambda: [Observable.create(s).unit(u).named(n) if u else Observable.create(s).named(n)
+                                 for s, u, n in picks])
+    timed("str() three times each:", lambda: [(str(o), str(o), str(o)) for o in observables])
+    unique = timed("deduplicate by string:", lambda: {str(o): o for o in observables})
+    assert len(timed("deduplicate as a set:", lambda: set(observables))) == len(unique)
+
+    bounds = Range(0, 1000, upperExclusive=True)
+    values = [random.uniform(-500, 1500) for _ in range(args.count)]
+    ranges = [Range(v, v + random.uniform(0, 500)) for v in values]
+    expected = timed("contains, one value at a time:", lambda: [bounds.contains(v) for v in values])
+    assert timed("contains, all values:", lambda: bounds.contains(values)).tolist() == expected
+    expected = timed("contains, one range at a time:", lambda: [bounds.contains(r) for r in ranges])
+    assert timed("contains, all ranges:", lambda: bounds.contains(ranges)).tolist() == expected
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+""" Memory and decode speed of ObservationReference.
+
+    Decodes synthetic engine responses shaped like the structure export of a state (with
+    data summary, scale reference, export formats and actions) and reports the memory
+    retained per reference, including the decoded dict, and the references decoded per
+    second, with and without reading every sub-object. Run from the repository root:
+
+        python benchmarks/bench_references.py [--count N]
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import klab.engine
+from klab.references import ObservationReference
+
+
+def response(i: int) -> bytes:
+    return json.dumps({
+        "id": f"o{i}", "rootContextId": "c1", "contextId": "c1", "parentId": "c1", "label": f"elevation_{i}",
+        "observable": "geography:Elevation in m", "exportLabel": "Elevation", "valueType": "NUMBER",
+        "observationType": "STATE", "shapeType": "POLYGON", "semantics": ["QUALITY", "OBSERVABLE"],
+        "geometryTypes": ["RASTER", "SCALAR"], "encodedShape": "POLYGON((33.7 -7.0, 35.9 -7.0, 35.9 -9.4, 33.7 -7.0))",
+        "spatialProjection": "EPSG:4326", "traits": [], "metadata": {"source": "stub"}, "taskId": f"t{i}",
+        "empty": False, "primary": True, "alive": True, "main": False, "dynamic": False, "timeEvents": [],
+        "childIds": {}, "childrenCount": 0, "roles": [], "contextTime": -1, "creationTime": 1700000000000 + i,
+        "valueCount": 1, "previouslyNotified": False, "contextualized": True, "lastUpdate": 0,
+        "dataSummary": {"nodataProportion": 0.1, "minValue": 0.0, "maxValue": 2900.0 + i, "mean": 1250.5,
+                        "categorized": False, "histogram": list(range(10)), "categories": []},
+        "exportFormats": [{"label": "GeoTIFF", "value": "tiff", "adapter": "raster", "extension": "tif"},
+                          {"label": "PNG", "value": "png", "adapter": "raster", "extension": "png"}],
+        "scaleReference": {"name": "ruaha", "east": 35.9, "west": 33.7, "north": -7.0, "south": -9.4,
+                           "spaceScale": 11, "timeScale": 0, "spaceResolution": 1000.0, "spaceUnit": "m",
+                           "spaceResolutionDescription": "1 km", "timeUnit": 4, "start": 0, "end": 0},
+        "actions": [{"actionLabel": "Export", "actionId": "export", "enabled": True, "separator": False,
+                     "submenu": []}]
+    }).encode("utf-8")
+
+
+def touch(reference: ObservationReference):
+    return (reference.shapeType, reference.valueType, reference.observationType, reference.semantics,
+            reference.geometryTypes, reference.dataSummary.mean, reference.scaleReference,
+            reference.exportFormats, reference.actions)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=20000)
+    args = parser.parse_args()
+
+    responses = [response(i) for i in range(args.count)]
+    dicts = [json.loads(r) for r in responses]
+
+    start = time.perf_counter()
+    references = [ObservationReference.fromDict(d) for d in dicts]
+    seconds = time.perf_counter() - start
+    print(f"fromDict:          {args.count / seconds:12,.0f} refs/s")
+
+    start = time.perf_counter()
+    for reference in references:
+        touch(reference)
+    seconds = time.perf_counter() - start
+    print(f"read sub-objects:  {args.count / seconds:12,.0f} refs/s")
+    del references, dicts
+
+    # retained memory: what is left after decoding the bytes and dropping everything
+    # except the references
+    for label, read in (("fromDict", False), ("with sub-objects", True)):
+        gc.collect()
+        tracemalloc.start()
+        references = []
+        for r in responses:
+            reference = ObservationReference.fromDict(json.loads(r))
+            if read:
+                touch(reference)
+            references.append(reference)
+        gc.collect()
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{label + ':':18} {size / args.count:12,.0f} bytes/ref")
+        del references
+
+
+if __name__ == "__main__":
+    main()
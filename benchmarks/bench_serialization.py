@@ -0,0 +1,76 @@
+""" Time to serialize context requests with large polygon geometries.
+
+    Compares each available JSON codec with the string-formatting encoder that
+    `ContextRequest.toJson` used before, on requests whose geometry is a polygon with
+    100k vertices. Run from the repository root:
+
+        python benchmarks/bench_serialization.py [--vertices N] [--repeat N]
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import klab.engine
+from klab.codec import availableCodecs
+from klab.geometry import GeometryBuilder
+from klab.observation import ContextRequest
+
+
+def polygon(vertices: int) -> str:
+    """A closed ring of `vertices` points on a circle around Ruaha."""
+    points = []
+    for i in range(vertices):
+        angle = 2 * math.pi * i / vertices
+        points.append(f"{34.8 + math.cos(angle):.6f} {-8.2 + math.sin(angle):.6f}")
+    points.append(points[0])
+    return "EPSG:4326 POLYGON((" + ", ".join(points) + "))"
+
+
+def legacyToJson(request: ContextRequest) -> str:
+    """The string-formatting encoder replaced by the codecs."""
+    es = str(request.estimate).lower()
+    obs = str([str(o) for o in request.observables]).replace("'", "\"")
+    scen = str([str(s) for s in request.scenarios]).replace("'", "\"")
+    urn = "null" if request.urn is None else request.urn
+    ret = """{{"geometry":"{0}","contextType":"{1}","observables":{2},"scenarios":{3},"estimate":{4},"estimatedCost":{5}, "urn": {6}}}"""
+    ret = ret.format(request.geometry, request.contextType, obs, scen, es, request.estimatedCost, urn)
+    return ret.encode('utf-8').decode('unicode-escape')
+
+
+def timed(function, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vertices", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    request = ContextRequest()
+    request.contextType = "earth:Region"
+    request.geometry = GeometryBuilder().grid(urn=polygon(args.vertices), resolution="1 km").years(2010).build().encode()
+    request.scenarios = ["im.scenarios:Drought"]
+    megabytes = len(request.geometry) / 1e6
+    print(f"{args.vertices} vertices, {megabytes:.1f} MB geometry, best of {args.repeat}")
+
+    seconds = timed(lambda: legacyToJson(request).encode("utf-8"), args.repeat)
+    print(f"{'legacy':>8}: {seconds * 1000:8.2f} ms  {megabytes / seconds:8.1f} MB/s")
+    for name, codec in availableCodecs().items():
+        seconds = timed(lambda: codec.dumpb(request.toDict()), args.repeat)
+        print(f"{name:>8}: {seconds * 1000:8.2f} ms  {megabytes / seconds:8.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
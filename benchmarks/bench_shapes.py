@@ -0,0 +1,84 @@
+""" Decoding and encoding speed of shapes with millions of vertices.
+
+    Builds a polygon with a large ring and many holes, then times hex WKB and WKT
+    decoding, encoding, bounds and digest with `klab.shapes`, against decoding WKB one
+    vertex at a time with `struct`. Run from the repository root:
+
+        python benchmarks/bench_shapes.py [--vertices N]
+"""
+
+import argparse
+import math
+import os
+import struct
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import klab.engine
+import numpy
+from klab.shapes import Shape
+
+HOLES = 1000
+
+
+def polygon(vertices: int) -> Shape:
+    rings = [vertices // 2] + [vertices // 2 // HOLES] * HOLES
+    blocks = []
+    for i, count in enumerate(rings):
+        angles = numpy.linspace(0, 2 * math.pi, count)
+        radius = 10.0 if i == 0 else 0.001
+        x, y = (0.0, 0.0) if i == 0 else (math.cos(i), math.sin(i))
+        ring = numpy.column_stack((x + radius * numpy.cos(angles), y + radius * numpy.sin(angles)))
+        ring[-1] = ring[0]
+        blocks.append(ring)
+    offsets = numpy.zeros(len(rings) + 1, dtype=numpy.int64)
+    numpy.cumsum(rings, out=offsets[1:])
+    return Shape("POLYGON", numpy.concatenate(blocks), offsets, numpy.array([0, len(rings)]), "EPSG:4326")
+
+
+def perVertex(hex: str) -> list:
+    """Reference decoder: one struct call per vertex."""
+    data = bytes.fromhex(hex)
+    rings, pos = [], 9
+    for _ in range(struct.unpack_from(">I", data, 5)[0]):
+        count = struct.unpack_from(">I", data, pos)[0]
+        pos += 4
+        ring = []
+        for _ in range(count):
+            ring.append(struct.unpack_from(">dd", data, pos))
+            pos += 16
+        rings.append(ring)
+    return rings
+
+
+def timed(label: str, function, size: float):
+    start = time.perf_counter()
+    ret = function()
+    seconds = time.perf_counter() - start
+    print(f"{label:24} {seconds * 1000:10,.1f} ms {size / seconds / 1e6:10,.1f} Mvertices/s")
+    return ret
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vertices", type=int, default=2000000)
+    args = parser.parse_args()
+
+    shape = polygon(args.vertices)
+    n = len(shape)
+    wkb = timed("encode hex WKB:", shape.toWkb, n)
+    wkt = timed("encode WKT:", shape.toWkt, n)
+    print(f"{'':24} WKB {len(wkb) / 1e6:,.1f} MB, WKT {len(wkt) / 1e6:,.1f} MB, {shape.ringCount():,} rings")
+    timed("decode WKB per vertex:", lambda: perVertex(wkb), n)
+    decoded = timed("decode hex WKB:", lambda: Shape.parse(wkb), n)
+    timed("decode WKT:", lambda: Shape.parse(wkt), n)
+    timed("bounds:", decoded.bounds, n)
+    timed("digest:", decoded.digest, n)
+    assert decoded == shape
+
+
+if __name__ == "__main__":
+    main()
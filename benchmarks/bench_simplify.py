@@ -0,0 +1,87 @@
+""" Payload size and submission latency of detailed boundaries with and without simplification.
+
+    Builds grid geometries over a synthetic coastline-like polygon with an increasing number
+    of vertices, then times building the geometry (with `GeometryBuilder.simplify()` for the
+    simplified one), serializing the context request and posting it to a local HTTP server
+    that reads the whole body, as the engine would. Run from the repository root:
+
+        python benchmarks/bench_simplify.py [--resolution "1 km"] [--repeat N]
+"""
+
+import argparse
+import http.server
+import math
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import klab.engine
+import numpy
+import requests
+from klab.codec import CODEC
+from klab.geometry import GeometryBuilder
+from klab.observation import ContextRequest
+
+
+class Sink(http.server.BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        pass
+
+
+def coastline(vertices: int) -> str:
+    """A region of about 2 x 2 degrees with a fractal-looking outline."""
+    angles = numpy.linspace(0, 2 * math.pi, vertices)
+    radius = 1.0 + sum(0.2 / k * numpy.sin(k * 7 * angles + k) for k in range(1, 40))
+    xs = (34.8 + radius * numpy.cos(angles)).tolist()
+    ys = (-8.2 + radius * numpy.sin(angles)).tolist()
+    xs[-1], ys[-1] = xs[0], ys[0]
+    return "EPSG:4326 POLYGON((" + ", ".join(f"{x!r} {y!r}" for x, y in zip(xs, ys)) + "))"
+
+
+def submit(session: requests.Session, url: str, wkt: str, resolution: str, simplify: bool) -> tuple:
+    start = time.perf_counter()
+    builder = GeometryBuilder().grid(urn=wkt, resolution=resolution).years(2010)
+    if simplify:
+        builder.simplify()
+    request = ContextRequest()
+    request.geometry = builder.build().encode()
+    request.contextType = "earth:Region"
+    payload = CODEC.dumpb(request.toDict())
+    session.post(url, data=payload, headers={"Content-Type": "application/json"}).raise_for_status()
+    return len(payload), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resolution", default="1 km")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Sink)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/context"
+    session = requests.Session()
+
+    print(f"{'vertices':>10} {'payload':>12} {'simplified':>12} {'submit ms':>10} {'simplified':>10}")
+    for vertices in (1000, 10000, 100000, 500000):
+        wkt = coastline(vertices)
+        size, seconds = min(submit(session, url, wkt, args.resolution, False) for _ in range(args.repeat))
+        small, fast = min(submit(session, url, wkt, args.resolution, True) for _ in range(args.repeat))
+        print(f"{vertices:10,} {size / 1e3:10,.1f}KB {small / 1e3:10,.1f}KB {seconds * 1e3:10,.1f} {fast * 1e3:10,.1f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
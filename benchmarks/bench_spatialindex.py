@@ -0,0 +1,73 @@
+""" Build and lookup speed of the context index.
+
+    Indexes synthetic contexts of random size and year over the globe, one by one and in
+    bulk, then times the search for the contexts covering random small requests against
+    a linear scan of all contexts, with each available R-tree backend. Run from the
+    repository root:
+
+        python benchmarks/bench_spatialindex.py [--count N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import klab.engine
+from klab.spatialindex import Extent, availableBackends, createIndex
+
+QUERIES = 2000
+YEAR_MS = 365 * 24 * 3600 * 1000
+
+
+def extents(count: int) -> list:
+    ret = []
+    for _ in range(count):
+        x, y = random.uniform(-180, 170), random.uniform(-80, 70)
+        size = random.uniform(0.5, 10)
+        year = random.randrange(2000, 2020)
+        ret.append(Extent(x, y, x + size, y + size, (year - 1970) * YEAR_MS, (year - 1969) * YEAR_MS))
+    return ret
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=100000)
+    args = parser.parse_args()
+
+    random.seed(1)
+    contexts = extents(args.count)
+    queries = [Extent(e.west, e.south, e.west + 0.1, e.south + 0.1, e.start, e.end).bounds
+               for e in extents(QUERIES)]
+
+    start = time.perf_counter()
+    found = sum(sum(1 for e in contexts if e.covers(Extent(q[0], q[1], q[3], q[4], q[2], q[5])))
+                for q in queries[:100])
+    seconds = (time.perf_counter() - start) / 100
+    print(f"{'linear scan:':16} {seconds * 1e6:12,.1f} us/query ({found / 100:.1f} found)")
+
+    for backend in availableBackends():
+        index = createIndex(backend)
+        start = time.perf_counter()
+        for i, extent in enumerate(contexts[:10000]):
+            index.insert(extent.bounds, i)
+        insert = (time.perf_counter() - start) / 10000
+
+        index = createIndex(backend)
+        start = time.perf_counter()
+        index.load((extent.bounds, i) for i, extent in enumerate(contexts))
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        found = sum(len(index.covering(q)) for q in queries)
+        seconds = (time.perf_counter() - start) / QUERIES
+        print(f"{backend + ':':16} {seconds * 1e6:12,.1f} us/query ({found / QUERIES:.1f} found), "
+              f"{insert * 1e6:,.0f} us/insert, bulk loaded in {build:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
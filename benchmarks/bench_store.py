@@ -0,0 +1,93 @@
+""" Write and lookup speed of ObservationStore.
+
+    Fills a store with synthetic references spread over contexts, observables, geometries
+    and years, in batches as a busy set of workers would record them, then times indexed
+    lookups by id, context, observable with geometry and period, and creation time. Run
+    from the repository root:
+
+        python benchmarks/bench_store.py [--count N] [--path FILE]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import klab.engine
+from klab.geometry import GeometryBuilder
+from klab.references import ObservationReference
+from klab.store import ObservationStore
+
+OBSERVABLES = [f"im:Observable{i}" for i in range(50)]
+BATCH = 1000
+LOOKUPS = 2000
+
+
+def geometries() -> list:
+    ret = []
+    for x in range(10):
+        for year in range(2000, 2010):
+            wkt = f"EPSG:4326 POLYGON(({x} 0, {x + 1} 0, {x + 1} 1, {x} 1, {x} 0))"
+            ret.append(GeometryBuilder().grid(urn=wkt, resolution="1 km").years(year).build())
+    return ret
+
+
+def reference(i: int, context: int) -> ObservationReference:
+    return ObservationReference.fromDict({
+        "id": f"o{i}", "contextId": f"c{context}", "rootContextId": f"c{context}", "label": f"obs{i}",
+        "observable": OBSERVABLES[i % len(OBSERVABLES)], "observationType": "STATE", "valueType": "NUMBER",
+        "semantics": ["QUALITY"], "geometryTypes": ["RASTER"], "creationTime": 1700000000000 + i,
+        "dataSummary": {"nodataProportion": 0.1, "minValue": 0.0, "maxValue": 100.0, "mean": 50.0}})
+
+
+def timed(label: str, lookup):
+    start = time.perf_counter()
+    found = sum(len(lookup()) for _ in range(LOOKUPS))
+    seconds = time.perf_counter() - start
+    print(f"{label:28} {seconds / LOOKUPS * 1e6:10,.1f} us/lookup ({found / LOOKUPS:,.1f} rows)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=1000000)
+    parser.add_argument("--path", default=None)
+    args = parser.parse_args()
+
+    directory = tempfile.TemporaryDirectory()
+    path = args.path or os.path.join(directory.name, "observations.db")
+    shapes = geometries()
+    store = ObservationStore(path)
+
+    start = time.perf_counter()
+    for first in range(0, args.count, BATCH):
+        # one context per batch, made in one of the geometries
+        context = first // BATCH
+        geometry = shapes[context % len(shapes)]
+        store.putAll([reference(i, context) for i in range(first, min(first + BATCH, args.count))], geometry)
+    seconds = time.perf_counter() - start
+    print(f"{'write:':28} {args.count / seconds:10,.0f} refs/s ({os.path.getsize(path) / 1e6:,.0f} MB)")
+
+    random.seed(1)
+    contexts = args.count // BATCH
+    timed("get by id:", lambda: [store.get(f"o{random.randrange(args.count)}")])
+    timed("ids by context:", lambda: store.ids(contextId=f"c{random.randrange(contexts)}"))
+    timed("find observable+geometry:", lambda: store.find(observable=random.choice(OBSERVABLES),
+                                                          geometry=random.choice(shapes), limit=10))
+
+    def byPeriod():
+        year = int(GeometryBuilder().startOfYear(random.randrange(2000, 2010)))
+        return store.ids(observable=random.choice(OBSERVABLES), start=year, end=year + 1, limit=100)
+
+    timed("ids observable+period:", byPeriod)
+    timed("ids created after:", lambda: store.ids(createdAfter=1700000000000 + args.count - 100))
+    store.close()
+    directory.cleanup()
+
+
+if __name__ == "__main__":
+    main()
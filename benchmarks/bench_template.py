@@ -0,0 +1,60 @@
+""" Geometries from a template: str.replace and KlabGeometry.create against GeometryTemplate.
+
+    Fills the grid template used by the connection tests with a different bounding box
+    each time, as a service building one context per request would. Run from the
+    repository root:
+
+        python benchmarks/bench_template.py [--count N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import klab.engine
+from klab.geometry import GeometryTemplate, KlabGeometry
+
+TEMPLATE = ("τ0(1){ttype=LOGICAL,period=[{TIME_PERIOD}],tscope=1.0,tunit=YEAR}"
+            "S2({GRID_RESOLUTION_XY}){bbox=[{BOUNDING_BOX}],shape={WKB_SHAPE},proj=EPSG:4326}")
+WKB = ("00000000030000000100000007C01D06C14FE6DEF24043B5F39D8BB550C0160A7B8B2DC6224044036D7B41B470C011A2AFE79D99"
+       "FB4043B5C0443B5A7CC014D2EFCFADC624404355FA189A597CC0199C599EE6C5B8404332D7E635CC84C01C3D49F12A6BC44043799"
+       "5016B4E6CC01D06C14FE6DEF24043B5F39D8BB550")
+PERIOD = "1640995200000 1672531200000"
+
+
+def box(i: int) -> str:
+    return f"{-7.25 + i * 1e-6} -4.4 38.39 40.02"
+
+
+def replaced(count: int) -> list:
+    return [KlabGeometry.create(TEMPLATE.replace("{BOUNDING_BOX}", box(i)).replace("{TIME_PERIOD}", PERIOD)
+                                .replace("{GRID_RESOLUTION_XY}", "520,297").replace("{WKB_SHAPE}", WKB))
+            for i in range(count)]
+
+
+def filled(count: int, parse: bool) -> list:
+    template = GeometryTemplate(TEMPLATE)
+    ret = [template.fill(TIME_PERIOD=PERIOD, GRID_RESOLUTION_XY="520,297", BOUNDING_BOX=box(i), WKB_SHAPE=WKB)
+           for i in range(count)]
+    return [instance.geometry for instance in ret] if parse else [instance.encode() for instance in ret]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=20000)
+    args = parser.parse_args()
+
+    for label, run in (("replace + create:", lambda: replaced(args.count)),
+                       ("template geometry:", lambda: filled(args.count, True)),
+                       ("template spec only:", lambda: filled(args.count, False))):
+        start = time.perf_counter()
+        run()
+        print(f"{label:22} {(time.perf_counter() - start) / args.count * 1e6:8.1f} us/geometry")
+
+
+if __name__ == "__main__":
+    main()
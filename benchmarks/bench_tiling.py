@@ -0,0 +1,82 @@
+""" Wall time of observing a large grid as one context against splitting it into tiles.
+
+    Runs against the in-process stub engine in tests/, where every ticket takes a time
+    proportional to the number of cells in its context and the engine has a fixed number
+    of workers. Run from the repository root:
+
+        python benchmarks/bench_tiling.py [--cells-per-second N] [--workers N]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [ROOT, os.path.join(ROOT, "tests")]
+
+import klab.engine
+from klab.geometry import KlabGeometry, KlabSpace
+from klab.observable import Observable
+from klab.tiling import SpatialTiling, TilingExecutor
+from stub_engine import StubEngine, stubKlab
+
+REGION = "EPSG:4326 POLYGON((33.796 -7.086, 35.946 -7.086, 35.946 -9.41, 33.796 -9.41, 33.796 -7.086))"
+RESOLUTION = "1 km"
+
+
+def cells(spec: str) -> int:
+    for dimension in KlabGeometry.create(spec).dimensions:
+        bbox = dimension.getParameters().get("bbox")
+        if bbox:
+            x1, x2, y1, y2 = bbox
+            dx, dy = KlabSpace.resolutionToDegrees(RESOLUTION, (y1 + y2) / 2)
+            return round((x2 - x1) / dx) * round((y2 - y1) / dy)
+    return 0
+
+
+def makeEngine(cellsPerSecond: float, workers: int) -> StubEngine:
+    engine = StubEngine(workers=workers, latency=0.002)
+
+    def delay(request):
+        if hasattr(request, "geometry"):
+            return cells(request.geometry) / cellsPerSecond
+        return cells(engine.references[request.contextId]["geometry"]) / cellsPerSecond
+
+    engine.delay = delay
+    return engine
+
+
+async def observe(maxCells: int, cellsPerSecond: float, workers: int) -> tuple:
+    engine = makeEngine(cellsPerSecond, workers)
+    executor = TilingExecutor(stubKlab(engine), Observable.create("geography:Elevation"),
+                              SpatialTiling(RESOLUTION, maxCells=maxCells), maxConcurrency=workers * 2)
+    with tempfile.TemporaryDirectory(prefix="klab_bench_tiles") as folder:
+        start = time.perf_counter()
+        tiles = await executor.run(REGION, folder, years=(2010,))
+        return len(tiles), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cells-per-second", type=float, default=100000)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    # tickets resolve in fractions of a second here, poll accordingly
+    klab.engine.POLLING_INTERVAL_SEC = 0.01
+
+    total = cells(f"S2{{bbox=[{' '.join(map(str, KlabSpace.wktBounds(REGION)))}]}}")
+    print(f"region of {total} cells at {RESOLUTION}, {args.workers} engine workers, "
+          f"{args.cells_per_second:.0f} cells/s per worker")
+    single = None
+    for maxCells in (total * 2, total // 4, total // 16, total // 64):
+        count, seconds = asyncio.run(observe(maxCells, args.cells_per_second, args.workers))
+        single = single or seconds
+        print(f"{count:4d} tiles of <= {maxCells:8d} cells: {seconds:6.2f}s  ({single / seconds:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+""" Time boundaries: datetime parsing per step against KlabTime arithmetic.
+
+    Times the start of a year as GeometryBuilder.startOfYear computed it with strptime,
+    and the transitions of a daily and a monthly time grid built one datetime at a time,
+    against KlabTime. Run from the repository root:
+
+        python benchmarks/bench_time.py [--steps N]
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import klab.engine
+from klab.geometry import GeometryBuilder, KlabTime
+from klab.types import TimeResolutionType
+
+
+def parsedYear(year: int) -> float:
+    start = datetime.datetime.strptime(f"{year}-01-01 00:00", "%Y-%m-%d %H:%M").replace(tzinfo=datetime.timezone.utc)
+    return start.timestamp() * 1000
+
+
+def parsedMonths(steps: int) -> list:
+    ret = []
+    for i in range(steps + 1):
+        year, month = 2000 + i // 12, i % 12 + 1
+        ret.append(int(datetime.datetime.strptime(f"{year}-{month:02d}-01", "%Y-%m-%d")
+                       .replace(tzinfo=datetime.timezone.utc).timestamp() * 1000))
+    return ret
+
+
+def parsedDays(steps: int) -> list:
+    start = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+    return [int((start + datetime.timedelta(days=i)).timestamp() * 1000) for i in range(steps + 1)]
+
+
+def timed(label: str, function, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        ret = function()
+    seconds = (time.perf_counter() - start) / repeat
+    print(f"{label:34} {seconds * 1e6:12,.1f} us")
+    return ret
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=10000)
+    args = parser.parse_args()
+
+    builder = GeometryBuilder()
+    assert timed("startOfYear with strptime:", lambda: parsedYear(2010), 10000) == \
+        timed("startOfYear:", lambda: builder.startOfYear(2010), 10000)
+    assert timed(f"{args.steps} months with strptime:", lambda: parsedMonths(args.steps), 5) == \
+        timed(f"{args.steps} months:", lambda: KlabTime.boundaries(TimeResolutionType.MONTH, args.steps, year=2000), 5)
+    assert timed(f"{args.steps} days with datetime:", lambda: parsedDays(args.steps), 5) == \
+        timed(f"{args.steps} days:", lambda: KlabTime.boundaries(TimeResolutionType.DAY, args.steps, year=2000), 5)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+Batch runner for large numbers of observe-and-export jobs, installed as the `klab-batch`
+command. Each job in the manifest (CSV with a header row, or JSON lines) describes the
+same flow as `examples/example_elevation.py`:
+
+    wkt,resolution,year,observable,format,output
+    EPSG:4326 POLYGON((...)),1 km,2010,geography:Elevation,BYTESTREAM,out/elevation_2010.tif
+
+An optional `id` column names the job in the journal; the output path is used otherwise.
+Jobs that share the same geometry (wkt, resolution and year) share a single context.
+"""
+from .klab import Klab
+from .cluster import KlabCluster
+from .geometry import GeometryBuilder
+from .observable import Observable
+from .utils import ExportFormat, DEFAULT_LOCAL_ENGINE_URL
+from .concurrency import asCompleted, exportObservation, observeInContext, resolveTicket, runBlocking
+from .exceptions import *
+import argparse
+import asyncio
+import collections
+import csv
+import json
+import os
+import statistics
+import sys
+import time
+
+import logging
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 8
+"""Default number of jobs running at the same time."""
+
+DEFAULT_CONTEXT_TYPE = "earth:Region"
+
+
+class BatchJob():
+
+    def __init__(self, wkt: str, resolution: str, year: int, observable: str, format: ExportFormat, output: str,
+                 id: str = None) -> None:
+        self.wkt = wkt
+        self.resolution = resolution
+        self.year = year
+        self.observable = observable
+        self.format = format
+        self.output = output
+        self.id = id or output
+
+    @staticmethod
+    def fromDict(dataMap: dict):
+        missing = [k for k in ("wkt", "resolution", "year", "observable", "output") if not dataMap.get(k)]
+        if missing:
+            raise KlabIllegalArgumentException(f"batch job is missing {', '.join(missing)}: {dataMap}")
+
+        eformat = dataMap.get("format") or ExportFormat.BYTESTREAM.name
+        try:
+            eformat = ExportFormat[str(eformat).strip().upper()]
+        except KeyError:
+            raise KlabIllegalArgumentException(f"unknown export format {eformat}")
+
+        return BatchJob(str(dataMap["wkt"]).strip(), str(dataMap["resolution"]).strip(), int(dataMap["year"]),
+                        str(dataMap["observable"]).strip(), eformat, str(dataMap["output"]).strip(),
+                        dataMap.get("id"))
+
+    @property
+    def contextKey(self) -> tuple:
+        return (self.wkt, self.resolution, self.year)
+
+    def __str__(self) -> str:
+        return f"BatchJob [id={self.id}, observable={self.observable}, year={self.year}, output={self.output}]"
+
+
+class JobResult():
+
+    def __init__(self, job: BatchJob, success: bool, seconds: float, error: str = None) -> None:
+        self.job = job
+        self.success = success
+        self.seconds = seconds
+        self.error = error
+
+
+def readManifest(path: str) -> list:
+    """Read the jobs in a CSV (with header) or JSON lines manifest."""
+    with open(path, 'r', newline='', encoding='utf-8') as file:
+        if path.lower().endswith((".jsonl", ".json", ".ndjson")):
+            rows = [json.loads(line) for line in file if line.strip()]
+        else:
+            rows = list(csv.DictReader(file))
+
+    jobs = [BatchJob.fromDict(row) for row in rows]
+    ids = set()
+    for job in jobs:
+        if job.id in ids:
+            raise KlabIllegalArgumentException(f"duplicated job {job.id} in manifest {path}")
+        ids.add(job.id)
+    return jobs
+
+
+class BatchJournal():
+    """
+    Append-only record of finished jobs, one JSON object per line, so that an interrupted
+    run can be resumed without submitting them again.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # a line truncated by an interrupted write
+                        continue
+                    if entry.get("status") == "done":
+                        self.done.add(entry.get("id"))
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def isDone(self, job: BatchJob) -> bool:
+        return job.id in self.done
+
+    def record(self, result: JobResult):
+        entry = {"id": result.job.id, "status": "done" if result.success else "failed", "output": result.job.output,
+                 "seconds": round(result.seconds, 3), "time": time.time()}
+        if result.error:
+            entry["error"] = result.error
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        if result.success:
+            self.done.add(result.job.id)
+
+    def close(self):
+        self.file.close()
+
+
+class BatchStatistics():
+
+    def __init__(self) -> None:
+        self.total = 0
+        self.skipped = 0
+        self.done = 0
+        self.failed = 0
+        self.contexts = 0
+        self.latencies = []
+        self.start = time.perf_counter()
+        self.elapsed = 0.0
+
+    def add(self, result: JobResult):
+        self.latencies.append(result.seconds)
+        if result.success:
+            self.done += 1
+        else:
+            self.failed += 1
+        self.elapsed = time.perf_counter() - self.start
+
+    @property
+    def throughput(self) -> float:
+        """Finished jobs per second."""
+        return (self.done + self.failed) / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self) -> str:
+        ret = f"{self.done} done, {self.failed} failed, {self.skipped} skipped of {self.total} jobs " \
+              f"({self.contexts} contexts) in {self.elapsed:.1f}s, {self.throughput:.2f} jobs/s"
+        if self.latencies:
+            latencies = sorted(self.latencies)
+            p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+            ret += f", latency mean {statistics.mean(latencies):.2f}s median {statistics.median(latencies):.2f}s " \
+                   f"p95 {p95:.2f}s"
+        return ret
+
+
+class BatchRunner():
+    """
+    Run batch jobs against a `Klab` or `KlabCluster` with at most `concurrency` jobs active
+    at a time, sharing contexts between jobs with the same geometry. A context is dropped
+    as soon as the last job that needs it has finished.
+    """
+
+    def __init__(self, klab, concurrency: int = DEFAULT_CONCURRENCY, journal: BatchJournal = None,
+                 contextType: str = DEFAULT_CONTEXT_TYPE, timeoutSeconds: int = 900, progress=None) -> None:
+        self.klab = klab
+        self.concurrency = concurrency
+        self.journal = journal
+        self.contextType = Observable.create(contextType)
+        self.timeoutSeconds = timeoutSeconds
+        self.progress = progress
+        self.contexts = {}
+        self.pending = collections.Counter()
+        self.statistics = BatchStatistics()
+
+    async def run(self, jobs: list) -> BatchStatistics:
+        self.statistics = BatchStatistics()
+        self.statistics.total = len(jobs)
+        todo = [job for job in jobs if not (self.journal and self.journal.isDone(job))]
+        self.statistics.skipped = len(jobs) - len(todo)
+        self.pending = collections.Counter(job.contextKey for job in todo)
+
+        async for result in asCompleted((self.runJob(job) for job in todo), self.concurrency):
+            self.statistics.add(result)
+            if self.journal:
+                self.journal.record(result)
+            if not result.success:
+                LOGGER.error(f"{result.job} failed: {result.error}")
+            if self.progress:
+                self.progress(result, self.statistics)
+
+        return self.statistics
+
+    async def runJob(self, job: BatchJob) -> JobResult:
+        start = time.perf_counter()
+        try:
+            context = await self.getContext(job)
+            observation = await observeInContext(self.klab, context, Observable.create(job.observable),
+                                                 timeoutSeconds=self.timeoutSeconds)
+            if observation is None or observation.isEmpty():
+                raise KlabRemoteException(f"the engine could not observe {job.observable}")
+            await runBlocking(exportObservation, observation, job.format, job.output)
+        except Exception as err:
+            return JobResult(job, False, time.perf_counter() - start, str(err) or type(err).__name__)
+        finally:
+            self.release(job)
+        return JobResult(job, True, time.perf_counter() - start)
+
+    def getContext(self, job: BatchJob) -> asyncio.Future:
+        task = self.contexts.get(job.contextKey)
+        if task is None:
+            task = asyncio.ensure_future(self.createContext(job))
+            self.contexts[job.contextKey] = task
+            self.statistics.contexts += 1
+        return task
+
+    def release(self, job: BatchJob):
+        """Count the job as finished, dropping its context if no other pending job needs it."""
+        self.pending[job.contextKey] -= 1
+        if self.pending[job.contextKey] <= 0:
+            del self.pending[job.contextKey]
+            self.contexts.pop(job.contextKey, None)
+
+    async def createContext(self, job: BatchJob):
+        geometry = GeometryBuilder().grid(urn=job.wkt, resolution=job.resolution).years(job.year).build()
+        context = await resolveTicket(self.klab.submit, self.contextType, geometry, timeoutSeconds=self.timeoutSeconds)
+        if context is None:
+            raise KlabRemoteException(f"the engine could not create the context for {job}")
+        return context
+
+
+def connect(engines: list, credentialsFiles: list, username: str = None, password: str = None):
+    if len(engines) + len(credentialsFiles) > 1:
+        return KlabCluster.create(engines, username, password, credentialsFiles)
+    if credentialsFiles:
+        return Klab.create(credentialsFile=credentialsFiles[0])
+    return Klab.create(engines[0] if engines else DEFAULT_LOCAL_ENGINE_URL, username, password)
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(prog="klab-batch", description="Run a manifest of k.LAB observe-and-export jobs.")
+    parser.add_argument("manifest", help="CSV or JSON lines file with wkt, resolution, year, observable, format, output")
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"jobs running at the same time (default {DEFAULT_CONCURRENCY})")
+    parser.add_argument("-j", "--journal", help="journal file used to resume (default: <manifest>.journal)")
+    parser.add_argument("-e", "--engine", action="append", default=[], help="engine url; repeat to use several engines")
+    parser.add_argument("--credentials", action="append", default=[],
+                        help="credentials properties file; repeat to use several engines")
+    parser.add_argument("-u", "--username")
+    parser.add_argument("-p", "--password")
+    parser.add_argument("--context-type", default=DEFAULT_CONTEXT_TYPE)
+    parser.add_argument("--timeout", type=int, default=900, help="seconds to wait for each ticket")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format='%(asctime)s|%(module)s|%(levelname)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S',
+                        level=logging.DEBUG if args.verbose else logging.WARNING)
+
+    try:
+        jobs = readManifest(args.manifest)
+    except (OSError, ValueError, KlabIllegalArgumentException) as err:
+        print(f"cannot read manifest {args.manifest}: {err}", file=sys.stderr)
+        return 2
+
+    journal = BatchJournal(args.journal or args.manifest + ".journal")
+    klab = connect(args.engine, args.credentials, args.username, args.password)
+
+    def progress(result: JobResult, stats: BatchStatistics):
+        finished = stats.done + stats.failed
+        if not result.success or finished % 100 == 0:
+            print(f"[{finished}/{stats.total - stats.skipped}] {stats.throughput:.2f} jobs/s, {stats.failed} failed")
+
+    runner = BatchRunner(klab, args.concurrency, journal, args.context_type, args.timeout, progress)
+    try:
+        stats = asyncio.run(runner.run(jobs))
+    except KeyboardInterrupt:
+        print("interrupted: run again with the same journal to resume", file=sys.stderr)
+        return 130
+    finally:
+        journal.close()
+        klab.close()
+
+    print(stats)
+    return 0 if stats.failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
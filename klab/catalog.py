@@ -0,0 +1,286 @@
+"""
+Columnar catalog of the observations in a context. Each field of the references is kept
+in its own array (enums as member codes, sets as bitmasks, strings interned), so that
+filtering and sorting thousands of observations never touches reference objects. With
+NumPy installed each condition is evaluated on whole columns at once; without it, row by
+row:
+
+    catalog = context.getCatalog()
+    for observation in catalog.query().where(observationType=ObservationType.STATE,
+                                             valueType=ValueType.NUMBER).filter("nodataProportion", "<", 0.1):
+        ...
+"""
+from .references import ObservationReference
+from .types import ObservationType, ValueType, GeometryType, KimConceptType
+from .exceptions import *
+from .shapes import numpy
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+import math
+import operator
+import sys
+
+OBSERVATION_TYPES = list(ObservationType)
+VALUE_TYPES = list(ValueType)
+GEOMETRY_TYPES = list(GeometryType)
+CONCEPT_TYPES = list(KimConceptType)
+
+SEMANTIC_WORDS = (len(CONCEPT_TYPES) + 63) // 64
+"""64-bit words in the semantics bitmask of each observation."""
+
+STATISTICS = ("nodataProportion", "minValue", "maxValue", "mean")
+"""Data summary values kept as columns, usable in `filter()` and `orderBy()`."""
+
+MAX_PARALLEL_FETCHES = 8
+"""Engine requests made at the same time to fetch the references or observations of a catalog."""
+
+LOAD_BATCH_SIZE = 32
+"""Observations loaded together while iterating a query."""
+
+OPERATORS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge, "==": operator.eq,
+             "!=": operator.ne}
+
+_INDEX = {member: i for members in (OBSERVATION_TYPES, VALUE_TYPES, GEOMETRY_TYPES, CONCEPT_TYPES)
+          for i, member in enumerate(members)}
+
+
+def _code(member) -> int:
+    return -1 if member is None else _INDEX[member]
+
+
+def _member(members: list, code: int):
+    return None if code < 0 else members[code]
+
+
+def _mask(members) -> int:
+    ret = 0
+    for member in members or ():
+        ret |= 1 << _INDEX[member]
+    return ret
+
+
+def _float(value) -> float:
+    return math.nan if value is None else float(value)
+
+
+def _view(column: array):
+    """The array as a NumPy array sharing its memory; drop it before the array grows."""
+    return numpy.frombuffer(column, dtype=column.typecode)
+
+
+def fetchAll(fetch, ids: list) -> list:
+    """Call `fetch` with each id, with up to `MAX_PARALLEL_FETCHES` calls at a time, and return the results in order."""
+    if len(ids) < 2:
+        return [fetch(id) for id in ids]
+    with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_FETCHES, len(ids))) as executor:
+        return list(executor.map(fetch, ids))
+
+
+class ObservationCatalog():
+    """
+    The observations of a context, one row each. Only the catalog values are kept: `load`
+    is called with a list of observation ids to get their `Observation`s when query results
+    are actually iterated.
+    """
+
+    def __init__(self, load=None) -> None:
+        self.load = load
+        self.rows = {}
+        self.ids = []
+        self.names = []
+        self.observables = []
+        self.observationTypes = array('b')
+        self.valueTypes = array('b')
+        self.geometryTypes = array('I')
+        self.semantics = array('Q')
+        self.statistics = {name: array('d') for name in STATISTICS}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, id: str) -> bool:
+        return id in self.rows
+
+    def add(self, reference: ObservationReference, name: str = None):
+        """Add the observation, or update its row if it is already in the catalog."""
+        row = self.rows.get(reference.id)
+        if row is None:
+            row = len(self.ids)
+            self.rows[reference.id] = row
+            self.ids.append(sys.intern(reference.id))
+            self.names.append(None)
+            self.observables.append(None)
+            self.observationTypes.append(-1)
+            self.valueTypes.append(-1)
+            self.geometryTypes.append(0)
+            self.semantics.extend([0] * SEMANTIC_WORDS)
+            for column in self.statistics.values():
+                column.append(math.nan)
+
+        name = name or reference.label
+        self.names[row] = sys.intern(name) if name else None
+        self.observables[row] = sys.intern(reference.observable) if reference.observable else None
+        self.observationTypes[row] = _code(reference.observationType)
+        self.valueTypes[row] = _code(reference.valueType)
+        self.geometryTypes[row] = _mask(reference.geometryTypes)
+        semantics = _mask(reference.semantics)
+        for word in range(SEMANTIC_WORDS):
+            self.semantics[row * SEMANTIC_WORDS + word] = (semantics >> (64 * word)) & 0xFFFFFFFFFFFFFFFF
+        summary = reference.dataSummary
+        for statistic, column in self.statistics.items():
+            column[row] = _float(getattr(summary, statistic)) if summary is not None else math.nan
+
+    def query(self):
+        """A query over all observations; narrow it with the `CatalogQuery` methods."""
+        return CatalogQuery(self)
+
+    def row(self, row: int) -> dict:
+        """The catalog values of a row as a dict."""
+        semantics = 0
+        for word in range(SEMANTIC_WORDS):
+            semantics |= self.semantics[row * SEMANTIC_WORDS + word] << (64 * word)
+        ret = {
+            "id": self.ids[row],
+            "name": self.names[row],
+            "observable": self.observables[row],
+            "observationType": _member(OBSERVATION_TYPES, self.observationTypes[row]),
+            "valueType": _member(VALUE_TYPES, self.valueTypes[row]),
+            "geometryTypes": {t for i, t in enumerate(GEOMETRY_TYPES) if self.geometryTypes[row] >> i & 1},
+            "semantics": {t for i, t in enumerate(CONCEPT_TYPES) if semantics >> i & 1},
+        }
+        for statistic, column in self.statistics.items():
+            ret[statistic] = column[row]
+        return ret
+
+
+class CatalogQuery():
+    """
+    A filter over an `ObservationCatalog`. Each method narrows the query and returns it,
+    so calls can be chained; iterating yields the matching observations, loaded from the
+    engine `LOAD_BATCH_SIZE` at a time as they are reached.
+    """
+
+    def __init__(self, catalog: ObservationCatalog) -> None:
+        self.catalog = catalog
+        self.conditions = []
+        self.sortColumn = None
+        self.descending = False
+        self.maxResults = None
+
+    def where(self, observationType: ObservationType = None, valueType: ValueType = None, name: str = None,
+              observable: str = None):
+        if observationType is not None:
+            self.equals(self.catalog.observationTypes, _code(observationType))
+        if valueType is not None:
+            self.equals(self.catalog.valueTypes, _code(valueType))
+        if name is not None:
+            self.equals(self.catalog.names, name)
+        if observable is not None:
+            self.equals(self.catalog.observables, observable)
+        return self
+
+    def condition(self, row, columns):
+        """
+        Add a condition as `row`, which tests one row, and `columns`, which returns the
+        boolean mask of all rows and is used instead when NumPy is installed.
+        """
+        self.conditions.append((row, columns))
+
+    def equals(self, column, value):
+        if isinstance(column, array):
+            self.condition(lambda row: column[row] == value, lambda: _view(column) == value)
+        else:
+            self.condition(lambda row: column[row] == value,
+                           lambda: numpy.fromiter((v == value for v in column), dtype=bool, count=len(column)))
+
+    def hasSemantics(self, *types: KimConceptType):
+        """Keep observations whose semantics include all the passed concept types."""
+        mask = _mask(types)
+        words = [(mask >> (64 * word)) & 0xFFFFFFFFFFFFFFFF for word in range(SEMANTIC_WORDS)]
+        column = self.catalog.semantics
+
+        def row(row: int) -> bool:
+            base = row * SEMANTIC_WORDS
+            return all(column[base + word] & bits == bits for word, bits in enumerate(words) if bits)
+
+        def columns():
+            bits = numpy.array(words, dtype=numpy.uint64)
+            return ((_view(column).reshape(-1, SEMANTIC_WORDS) & bits) == bits).all(axis=1)
+
+        self.condition(row, columns)
+        return self
+
+    def hasGeometry(self, *types: GeometryType):
+        """Keep observations with all the passed geometry types."""
+        mask, column = _mask(types), self.catalog.geometryTypes
+        self.condition(lambda row: column[row] & mask == mask, lambda: _view(column) & mask == mask)
+        return self
+
+    def filter(self, statistic: str, op: str, value: float):
+        """Keep observations whose data summary value compares true, e.g. ("nodataProportion", "<", 0.1)."""
+        if statistic not in self.catalog.statistics:
+            raise KlabIllegalArgumentException(f"cannot filter on {statistic}: use one of {', '.join(STATISTICS)}")
+        if op not in OPERATORS:
+            raise KlabIllegalArgumentException(f"unknown comparison {op}")
+        compare, column = OPERATORS[op], self.catalog.statistics[statistic]
+        # comparisons with NaN are false, so observations without summary never match
+        self.condition(lambda row: compare(column[row], value), lambda: compare(_view(column), value))
+        return self
+
+    def orderBy(self, statistic: str, descending: bool = False):
+        """Sort by a data summary value; observations without one come last."""
+        if statistic not in self.catalog.statistics:
+            raise KlabIllegalArgumentException(f"cannot sort on {statistic}: use one of {', '.join(STATISTICS)}")
+        self.sortColumn = self.catalog.statistics[statistic]
+        self.descending = descending
+        return self
+
+    def limit(self, count: int):
+        self.maxResults = count
+        return self
+
+    def matches(self) -> list:
+        """The matching catalog rows, in query order."""
+        if numpy is not None and len(self.catalog):
+            rows = self.matchColumns()
+        else:
+            conditions = [row for row, _ in self.conditions]
+            rows = [row for row in range(len(self.catalog)) if all(condition(row) for condition in conditions)]
+            if self.sortColumn is not None:
+                column, sign = self.sortColumn, -1 if self.descending else 1
+                rows.sort(key=lambda row: (math.isnan(column[row]), sign * column[row] if not math.isnan(column[row])
+                                           else 0.0))
+        if self.maxResults is not None:
+            rows = rows[:self.maxResults]
+        return rows
+
+    def matchColumns(self) -> list:
+        """Same as the filtering and sorting of `matches()`, on whole columns. Needs numpy."""
+        selected = numpy.ones(len(self.catalog), dtype=bool)
+        for _, columns in self.conditions:
+            selected &= columns()
+        rows = numpy.flatnonzero(selected)
+        if self.sortColumn is not None:
+            values = _view(self.sortColumn)[rows]
+            missing = numpy.isnan(values)
+            keys = numpy.where(missing, 0.0, -values if self.descending else values)
+            # stable, by value and then with the missing values last
+            rows = rows[numpy.lexsort((keys, missing))]
+        return rows.tolist()
+
+    def ids(self) -> list:
+        return [self.catalog.ids[row] for row in self.matches()]
+
+    def rows(self) -> list:
+        """The catalog values of the matches as dicts, without loading any observation."""
+        return [self.catalog.row(row) for row in self.matches()]
+
+    def count(self) -> int:
+        return len(self.matches())
+
+    def __iter__(self):
+        if self.catalog.load is None:
+            raise KlabIllegalStateException("this catalog cannot load observations")
+        ids = self.ids()
+        for start in range(0, len(ids), LOAD_BATCH_SIZE):
+            yield from self.catalog.load(ids[start:start + LOAD_BATCH_SIZE])
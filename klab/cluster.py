@@ -0,0 +1,263 @@
+from .klab import Klab
+from .engine import TicketHandler
+from .observable import Observable
+from .observation import Context
+from .geometry import KlabGeometry
+from .ticket import Estimate
+from .utils import EndPoint
+from .exceptions import *
+import os
+import requests
+import threading
+import time
+
+import logging
+
+LOGGER = logging.getLogger(__name__)
+
+HEALTH_CHECK_INTERVAL_SEC = 30
+"""Seconds after which the health of an engine is checked again before routing to it."""
+
+LATENCY_SMOOTHING = 0.3
+"""Weight of the newest sample in the moving average of engine latency."""
+
+
+def isEngineFailure(err: Exception) -> bool:
+    """
+    Whether an error means that the engine cannot serve requests (it cannot be reached,
+    times out or answers with a 5xx status) rather than that the request was rejected.
+    """
+    if isinstance(err, requests.HTTPError):
+        return err.response is None or err.response.status_code >= 500
+    return isinstance(err, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError))
+
+
+class EngineNode():
+    """
+    One engine in a `KlabCluster`, with the load and health figures used to route requests
+    to it.
+    """
+
+    def __init__(self, klab: Klab) -> None:
+        self.klab = klab
+        self.inFlight = 0
+        # tickets start and complete on executor threads as well as on event loops
+        self.lock = threading.Lock()
+        self.latency = None
+        self.healthy = True
+        self.lastCheck = None
+
+    @property
+    def engine(self):
+        return self.klab.engine
+
+    @property
+    def url(self) -> str:
+        return self.klab.engine.url
+
+    def startTicket(self):
+        with self.lock:
+            self.inFlight += 1
+
+    def endTicket(self):
+        with self.lock:
+            self.inFlight -= 1
+
+    def observeLatency(self, seconds: float):
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency = LATENCY_SMOOTHING * seconds + (1 - LATENCY_SMOOTHING) * self.latency
+
+    def load(self) -> float:
+        """
+        The routing cost of sending one more request to this engine: the tickets it is
+        working on, including the new one, weighted by its measured latency.
+        """
+        latency = self.latency if self.latency is not None else 1.0
+        return (self.inFlight + 1) * latency
+
+    def __str__(self) -> str:
+        return f"EngineNode [url={self.url}, healthy={self.healthy}, inFlight={self.inFlight}, latency={self.latency}]"
+
+
+class KlabCluster():
+    """
+    A client session spread over several engines. New contexts and estimates go to the
+    least-loaded healthy engine, judged by in-flight tickets and measured latency. Engines
+    that fail a health check are skipped until a later check finds them online again.
+
+    Contexts keep a reference to the engine that created them, so observations, exports and
+    dataflows requested through a context are always served by its own engine. Use
+    `observe()` instead of `Context.submit()` to have those tickets count towards the load
+    of the engine.
+    """
+
+    def __init__(self, klabs: list, healthCheckInterval: float = HEALTH_CHECK_INTERVAL_SEC):
+        if not klabs:
+            raise KlabIllegalArgumentException("a cluster needs at least one engine")
+
+        self.nodes = [EngineNode(klab) for klab in klabs]
+        self.healthCheckInterval = healthCheckInterval
+        self.contextNodes = {}
+        self.estimateNodes = {}
+        self.checkHealth()
+
+    @staticmethod
+    def create(engines: list = None, username=None, password=None, credentialsFiles: list = None,
+               healthCheckInterval: float = HEALTH_CHECK_INTERVAL_SEC):
+        """
+        Authenticate with every engine passed and return a cluster over those that accepted
+        the connection.
+
+        Parameters
+        ----------
+        engines: list
+            urls of the engines to use with the same (optional) username and password.
+        username:str
+            necessary only for remote engines.
+        password:str
+            necessary only for remote engines.
+        credentialsFiles: list
+            properties files in the format accepted by `Klab.create`, one per engine.
+        healthCheckInterval: float
+            seconds after which an engine's health is checked again.
+
+        Returns
+        -------
+        KlabCluster:
+            The cluster over all engines that could be authenticated.
+        """
+        klabs = []
+        for url in engines or []:
+            try:
+                klabs.append(Klab.create(url, username, password))
+            except Exception as err:
+                LOGGER.warning(f"cannot authenticate with engine {url}: {err}")
+
+        for credentialsFile in credentialsFiles or []:
+            if not os.path.exists(credentialsFile):
+                LOGGER.warning(f"credentials file {credentialsFile} does not exist")
+                continue
+            try:
+                klabs.append(Klab.create(credentialsFile=credentialsFile))
+            except Exception as err:
+                LOGGER.warning(f"cannot authenticate with the engine in {credentialsFile}: {err}")
+
+        if not klabs:
+            raise KlabIllegalStateException("could not authenticate with any of the engines")
+
+        return KlabCluster(klabs, healthCheckInterval)
+
+    def useStore(self, store):
+        """Record the contexts and observations made on all engines in the same `ObservationStore`."""
+        for node in self.nodes:
+            node.klab.useStore(store)
+
+    def checkHealth(self, node: EngineNode = None):
+        """
+        Ping the passed engine, or all of them, recording latency and marking those that do
+        not answer as unhealthy.
+        """
+        for n in [node] if node else self.nodes:
+            start = time.perf_counter()
+            try:
+                n.engine.get(EndPoint.PING.value)
+            except Exception as err:
+                if n.healthy:
+                    LOGGER.warning(f"engine {n.url} failed health check: {err}")
+                n.healthy = False
+            else:
+                if not n.healthy:
+                    LOGGER.info(f"engine {n.url} is back online")
+                n.healthy = True
+                n.observeLatency(time.perf_counter() - start)
+            n.lastCheck = time.monotonic()
+
+    def isOnline(self) -> bool:
+        return any(node.healthy and node.klab.isOnline() for node in self.nodes)
+
+    def close(self):
+        for node in self.nodes:
+            node.klab.close()
+
+    def selectNode(self, exclude: list = []) -> EngineNode:
+        """Return the least-loaded healthy engine, checking health first where it is stale."""
+        now = time.monotonic()
+        for node in self.nodes:
+            if node.lastCheck is None or now - node.lastCheck > self.healthCheckInterval:
+                self.checkHealth(node)
+
+        candidates = [node for node in self.nodes if node.healthy and node not in exclude]
+        if not candidates:
+            raise KlabRemoteException("no healthy engine is available in the cluster")
+
+        return min(candidates, key=lambda node: node.load())
+
+    def nodeFor(self, context: Context) -> EngineNode:
+        """Return the engine that owns the passed context."""
+        node = self.contextNodes.get(context.reference.id)
+        if node:
+            return node
+        for node in self.nodes:
+            if node.engine is context.engine:
+                return node
+        raise KlabIllegalArgumentException(f"context {context.reference.id} was not created in this cluster")
+
+    def submit(self, contextType: Observable, geometry: KlabGeometry, *arguments: list) -> TicketHandler:
+        """
+        Same as `Klab.submit`, sent to the least-loaded healthy engine. If the engine cannot
+        be reached, times out or fails with a server error it is marked unhealthy and the
+        next one is tried; other errors are raised as they are.
+        """
+        return self.dispatch(lambda klab: klab.submit(contextType, geometry, *arguments))
+
+    def estimate(self, contextType: Observable, geometry: KlabGeometry, *arguments: list) -> TicketHandler:
+        """
+        Same as `Klab.estimate`, sent to the least-loaded healthy engine. The engine is
+        remembered so that `submitEstimate()` can accept the estimate where it was made.
+        """
+        return self.dispatch(lambda klab: klab.estimate(contextType, geometry, *arguments))
+
+    def submitEstimate(self, estimate: Estimate) -> TicketHandler:
+        node = self.estimateNodes.get(estimate.estimateId)
+        if not node:
+            raise KlabIllegalArgumentException(f"estimate {estimate.estimateId} was not made in this cluster")
+        return self.track(node, node.klab.submitEstimate(estimate))
+
+    def observe(self, context: Context, observable: Observable, arguments: list = []) -> TicketHandler:
+        """Submit an observation to the engine that owns the context."""
+        node = self.nodeFor(context)
+        return self.track(node, context.submit(observable, arguments))
+
+    def dispatch(self, call) -> TicketHandler:
+        failed = []
+        while True:
+            node = self.selectNode(failed)
+            start = time.perf_counter()
+            try:
+                handler = call(node.klab)
+            except Exception as err:
+                # a rejected request would be rejected by any engine: only failing engines
+                # are taken out of rotation
+                if not isEngineFailure(err):
+                    raise
+                LOGGER.warning(f"engine {node.url} failed, routing to the next one: {err}")
+                node.healthy = False
+                failed.append(node)
+                continue
+
+            node.observeLatency(time.perf_counter() - start)
+            return self.track(node, handler)
+
+    def track(self, node: EngineNode, handler: TicketHandler) -> TicketHandler:
+        node.startTicket()
+
+        def completed(result):
+            node.endTicket()
+            if isinstance(result, Context) and result.reference:
+                self.contextNodes[result.reference.id] = node
+            elif isinstance(result, Estimate):
+                self.estimateNodes[result.estimateId] = node
+
+        return handler.onCompletion(completed)
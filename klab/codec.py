@@ -0,0 +1,104 @@
+"""
+JSON encoding of the requests sent to the engine and decoding of its responses. The
+fastest installed backend is used (orjson, installed with the `json` extra, or
+pysimdjson for decoding), with the standard library as the fallback; all of them produce
+and accept the same JSON values.
+"""
+from .exceptions import KlabIllegalArgumentException
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+
+class JsonCodec():
+    """The standard library backend; subclasses replace it with a faster one."""
+
+    name = "json"
+
+    def dumpb(self, value) -> bytes:
+        """Encode to UTF-8 JSON bytes, ready to be sent as a request body."""
+        return self.dumps(value).encode("utf-8")
+
+    def dumps(self, value) -> str:
+        # escaping non-ASCII text keeps the stdlib encoder on its fastest path
+        return json.dumps(value, separators=(",", ":"))
+
+    def loads(self, data):
+        """Decode a JSON document passed as bytes (as read from the response) or text."""
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+
+    name = "orjson"
+
+    def dumpb(self, value) -> bytes:
+        return orjson.dumps(value)
+
+    def dumps(self, value) -> str:
+        return orjson.dumps(value).decode("utf-8")
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+class SimdjsonCodec(JsonCodec):
+    """Decodes with pysimdjson and encodes with the standard library."""
+
+    name = "simdjson"
+
+    def loads(self, data):
+        return simdjson.loads(data)
+
+
+def availableCodecs() -> dict:
+    """The codecs that can be used in this interpreter, by name."""
+    codecs = {JsonCodec.name: JsonCodec()}
+    if simdjson is not None:
+        codecs[SimdjsonCodec.name] = SimdjsonCodec()
+    if orjson is not None:
+        codecs[OrjsonCodec.name] = OrjsonCodec()
+    return codecs
+
+
+def defaultCodec() -> JsonCodec:
+    """The fastest available codec."""
+    if orjson is not None:
+        return OrjsonCodec()
+    if simdjson is not None:
+        return SimdjsonCodec()
+    return JsonCodec()
+
+
+def getCodec(codec) -> JsonCodec:
+    """Return the passed codec, or the available codec with the passed name."""
+    if isinstance(codec, JsonCodec):
+        return codec
+    codecs = availableCodecs()
+    if codec not in codecs:
+        raise KlabIllegalArgumentException(f"JSON codec {codec} is not installed; available: {', '.join(codecs)}")
+    return codecs[codec]
+
+
+CODEC = defaultCodec()
+"""The codec used by default to serialize requests and decode responses."""
+
+
+def dumpb(value) -> bytes:
+    return CODEC.dumpb(value)
+
+
+def dumps(value) -> str:
+    return CODEC.dumps(value)
+
+
+def loads(data):
+    return CODEC.loads(data)
@@ -0,0 +1,84 @@
+from .exceptions import KlabIllegalArgumentException, KlabRemoteException
+from .utils import Export
+import asyncio
+import functools
+import os
+import tempfile
+
+
+async def runBlocking(function, *args, **kwargs):
+    """
+    Run a blocking call (an engine request, a file export) in the executor of the running
+    event loop so that other coroutines can progress while it waits on the network.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(function, *args, **kwargs))
+
+
+async def asCompleted(coroutines, maxConcurrency: int):
+    """
+    Run the coroutines with at most `maxConcurrency` of them active at any time, yielding
+    their results in completion order. Coroutines are only taken from the iterable when a
+    slot frees up, so a generator over any number of jobs can be passed. An exception in a
+    coroutine propagates to the caller and cancels the ones still running; coroutines that
+    must not stop the others should catch their own errors.
+    """
+    if maxConcurrency < 1:
+        raise KlabIllegalArgumentException("maxConcurrency must be at least 1")
+
+    iterator = iter(coroutines)
+    pending = set()
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < maxConcurrency:
+                try:
+                    pending.add(asyncio.ensure_future(next(iterator)))
+                except StopIteration:
+                    exhausted = True
+            if not pending:
+                return
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def resolveTicket(call, *arguments, timeoutSeconds: int = 900):
+    """Make a blocking submission that returns a `TicketHandler` and wait for its result."""
+    handler = await runBlocking(call, *arguments)
+    return await handler.get(timeoutSeconds)
+
+
+async def observeInContext(klab, context, observable, arguments: list = [], timeoutSeconds: int = 900):
+    """
+    Observe in an existing context and wait for the result. Clients that track engine load
+    (`KlabCluster`) receive the request through their `observe()` method.
+    """
+    if hasattr(klab, "observe"):
+        return await resolveTicket(klab.observe, context, observable, arguments, timeoutSeconds=timeoutSeconds)
+    return await resolveTicket(context.submit, observable, arguments, timeoutSeconds=timeoutSeconds)
+
+
+def exportObservation(observation, eformat, path: str, parameters: list = []) -> str:
+    """
+    Export the data of an observation to `path`, through a temporary file next to it that is
+    renamed at the end so outputs are never partial. Raise `KlabRemoteException`, leaving no
+    file, if the engine reports the export failed or sends nothing.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=directory, prefix="." + os.path.basename(path), suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            exported = observation.export(Export.DATA, eformat, file, parameters)
+            size = file.tell()
+        if not exported or size == 0:
+            raise KlabRemoteException(f"the engine could not export {eformat.name} data to {path}")
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+    return path
@@ -4,25 +4,81 @@ from .resources import *
 from .utils import Export, ExportFormat, EndPoint, KLAB_VERSION, USER_AGENT_PLATFORM, POLLING_INTERVAL_SEC,P_EXPORT,P_OBSERVATION,P_TICKET, P_CONTEXT,P_ESTIMATE
 from .observation import ObservationReference,  ObservationRequest, Context, Observation, ContextRequest
 from .ticket import Ticket, TicketResponse, TicketStatus, TicketType, Estimate
+from .concurrency import runBlocking
+from .codec import CODEC, getCodec
 import asyncio
 import io
 import json
 import logging
+import re
+import threading
+import time
 
 LOGGER = logging.getLogger(__name__)
 
+ENDPOINT_PATTERNS = [(re.compile("^" + re.sub(r"\\\{\w+\\\}", "([^/]+)", re.escape(e.value)) + "$"), e)
+                     for e in EndPoint]
+"""Patterns to recognize the `EndPoint` of a request path, with a group for each path variable."""
+
+
+def endpointName(endpoint: str) -> str:
+    """
+    The name of the `EndPoint` that a request path was made from, used as key for the
+    decode statistics. Exports are told apart by what they export (EXPORT_DATA:structure).
+    """
+    path = endpoint.split("?", 1)[0]
+    for pattern, value in ENDPOINT_PATTERNS:
+        match = pattern.match(path)
+        if match:
+            if value == EndPoint.EXPORT_DATA:
+                return f"{value.name}:{match.group(1)}"
+            return value.name
+    return path
+
+
+class DecodeStatistics():
+    """Time spent decoding the JSON responses of one endpoint."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.maxSeconds = 0.0
+
+    def add(self, size: int, seconds: float):
+        self.count += 1
+        self.bytes += size
+        self.seconds += seconds
+        self.maxSeconds = max(self.maxSeconds, seconds)
+
+    @property
+    def meanSeconds(self) -> float:
+        return self.seconds / self.count if self.count else 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Decoded megabytes per second."""
+        return self.bytes / self.seconds / 1e6 if self.seconds > 0 else 0.0
+
+    def __str__(self) -> str:
+        return f"{self.count} responses, {self.bytes / 1e6:.2f} MB in {self.seconds * 1000:.1f} ms " \
+               f"(mean {self.meanSeconds * 1000:.2f} ms, max {self.maxSeconds * 1000:.2f} ms)"
+
 
 class Engine:
     """
 
     """
 
-    def __init__(self, url):
+    def __init__(self, url, codec=None):
         self.session = requests.Session()
         self.session_id = None
         self.authorization = None
         self.url = url
         self.acceptHeader = None
+        self.codec = getCodec(codec) if codec else CODEC
+        self.statistics = {}
+        self.statisticsLock = threading.Lock()
 
         while self.url.endswith("/"):
             self.url = self.url[0:-1]
@@ -89,6 +145,29 @@ class Engine:
 
     def isOnline(self):
         return self.session != None
+
+    def setCodec(self, codec):
+        """Use another JSON codec, passed by name ("orjson", "simdjson", "json") or as a `JsonCodec`."""
+        self.codec = getCodec(codec)
+        return self
+
+    def decode(self, endpoint: str, content: bytes):
+        """Decode a JSON response body with the codec, recording the time taken for the endpoint."""
+        start = time.perf_counter()
+        ret = self.codec.loads(content)
+        seconds = time.perf_counter() - start
+        key = endpointName(endpoint)
+        with self.statisticsLock:
+            stats = self.statistics.get(key)
+            if stats is None:
+                stats = self.statistics[key] = DecodeStatistics()
+            stats.add(len(content), seconds)
+        return ret
+
+    def decodeStatistics(self) -> dict:
+        """The `DecodeStatistics` of the responses decoded so far, by endpoint name."""
+        with self.statisticsLock:
+            return dict(self.statistics)
     
     def accept(self, mediaType: str):
         self.acceptHeader = mediaType
@@ -100,12 +179,18 @@ class Engine:
         '''
         self.session.close()
 
-    def get(self, endpoint: str, parameters: list = None):
-        mediaType = "application/json"
-        if self.acceptHeader:
-            mediaType = self.acceptHeader
-            self.acceptHeader = None
-        
+    def get(self, endpoint: str, parameters: list = None, mediaType: str = None):
+        """
+        GET the endpoint, decoding the response according to the media type. Pass the
+        media type explicitly rather than through `accept()` when the engine is shared
+        between threads.
+        """
+        if not mediaType:
+            mediaType = "application/json"
+            if self.acceptHeader:
+                mediaType = self.acceptHeader
+                self.acceptHeader = None
+
         requestUrl = self.makeUrl(endpoint, parameters)
         userAgent = self.getUserAgent()
         headers = {
@@ -122,8 +207,7 @@ class Engine:
             raise err
         else:
             if mediaType == 'application/json':
-                jsonResponse = response.json()
-                return jsonResponse
+                return self.decode(endpoint, response.content)
             elif mediaType == 'text/plain':
                 return response.text
             else:
@@ -153,13 +237,12 @@ class Engine:
         }
 
         try:
-            response = self.session.post(requestUrl, headers=headers, data=request.toJson())
+            response = self.session.post(requestUrl, headers=headers, data=self.codec.dumpb(request.toDict()))
             response.raise_for_status()
         except Exception as err:
             raise err
         else:
-            jsonResponse = response.json()
-            return jsonResponse
+            return self.decode(endpoint, response.content)
 
     
     def makeUrl(self, endpoint, parameters=[]):
@@ -220,21 +303,15 @@ class Engine:
                                                                                              observationId)
         endpoint = self.addParams(endpoint, parameters)
 
-        self.accept(format.getMediaType())
-
-        ret = self.get(endpoint)
+        ret = self.get(endpoint, mediaType=format.getMediaType())
         if ret:
             if format == ExportFormat.GEOJSON_FEATURES or format == ExportFormat.JSON_CODE or format == ExportFormat.ELK_GRAPH_JSON:
                 retType = ret.get('type')
                 if retType == "FeatureCollection":
                     features = ret.get('features')
-                    featuresJson = json.dumps(features)
-                    res = bytes(featuresJson, 'utf-8')
-                    output.write(res)
+                    output.write(self.codec.dumpb(features))
                 else:
-                    js = json.dumps(ret)
-                    res = bytes(js, 'utf-8')
-                    output.write(res)
+                    output.write(self.codec.dumpb(ret))
             elif format == ExportFormat.GEOTIFF_RASTER:
                 output.write(ret) # TODO check this
             elif format == ExportFormat.KDL_CODE:
@@ -281,12 +358,26 @@ class Engine:
 
 
 class TicketHandler():
-    def __init__(self,  engine: Engine, ticketId: str, context: Context) -> None:
+    def __init__(self,  engine: Engine, ticketId: str, context: Context, store=None, geometry=None) -> None:
         self.engine = engine
         self.ticketId = ticketId
         self.context = context
+        # an ObservationStore recording the result, with the geometry of the request if known
+        self.store = store
+        self.geometry = geometry
         self.cancelled = False
         self.result = None
+        self.callbacks = []
+        self.notified = False
+        self.pollingInterval = POLLING_INTERVAL_SEC
+
+    def onCompletion(self, callback):
+        """
+        Register a callable that `get()` invokes once with the result when it returns. The
+        result is None if the ticket failed, was cancelled or timed out, or if polling raised.
+        """
+        self.callbacks.append(callback)
+        return self
 
     def cancel(self):
         self.cancelled = True
@@ -300,22 +391,44 @@ class TicketHandler():
 
     async def get(self, timeoutSeconds: int = 900):
         if self.isCancelled():
+            self.notifyCompletion()
             return None
         time = 0
-        while not self.result:
-            if time > timeoutSeconds:
-                break
-            bean = self.poll(self.engine)
-            if bean:
-                self.result = bean
-                break
-            elif self.isCancelled():
-                break
-            await asyncio.sleep(POLLING_INTERVAL_SEC)
-            time += POLLING_INTERVAL_SEC
-
+        try:
+            while not self.result:
+                if time > timeoutSeconds:
+                    break
+                # polling blocks on the network, so it runs in the loop's executor to let
+                # other tickets be polled at the same time
+                bean = await runBlocking(self.poll, self.engine)
+                if bean:
+                    self.result = bean
+                    break
+                elif self.isCancelled():
+                    break
+                await asyncio.sleep(self.pollingInterval)
+                time += self.pollingInterval
+        finally:
+            try:
+                if self.store is not None and self.result is not None and not self.notified:
+                    # written by the store's thread, so that other tickets are polled meanwhile
+                    await asyncio.wrap_future(self.store.recordLater(self.result, self.geometry))
+            finally:
+                # also when polling raises or the task is cancelled, so that callbacks
+                # (like a cluster's in-flight count) are always released
+                self.notifyCompletion()
         return self.result
 
+    def notifyCompletion(self):
+        if self.notified:
+            return
+        self.notified = True
+        for callback in self.callbacks:
+            try:
+                callback(self.result)
+            except Exception as err:
+                LOGGER.error(f"ticket completion callback failed: {err}")
+
     def poll(self, engine: Engine) -> any:
         ticket = engine.getTicket(self.ticketId)
         if ticket == None or ticket.status == TicketStatus.ERROR or ticket.id == None:
@@ -361,6 +474,7 @@ class TicketHandler():
     def makeContext(self, ticket: Ticket):
         bean = self.engine.getObservation(ticket.data.get("context"))
         context = Context(bean, self.engine)
+        context.store = self.store
         if "artifacts" in ticket.data:
             artSplit = ticket.data["artifacts"].split(",")
             for oid in artSplit:
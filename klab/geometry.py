@@ -1,10 +1,13 @@
 from enum import Enum
-from .exceptions import KlabIllegalArgumentException
+from .exceptions import KlabIllegalArgumentException, KlabIllegalStateException
 import sys
 from .utils import NumberUtils
+from .shapes import Shape, numpy, requireNumpy
 from .types import Granularity,  TimeResolutionType, DimensionType
 import functools
-import datetime
+import hashlib
+import math
+import re
 
 
 NONDIMENSIONAL = -1
@@ -84,7 +87,77 @@ def compareDimensions(item1, item2):
         return 0
 
 
+class _Parameters(dict):
+    """The parameters of a `Dimension`, which reports every change to it."""
+
+    __slots__ = ("dimension",)
+
+    def __init__(self, dimension, *args) -> None:
+        super().__init__(*args)
+        self.dimension = dimension
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.dimension.changed()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.dimension.changed()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.dimension.changed()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, *args):
+        ret = super().pop(*args)
+        self.dimension.changed()
+        return ret
+
+    def popitem(self):
+        ret = super().popitem()
+        self.dimension.changed()
+        return ret
+
+    def clear(self):
+        super().clear()
+        self.dimension.changed()
+
+
+def _checkIndices(indices, count: int, name: str):
+    """
+    Raise KlabIllegalArgumentException unless the index, or all indices of an array, are
+    whole numbers in 0 to count - 1.
+    """
+    if isinstance(indices, int):
+        integral, inside = True, 0 <= indices < count
+    elif numpy is not None:
+        indices = numpy.asarray(indices)
+        if indices.dtype.kind in "iub":
+            integral = True
+        else:
+            integral = indices.dtype.kind == "f" and bool((indices == numpy.floor(indices)).all())
+        inside = integral and bool(((indices >= 0) & (indices < count)).all())
+    else:
+        integral = isinstance(indices, float) and indices.is_integer()
+        inside = integral and 0 <= indices < count
+    if not integral:
+        raise KlabIllegalArgumentException(f"geometry: {name} must be whole numbers")
+    if not inside:
+        raise KlabIllegalArgumentException(f"geometry: {name} out of the range 0 to {count - 1}")
+
+
 class Dimension():
+    """
+    A dimension of a geometry. Any attribute or parameter change increments `version`,
+    which is what geometries check to know if their cached encoding is still valid; list
+    parameters must be replaced rather than changed in place for that to work.
+    """
+
     def __init__(self) -> None:
         self.regular = False
         self.dimensionality = 0
@@ -94,18 +167,38 @@ class Dimension():
         self._shape = None
         self.type = None
 
+    def __setattr__(self, name, value):
+        if name == "parameters" and not isinstance(value, _Parameters):
+            value = _Parameters(self, value)
+        object.__setattr__(self, name, value)
+        self.changed()
+
+    def changed(self):
+        self.__dict__["version"] = self.__dict__.get("version", 0) + 1
+
+    def encode(self) -> str:
+        """The encoding of the dimension within a geometry spec, cached until it changes."""
+        cached = self.__dict__.get("_encoding")
+        if cached is None or cached[0] != self.version:
+            cached = (self.version, KlabGeometry.encodeDimension(self))
+            # stored without counting as a change
+            self.__dict__["_encoding"] = cached
+        return cached[1]
+
     def getType(self) -> DimensionType:
         return self.type
 
     def copy(self):
-        ret = Dimension()
-        ret.type = self.type
-        ret.regular = self.regular
-        ret.dimensionality = self.dimensionality
-        if self._shape:
-            ret._shape = self._shape[:]
-        ret.parameters = dict(self.parameters)
-        ret.generic = self.generic
+        # filled in directly, since a copy is made for every geometry read from the cache
+        ret = Dimension.__new__(Dimension)
+        state = ret.__dict__
+        state.update(self.__dict__)
+        state["_shape"] = self._shape[:] if self._shape else None
+        state["parameters"] = _Parameters(ret, {key: value[:] if isinstance(value, list) else value
+                                                for key, value in self.parameters.items()})
+        state["version"] = 0
+        cached = self.__dict__.get("_encoding")
+        state["_encoding"] = (0, cached[1]) if cached is not None and cached[0] == self.version else None
         return ret
 
     def isRegular(self) -> bool:
@@ -122,7 +215,7 @@ class Dimension():
 
     def size(self):
         if self._shape:
-            self.product(self._shape)
+            return self.product(self._shape)
         else:
             return UNDEFINED
 
@@ -142,49 +235,115 @@ class Dimension():
     def shape(self, shape):
         self._shape = shape
     
-    # @Override
-    # public String encode(Encoding... options) {
-    #     return encodeDimension(this);
-    # }
-
-    # // @Override
-    # public long getOffset(long... offsets) {
-
-    #     if (offsets == null) {
-    #         return 0;
-    #     }
-    #     if (offsets.length != dimensionality) {
-    #         throw new KlabIllegalArgumentException("geometry: cannot address a " + dimensionality
-    #                 + "-dimensional extent with an offset array of lenght " + offsets.length);
-    #     }
-    #     if (_shape == null) {
-    #         throw new KlabIllegalArgumentException("geometry: cannot address a geometry with no _shape");
-    #     }
-
-    #     if (offsets.length == 1) {
-    #         return offsets[0];
-    #     }
-
-    #     if (this.type == Type.SPACE && offsets.length == 2) {
-
-    #         /*
-    #             * TODO this is arbitrary and repeats the addressing in Grid. I just can't go
-    #             * over the entire codebase to just use this one at this moment. Should have a
-    #             * centralized offsetting strategy and use that everywhere, configuring it
-    #             * according to and extent types.
-    #             */
-    #         return ((_shape[1] - offsets[1] - 1) * _shape[0]) + offsets[0];
-    #     }
+    def getOffset(self, *offsets):
+        """
+        The offset of a cell from its indices along each axis, as in the engine: for a grid,
+        x from the west and y from the south, with offset 0 at the north-west corner. The
+        indices may be NumPy arrays, which give an array of offsets.
+        """
+        if len(offsets) != self.dimensionality:
+            raise KlabIllegalArgumentException(f"geometry: cannot address a {self.dimensionality}-dimensional "
+                                               f"extent with {len(offsets)} offsets")
+        if self.type == DimensionType.SPACE and len(offsets) == 2:
+            nx, ny = self.gridShape()
+            _checkIndices(offsets[0], nx, "x index")
+            _checkIndices(offsets[1], ny, "y index")
+            return (ny - offsets[1] - 1) * nx + offsets[0]
+        if not self._shape:
+            raise KlabIllegalArgumentException("geometry: cannot address a geometry with no shape")
+        if len(offsets) == 1:
+            return offsets[0]
+        return 0
 
-    #     return 0;
-    # }
+    def getCell(self, offset) -> tuple:
+        """The (x, y) indices of the grid cells at the offsets, the reverse of `getOffset`."""
+        nx, ny = self.gridShape()
+        _checkIndices(offset, nx * ny, "cell offset")
+        return offset % nx, ny - 1 - offset // nx
 
-    # // @Override
-    # // public long getOffset(ILocator index) {
-    # // throw new IllegalArgumentException("getOffset() is not implemented on basic
-    # // geometry
-    # // dimensions");
-    # // }
+    def gridShape(self) -> tuple:
+        """
+        The (x, y) number of cells of the grid: the shape read from the engine or, for a grid
+        built by the client, the cells of the grid resolution that cover the bounding box.
+        """
+        if self.type != DimensionType.SPACE or self.dimensionality != 2:
+            raise KlabIllegalStateException("cells can only be addressed in a two-dimensional space")
+        if self._shape and len(self._shape) == 2:
+            return self._shape[0], self._shape[1]
+        shape = self.resolutionShape()
+        if shape is None:
+            raise KlabIllegalStateException("cells can only be addressed in a grid with a shape, or with a "
+                                            "bounding box and a grid resolution")
+        return shape
+
+    def resolutionShape(self) -> tuple:
+        """
+        The (x, y) number of cells of the grid resolution covering the bounding box, as in
+        `SpatialTiling`, or None without both. Cells are sized in degrees at the center of a
+        lat/lon box, or in meters for other projections.
+        """
+        bbox = self.parameters.get(PARAMETER_SPACE_BOUNDINGBOX)
+        resolution = self.parameters.get(PARAMETER_SPACE_GRIDRESOLUTION)
+        if not bbox or not resolution:
+            return None
+        x1, x2, y1, y2 = bbox
+        if self.parameters.get(PARAMETER_SPACE_PROJECTION) in (None, "EPSG:4326"):
+            dx, dy = KlabSpace.resolutionToDegrees(resolution, (y1 + y2) / 2)
+        else:
+            value, unit = KlabSpace.parseResolution(resolution)
+            if RESOLUTION_UNITS[unit] is None:
+                return None
+            dx = dy = value * RESOLUTION_UNITS[unit]
+        return max(math.ceil((x2 - x1) / dx - 1e-9), 1), max(math.ceil((y2 - y1) / dy - 1e-9), 1)
+
+    def gridBounds(self) -> tuple:
+        bbox = self.parameters.get(PARAMETER_SPACE_BOUNDINGBOX)
+        if not bbox:
+            raise KlabIllegalStateException("cell coordinates need the bounding box of the grid")
+        return bbox
+
+    def getCellSize(self) -> tuple:
+        """The (width, height) of the grid cells, in the units of the bounding box."""
+        nx, ny = self.gridShape()
+        x1, x2, y1, y2 = self.gridBounds()
+        return (x2 - x1) / nx, (y2 - y1) / ny
+
+    def getCellCenter(self, x, y) -> tuple:
+        """Coordinate arrays of the centers of the cells with x and y indices. Needs numpy."""
+        np = requireNumpy()
+        x1, x2, y1, y2 = self.gridBounds()
+        dx, dy = self.getCellSize()
+        return x1 + (np.asarray(x) + 0.5) * dx, y1 + (np.asarray(y) + 0.5) * dy
+
+    def getCellAt(self, x, y) -> tuple:
+        """
+        Index arrays of the cells containing the points with x and y coordinates, -1 for
+        points outside the grid. Raises KlabIllegalArgumentException for NaN or infinite
+        coordinates. Needs numpy.
+        """
+        np = requireNumpy()
+        nx, ny = self.gridShape()
+        x1, x2, y1, y2 = self.gridBounds()
+        dx, dy = self.getCellSize()
+        x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+        if not (np.isfinite(x).all() and np.isfinite(y).all()):
+            raise KlabIllegalArgumentException("geometry: cannot find the cells of non-finite coordinates")
+        # points on the east and north edges go to the last cells
+        ix = np.clip(np.floor((x - x1) / dx), 0, nx - 1).astype(np.int64)
+        iy = np.clip(np.floor((y - y1) / dy), 0, ny - 1).astype(np.int64)
+        outside = (x < x1) | (x > x2) | (y < y1) | (y > y2)
+        return np.where(outside, -1, ix), np.where(outside, -1, iy)
+
+    def getOffsetAt(self, x, y):
+        """
+        Offset array of the cells containing the points with x and y coordinates, -1 for
+        points outside the grid. The offsets index the flattened rows of an exported raster,
+        which start from the north. Needs numpy.
+        """
+        np = requireNumpy()
+        ix, iy = self.getCellAt(x, y)
+        outside = ix < 0
+        return np.where(outside, -1, self.getOffset(np.where(outside, 0, ix), np.where(outside, 0, iy)))
 
     def getParameters(self) -> dict:
         return self.parameters
@@ -249,15 +408,51 @@ class Dimension():
     # }
 
 
+_SPACE_CODES = "Ss\u03c3\u03a3"
+_TIME_CODES = "Tt\u03c4\u03a4"
+_GENERIC_CODES = "\u03c3\u03a3\u03c4\u03a4"
+_REGULAR_CODES = "ST\u03a3\u03a4"
+
+_GEOMETRY_TOKEN = re.compile(r"""
+    (?P<multiple>\#)
+  | (?P<dimension>[A-z\u03c3\u03c4\u03a3\u03a4])(?P<size>[0-9.])
+        (?:\((?P<shape>[^)]*)\))?
+        (?:\{(?P<parameters>[^}]*)\})?
+  | (?P<child>,)
+  | (?P<invalid>[A-z\u03c3\u03c4\u03a3\u03a4].?)
+""", re.VERBOSE | re.DOTALL)
+"""Tokens of a geometry spec: granularity, dimensions with their shape and parameters, and child separators."""
+
+_PARAMETER_KEY = re.compile(r",\s*(\w+)\s*=")
+"""The start of a key=value pair of dimension parameters, up to the value."""
+
+_BARE_TOKEN = re.compile(r",\s*[\w.+-]*\s*(?:,|$)")
+"""A comma-separated token with no key: no value goes on like that, WKT commas are followed by coordinates."""
+
+_NUMBER_START = frozenset("+-.0123456789iInN")
+"""First characters of the strings that int() or float() can convert (including inf and nan)."""
+
+GEOMETRY_CACHE_SIZE = 512
+"""Geometry specs whose parsed form is kept for reuse."""
+
+
 class KlabGeometry():
+    """
+    A geometry made of space and time dimensions. The canonical encoding is computed once
+    and reused until the geometry or any of its dimensions changes; geometries with the
+    same encoding are equal and hash alike, so they can be used as keys (as long as they
+    are not changed while they are).
+    """
+
     def __init__(self) -> None:
         self._scalar = False
         self.granularity = Granularity.SINGLE
         self.dimensions = []
         self.child = None
+        self._encoded = None
 
     def isEmpty(self) -> bool:
-        return not self.scalar and len(self.dimensions) == 0 and self.child == None
+        return not self._scalar and len(self.dimensions) == 0 and self.child == None
 
     def isScalar(self) -> bool:
         return self._scalar
@@ -288,114 +483,122 @@ class KlabGeometry():
         read the geometry defined starting at the i-th character
         """
 
-        ret = KlabGeometry()
-
         if geometry == None or geometry == "X":
             return KlabGeometry.empty()
 
         if geometry == "*":
-            return KlabGeometry._scalar()
-
-        idx = i
-        while idx < len(geometry):
-            c = geometry[idx]
-            if c == '#':
-                ret.granularity = Granularity.MULTIPLE
-            elif (c >= 'A' and c <= 'z') or c == '\u03C3' or c == '\u03C4' or c == '\u03A3' or c == '\u03A4':
-                dimensionality = ret.newDimension()
-                if c == 'S' or c == 's' or c == '\u03C3' or c == '\u03A3':
-                    dimensionality.type = DimensionType.SPACE
-                    if c == '\u03C3' or c == '\u03A3':
-                        dimensionality.generic = True
-                    dimensionality.regular = c == 'S' or c == '\u03A3'
-
-                elif c == 'T' or c == 't' or c == '\u03C4' or c == '\u03A4':
-                    dimensionality.type = DimensionType.TIME
-                    if c == '\u03C4' or c == '\u03A4':
-                        dimensionality.generic = True
-                    dimensionality.regular = c == 'T' or c == '\u03A4'
+            return KlabGeometry.scalar()
 
-                else:
-                    raise KlabIllegalArgumentException(
-                        f"unrecognized geometry dimension identifier {c}")
-
-                idx += 1
-                if geometry[idx] == '.':
-                    dimensionality.dimensionality = NONDIMENSIONAL
-                else:
-                    dimensionality.dimensionality = int(geometry[idx])
-
-                if len(geometry) > (idx + 1) and geometry[idx + 1] == '(':
-                    idx += 2
-                    shape = ""
-                    while geometry[idx] != ')':
-                        shape += geometry[idx]
-                        idx += 1
-
-                    dims = shape.strip().split(",")
-                    sdimss = []
-                    for d in range(0, len(dims)):
-                        dimspec = dims[d].strip()
-                        dsize = NONDIMENSIONAL
-                        if len(dimspec) > 0:
-                            if dimspec == "\u221E":
-                                dsize = INFINITE_SIZE
-                            else:
-                                dsize = int(dimspec)
-
-                        sdimss.append(dsize)
-
-                    dimensionality.dimensionality = len(sdimss)
-                    dimensionality.shape = sdimss
-
-                if len(geometry) > (idx + 1) and geometry[idx + 1] == '{':
-                    idx += 2
-                    shape = ""
-                    while geometry[idx] != '}':
-                        shape += geometry[idx]
-                        idx += 1
-
-                    if len(shape) > 0:
-                        dimensionality.parameters.update(
-                            KlabGeometry.readParameters(shape))
-
-                ret.dimensions.append(dimensionality)
-                idx += 1
-
-            elif c == ',':
-                ret.child = KlabGeometry.makeGeometry(geometry, idx + 1)
-                break
+        # parsed geometries are shared by the cache, so callers get their own copy
+        return _parseGeometry(geometry[i:] if i else geometry).copy()
 
+    def copy(self):
+        ret = KlabGeometry()
+        ret._scalar = self._scalar
+        ret.granularity = self.granularity
+        ret.dimensions = [dim.copy() for dim in self.dimensions]
+        ret.child = self.child.copy() if self.child else None
+        if self._encoded is not None and self._encoded[0] == self.state():
+            # a copy encodes the same, so it starts with the encoding already made
+            ret._encoded = (ret.state(),) + self._encoded[1:]
         return ret
 
     @staticmethod
-    def readParameters(kvs: str) -> dict:
-        ret = {}
-        kvpList = kvs.strip().split(",")
-        for kvp in kvpList:
-            kk = kvp.strip().split("=")
-            if len(kk) != 2:
-                raise KlabIllegalArgumentException(
-                    f"wrong key/value pair in geometry definition: {kvp}")
-
-            key = kk[0].strip()
-            val = kk[1].strip()
-            val = KlabGeometry.decodeForSerialization(val)
-            v = None
-            if val.startswith("[") and val.endswith("]"):
-                # getParameterPODType(key));
-                v = NumberUtils.podArrayFromString(val, r"\s+", None)
-            elif PARAMETER_SPACE_SHAPE != key and NumberUtils.encodesInt(val):
-                v = int(val)
-            elif PARAMETER_SPACE_SHAPE != key and NumberUtils.encodesFloat(val):
-                v = float(val)
+    def parse(geometry: str):
+        """Parse a geometry spec in a single pass over the string."""
+        ret = KlabGeometry()
+        current = ret
+        pos = 0
+        end = len(geometry)
+        while pos < end:
+            match = _GEOMETRY_TOKEN.search(geometry, pos)
+            if match is None:
+                break
+            pos = match.end()
+            kind = match.lastgroup
+            if kind == "multiple":
+                current.granularity = Granularity.MULTIPLE
+            elif kind == "child":
+                current.child = KlabGeometry()
+                current = current.child
+            elif kind == "invalid":
+                raise KlabIllegalArgumentException(f"unrecognized geometry dimension at {match.group()}")
             else:
-                v = val
+                current.dimensions.append(KlabGeometry.readDimension(match))
+        return ret
+
+    @staticmethod
+    def readDimension(match) -> Dimension:
+        code, size, shape, parameters = match.group("dimension", "size", "shape", "parameters")
+        dim = Dimension()
+        if code in _SPACE_CODES:
+            dim.type = DimensionType.SPACE
+        elif code in _TIME_CODES:
+            dim.type = DimensionType.TIME
+        else:
+            raise KlabIllegalArgumentException(f"unrecognized geometry dimension identifier {code}")
+        dim.generic = code in _GENERIC_CODES
+        dim.regular = code in _REGULAR_CODES
+        dim.dimensionality = NONDIMENSIONAL if size == "." else int(size)
+
+        if shape is not None:
+            dim.shape = KlabGeometry.readShape(shape)
+            dim.dimensionality = len(dim.shape)
 
-            ret[key] = v
+        if parameters:
+            dim.parameters.update(KlabGeometry.readParameters(parameters))
+        return dim
+
+    @staticmethod
+    def readShape(shape: str) -> list:
+        sizes = []
+        for dimspec in shape.split(","):
+            dimspec = dimspec.strip()
+            if not dimspec:
+                sizes.append(NONDIMENSIONAL)
+            elif dimspec == "\u221E":
+                sizes.append(INFINITE_SIZE)
+            else:
+                sizes.append(int(dimspec))
+        return sizes
 
+    @staticmethod
+    def readParameters(kvs: str) -> dict:
+        ret = {}
+        # values may hold unescaped commas (as in WKT), so a value only ends where the
+        # next key starts; the leading comma lets the first key match like the others
+        kvs = "," + kvs.strip()
+        keys = list(_PARAMETER_KEY.finditer(kvs))
+        if keys and keys[0].start():
+            raise KlabIllegalArgumentException(f"wrong key/value pair in geometry definition: {kvs[1:keys[0].start()]}")
+        for i, match in enumerate(keys):
+            key = match.group(1)
+            end = keys[i + 1].start() if i + 1 < len(keys) else len(kvs)
+            if "," in kvs[match.end():end] and _BARE_TOKEN.search(kvs, match.end() - 1, end):
+                raise KlabIllegalArgumentException(f"wrong key/value pair in geometry definition: {kvs[match.start() + 1:end]}")
+            val = kvs[match.end():end].strip()
+            if "&" in val:
+                val = KlabGeometry.decodeForSerialization(val)
+            ret[key] = KlabGeometry.readValue(key, val)
+
+        if not ret and len(kvs) > 1:
+            raise KlabIllegalArgumentException(f"wrong key/value pair in geometry definition: {kvs}")
         return ret
 
+    @staticmethod
+    def readValue(key: str, val: str):
+        if val.startswith("[") and val.endswith("]"):
+            # getParameterPODType(key));
+            return NumberUtils.podArrayFromString(val, r"\s+", None)
+        # only values that can be numbers are tried, so long shapes and strings never
+        # go through a failed conversion
+        if key != PARAMETER_SPACE_SHAPE and val and val[0] in _NUMBER_START:
+            if NumberUtils.encodesInt(val):
+                return int(val)
+            if NumberUtils.encodesFloat(val):
+                return float(val)
+        return val
+
     @staticmethod
     def decodeForSerialization(val: str):
         return val.replace("&comma;", ",").replace("&eq;", "=")
@@ -404,111 +607,92 @@ class KlabGeometry():
     def encodeForSerialization(val: str):
         return val.replace(",", "&comma;").replace("=", "&eq;")
 
+    def state(self) -> tuple:
+        """What the encoding depends on, compared to know if a cached encoding is still valid."""
+        return (self._scalar, self.granularity, tuple((dim, dim.version) for dim in self.dimensions),
+                self.child.encode() if self.child else None)
+
     def encode(self) -> str:
         """
         Encode into a string representation. Keys in parameter maps are sorted so the
             results can be compared for equality.
             """
-
+        state = self.state()
+        if self._encoded is None or self._encoded[0] != state:
+            self._encoded = (state, self.computeEncoding(), None)
+        return self._encoded[1]
+
+    def digest(self) -> str:
+        """A short hex digest of the encoding, usable as a compact cache key or file name."""
+        encoded = self.encode()
+        if self._encoded[2] is None:
+            self._encoded = self._encoded[:2] + (hashlib.blake2b(encoded.encode("utf-8"), digest_size=16).hexdigest(),)
+        return self._encoded[2]
+
+    def __eq__(self, other) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, KlabGeometry):
+            return NotImplemented
+        return self.encode() == other.encode()
+
+    def __hash__(self) -> int:
+        return hash(self.encode())
+
+    def __str__(self) -> str:
+        return self.encode()
+
+    def computeEncoding(self) -> str:
         if self.isEmpty():
             return "X"
 
         if self.isScalar():
             return "*"
 
-        dims = self.dimensions[:]
-        dims = sorted(dims, key=functools.cmp_to_key(compareDimensions))
-
-        ret = ""
-        if self.granularity == Granularity.MULTIPLE:
-            ret = "#"
+        dims = sorted(self.dimensions, key=functools.cmp_to_key(compareDimensions))
 
-        for dim in dims:
-            ret += self.encodeDimension(dim)
+        parts = ["#"] if self.granularity == Granularity.MULTIPLE else []
+        parts.extend(dim.encode() for dim in dims)
 
         if self.child:
-            ret += "," + self.child.encode()
+            parts.append("," + self.child.encode())
 
-        return ret
+        return "".join(parts)
 
     @staticmethod
     def encodeDimension(dim: Dimension) -> str:
-        ret = ""
-
         if dim.getType() == DimensionType.SPACE:
             if dim.isGeneric():
-                if dim.isRegular():
-                    ret += "\u03a3"
-                else:
-                    ret += "\u03c3"
+                code = "\u03a3" if dim.isRegular() else "\u03c3"
             else:
-                if dim.isRegular():
-                    ret += "S"
-                else:
-                    ret += "s"
+                code = "S" if dim.isRegular() else "s"
         elif dim.getType() == DimensionType.TIME:
             if dim.isGeneric():
-                if dim.isRegular():
-                    ret += "\u03a4"
-                else:
-                    ret += "\u03c4"
+                code = "\u03a4" if dim.isRegular() else "\u03c4"
             else:
-                if dim.isRegular():
-                    ret += "T"
-                else:
-                    ret += "t"
+                code = "T" if dim.isRegular() else "t"
         else:
             raise NotImplementedError()
 
-        ret += str(dim.getDimensionality())
+        parts = [code, str(dim.getDimensionality())]
 
         sh = dim.shape
         if sh and not KlabGeometry.isUndefined(sh):
-            ret += "("
-            for i in range(0, len(sh)):
-                sep = ","
-                if i == 0:
-                    sep = ""
-                size = str(sh[i])
-                if sh[i] == INFINITE_SIZE:
-                    size = "\u221E"
-                ret += sep + size
-
-            ret += ")"
-
-        if len(dim.getParameters()) > 0:
-            ret += "{"
-            first = True
-
-            keys = sorted(list(dim.getParameters().keys()))
-
-            for key in keys:
-                sep = ","
-                if first:
-                    sep = ""
-                ret += sep + key + "=" + \
-                    KlabGeometry.encodeVal(dim.getParameters().get(key))
-                first = False
-
-            ret += "}"
+            parts.append("(" + ",".join("\u221E" if size == INFINITE_SIZE else str(size) for size in sh) + ")")
 
-        return ret
+        parameters = dim.getParameters()
+        if len(parameters) > 0:
+            parts.append("{" + ",".join(key + "=" + KlabGeometry.encodeVal(parameters[key])
+                                        for key in sorted(parameters)) + "}")
+
+        return "".join(parts)
 
     @staticmethod
     def encodeVal(val: any):
-        ret = ""
         if isinstance(val, list):
-            ret = "["
-            for v in val:
-                sp = " "
-                if len(ret) == 1:
-                    sp = ""
-                ret += sp + str(v)
-            ret += "]"
-        else:
-            ret = KlabGeometry.decodeForSerialization(str(val))
-
-        return ret
+            return "[" + " ".join(str(v) for v in val) + "]"
+        val = str(val)
+        return KlabGeometry.decodeForSerialization(val) if "&" in val else val
 
     @staticmethod
     def isUndefined(shape) -> bool:
@@ -518,12 +702,199 @@ class KlabGeometry():
         return False
 
 
+@functools.lru_cache(maxsize=GEOMETRY_CACHE_SIZE)
+def _parseGeometry(geometry: str) -> KlabGeometry:
+    return KlabGeometry.parse(geometry)
+
+
+METERS_PER_DEGREE = 111320.0
+"""Length of a degree of latitude (and of longitude at the equator), used to convert resolutions."""
+
+RESOLUTION_UNITS = {
+    "m": 1.0,
+    "km": 1000.0,
+    "deg": None,
+    "\u00b0": None
+}
+"""Units accepted in grid resolution strings, with their size in meters (None for degrees)."""
+
+SIMPLIFY_CELL_FRACTION = 0.5
+"""Default tolerance of shape simplification, as a fraction of the grid cell size."""
+
+
 class KlabSpace():
 
     @staticmethod
     def isWKT(urn: str):
         return ("POLYGON" in urn or "POINT" in urn or "LINESTRING" in urn) and "(" in urn and ")" in urn
 
+    @staticmethod
+    def parseResolution(resolution: str) -> tuple:
+        """Split a grid resolution string like "1 km" into its value and unit."""
+        match = re.fullmatch(r"\s*([0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)\s*([^\s0-9]+)\s*", resolution or "")
+        if not match or match.group(2).lower() not in RESOLUTION_UNITS:
+            raise KlabIllegalArgumentException(f"cannot understand grid resolution {resolution}")
+        return float(match.group(1)), match.group(2).lower()
+
+    @staticmethod
+    def resolutionToDegrees(resolution: str, latitude: float = 0.0) -> tuple:
+        """
+        Return the (x, y) size in degrees of the cells of a lat/lon grid with the passed
+        resolution, using a spherical approximation at the passed latitude.
+        """
+        value, unit = KlabSpace.parseResolution(resolution)
+        meters = RESOLUTION_UNITS[unit]
+        if meters is None:
+            return value, value
+        dy = value * meters / METERS_PER_DEGREE
+        return dy / max(math.cos(math.radians(latitude)), 1e-6), dy
+
+    @staticmethod
+    def wktRings(wkt: str) -> list:
+        """
+        Return the coordinate sequences (rings, lines or points) in a WKT string, optionally
+        preceded by the k.LAB projection prefix, as lists of (x, y) tuples.
+        """
+        rings = []
+        for ring in re.findall(r"\(([^()]+)\)", wkt):
+            values = [float(v) for v in ring.replace(",", " ").split()]
+            points = ring.count(",") + 1
+            step = len(values) // points
+            rings.append([(values[i], values[i + 1]) for i in range(0, step * points, step)])
+        return rings
+
+    @staticmethod
+    def wktBounds(wkt: str) -> tuple:
+        """Bounding box of a WKT string as [minX, maxX, minY, maxY]."""
+        points = [p for ring in KlabSpace.wktRings(wkt) for p in ring]
+        if not points:
+            raise KlabIllegalArgumentException(f"no coordinates in WKT {wkt}")
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        return min(xs), max(xs), min(ys), max(ys)
+
+    @staticmethod
+    def simplifyShape(shape: str, resolution: str = None, cellFraction: float = SIMPLIFY_CELL_FRACTION,
+                      tolerance: float = None) -> str:
+        """
+        Simplify a WKT or hex WKB shape, keeping its encoding. The tolerance is `tolerance`
+        in the units of the shape if passed, else `cellFraction` of the cells of a grid with
+        the passed resolution. Shapes without a projection are taken as lat/lon. Needs numpy.
+        """
+        decoded = Shape.parse(KlabGeometry.decodeForSerialization(shape))
+        if tolerance is None:
+            if not resolution:
+                raise KlabIllegalArgumentException("simplifying a shape needs a tolerance or a grid resolution")
+            value, unit = KlabSpace.parseResolution(resolution)
+            if decoded.projection in (None, "EPSG:4326"):
+                minX, maxX, minY, maxY = decoded.bounds()
+                cell = min(KlabSpace.resolutionToDegrees(resolution, (minY + maxY) / 2))
+            else:
+                cell = value * (RESOLUTION_UNITS[unit] or METERS_PER_DEGREE)
+            tolerance = cell * cellFraction
+        simplified = decoded.simplify(tolerance)
+        return simplified.toWkt() if KlabSpace.isWKT(shape) else simplified.toWkb()
+
+
+MILLIS_PER_DAY = 86400000
+"""Milliseconds in a day, ignoring leap seconds as epoch time does."""
+
+_FIXED_STEPS = {
+    TimeResolutionType.WEEK: 7 * MILLIS_PER_DAY,
+    TimeResolutionType.DAY: MILLIS_PER_DAY,
+    TimeResolutionType.HOUR: 3600000,
+    TimeResolutionType.MINUTE: 60000,
+    TimeResolutionType.SECOND: 1000,
+    TimeResolutionType.MILLISECOND: 1,
+}
+
+_YEAR_STEPS = {
+    TimeResolutionType.MILLENNIUM: 1000,
+    TimeResolutionType.CENTURY: 100,
+    TimeResolutionType.DECADE: 10,
+    TimeResolutionType.YEAR: 1,
+}
+
+
+class KlabTime():
+    """
+    UTC epoch milliseconds of calendar boundaries, computed with integer arithmetic
+    instead of datetime so that the same code works on ints and on NumPy arrays of them.
+    """
+
+    @staticmethod
+    def daysFromCivil(year, month, day):
+        """Days from 1970-01-01 to the date in the proleptic Gregorian calendar."""
+        # years start in March, so that the leap day is the last day of the year
+        y = year - (month <= 2)
+        era = y // 400
+        yearOfEra = y - era * 400
+        dayOfYear = (153 * ((month + 9) % 12) + 2) // 5 + day - 1
+        dayOfEra = yearOfEra * 365 + yearOfEra // 4 - yearOfEra // 100 + dayOfYear
+        return era * 146097 + dayOfEra - 719468
+
+    @staticmethod
+    def startOfDay(year, month, day):
+        return KlabTime.daysFromCivil(year, month, day) * MILLIS_PER_DAY
+
+    @staticmethod
+    def startOfMonth(year, month):
+        return KlabTime.startOfDay(year, month, 1)
+
+    @staticmethod
+    def startOfYear(year):
+        return KlabTime.startOfDay(year, 1, 1)
+
+    @staticmethod
+    def daysInMonth(year, month):
+        """The number of days of the month, for ints or arrays of them."""
+        months = year * 12 + month
+        return KlabTime.daysFromCivil(months // 12, months % 12 + 1, 1) - KlabTime.daysFromCivil(year, month, 1)
+
+    @staticmethod
+    def stepStart(resolution: TimeResolutionType, step, year: int, month: int = 1, day: int = 1):
+        """
+        The start of the step-th period of the resolution from year-month-day, for an int
+        step or an array of steps. Months and years keep the day of the month, or stop at
+        the last day of shorter months: one month from January 31 is February 28 or 29.
+        """
+        if resolution in _YEAR_STEPS:
+            year = year + step * _YEAR_STEPS[resolution]
+        elif resolution == TimeResolutionType.MONTH:
+            months = year * 12 + month - 1 + step
+            year, month = months // 12, months % 12 + 1
+        else:
+            return KlabTime.startOfDay(year, month, day) + step * _FIXED_STEPS[resolution]
+        if day > 28:
+            lengths = KlabTime.daysInMonth(year, month)
+            day = min(day, lengths) if isinstance(lengths, int) else numpy.minimum(day, lengths)
+        return KlabTime.startOfDay(year, month, day)
+
+    @staticmethod
+    def boundaries(resolution: TimeResolutionType, count: int, multiplier: int = 1, year: int = 1970,
+                   month: int = 1, day: int = 1) -> list:
+        """
+        The count + 1 boundaries of count periods of `multiplier` resolution units from
+        year-month-day, start to end, as ints: the transitions of a time grid.
+        """
+        if numpy is not None:
+            return KlabTime.boundaryArray(resolution, count, multiplier, year, month, day).tolist()
+        return [KlabTime.stepStart(resolution, i * multiplier, year, month, day) for i in range(count + 1)]
+
+    @staticmethod
+    def boundaryArray(resolution: TimeResolutionType, count: int, multiplier: int = 1, year: int = 1970,
+                      month: int = 1, day: int = 1):
+        """Same as `boundaries()`, as an int64 array computed in one pass. Needs numpy."""
+        np = requireNumpy()
+        return KlabTime.stepStart(resolution, np.arange(count + 1, dtype=np.int64) * multiplier, year, month, day)
+
+    @staticmethod
+    def periods(resolution: TimeResolutionType, count: int, multiplier: int = 1, year: int = 1970,
+                month: int = 1, day: int = 1):
+        """The (count, 2) int64 array of the [start, end] of each period. Needs numpy."""
+        boundaries = KlabTime.boundaryArray(resolution, count, multiplier, year, month, day)
+        return numpy.column_stack((boundaries[:-1], boundaries[1:]))
+
 
 class SpaceBuilder():
     def __init__(self, space: Dimension) -> None:
@@ -605,6 +976,24 @@ class TimeBuilder():
         self.time.regular = False
         return self
 
+    def transitions(self, transitions: list):
+        """
+        A grid of the periods between consecutive transitions, in epoch milliseconds from
+        start to end. Lists and NumPy arrays are accepted.
+        """
+        transitions = transitions.tolist() if hasattr(transitions, "tolist") else list(transitions)
+        if len(transitions) < 2:
+            raise KlabIllegalArgumentException("a time grid needs at least two transitions")
+        self.time.parameters[PARAMETER_TIME_TRANSITIONS] = transitions
+        # start and end are floats, as years() writes them
+        return self.start(float(transitions[0])).end(float(transitions[-1])).size(len(transitions) - 1)
+
+    def steps(self, resolution: TimeResolutionType, count: int, multiplier: int = 1, year: int = 1970,
+              month: int = 1, day: int = 1):
+        """A grid of count periods of `multiplier` resolution units from year-month-day."""
+        boundaries = KlabTime.boundaries(resolution, count, multiplier, year, month, day)
+        return self.transitions(boundaries).resolution(resolution, multiplier)
+
     def build(self) -> Dimension:
         return self.time
 
@@ -613,6 +1002,7 @@ class GeometryBuilder():
     def __init__(self) -> None:
         self._space = None
         self._time = None
+        self._simplify = None
 
     def region(self, urn: str):
         """
@@ -621,9 +1011,9 @@ class GeometryBuilder():
         by the EPSG: projection). The resulting
         """
         if KlabSpace.isWKT(urn):
-            self.space().shape(urn).size(1).build()
+            self.space().shape(urn).sizeN(1).build()
         else:
-            self.space().urn(urn).size(1).build()
+            self.space().urn(urn).sizeN(1).build()
         return self
 
     def grid(self, x1: float = None, x2: float = None, y1: float = None, y2: float = None, resolution: str = None,
@@ -640,7 +1030,7 @@ class GeometryBuilder():
         resolution. The string may also specify a WKT polygon using the k.LAB
         conventions (preceded by the EPSG: projection).
         """
-        if x1 and x2 and y1 and y2:
+        if x1 is not None and x2 is not None and y1 is not None and y2 is not None:
             if resolution:
                 self.space().regular().resolution(resolution).boundingBox(x1, x2, y1, y2).build()
             else:
@@ -668,10 +1058,19 @@ class GeometryBuilder():
             
             return self
 
+    def simplify(self, cellFraction: float = SIMPLIFY_CELL_FRACTION, tolerance: float = None):
+        """
+        Simplify the WKT or WKB shape of the space when building, dropping the vertices that
+        move its outline by less than `cellFraction` of a grid cell, or by less than an
+        explicit `tolerance` in the units of the shape. A detailed boundary then costs no
+        more to send and rasterize than the grid can show. Needs numpy.
+        """
+        self._simplify = (cellFraction, tolerance)
+        return self
+
     def startOfYear(self, i: int):
-        utcStart = datetime.datetime.strptime(
-            f"{i}-01-01 00:00", "%Y-%m-%d %H:%M").replace(tzinfo=datetime.timezone.utc)
-        return utcStart.timestamp() * 1000
+        # a float, as the timestamps of datetime were, so that encodings do not change
+        return float(KlabTime.startOfYear(i))
 
     def space(self) -> SpaceBuilder:
         self._space = Dimension()
@@ -688,9 +1087,207 @@ class GeometryBuilder():
     def build(self) -> KlabGeometry:
         ret = KlabGeometry()
         if self._space:
+            shape = self._space.parameters.get(PARAMETER_SPACE_SHAPE)
+            if shape and self._simplify:
+                cellFraction, tolerance = self._simplify
+                simplified = KlabSpace.simplifyShape(shape, self._space.parameters.get(PARAMETER_SPACE_GRIDRESOLUTION),
+                                                     cellFraction, tolerance)
+                self._space.parameters[PARAMETER_SPACE_SHAPE] = KlabGeometry.encodeForSerialization(simplified)
             ret.addDimension(self._space)
 
         if self._time:
             ret.addDimension(self._time)
 
         return ret
+
+
+_TEMPLATE_MARKER = "\x00"
+
+
+class BulkGeometryBuilder():
+    """
+    Encoded geometries for many regions or points sharing time and grid resolution, the
+    same that `GeometryBuilder` would build and encode one at a time:
+
+        specs = BulkGeometryBuilder(resolution="1 km").years(2010).boxes(x1, x2, y1, y2)
+        for spec in specs:
+            klab.submit(Observable.create("earth:Region"), spec)
+
+    Coordinates are lists or NumPy arrays. The part of the specs they share is encoded once
+    and the coordinates are formatted into it in a single pass.
+    """
+
+    def __init__(self, resolution: str = None) -> None:
+        self.resolution = resolution
+        self._years = ()
+
+    def years(self, *years: int):
+        """The time of all geometries, as in `GeometryBuilder.years`."""
+        self._years = years
+        return self
+
+    def template(self, builder: GeometryBuilder, parameter: str, value: str) -> str:
+        """
+        Encode the builder's geometry with `value` for the space parameter, as a format
+        string with the rest escaped.
+        """
+        if self._years:
+            builder.years(*self._years)
+        builder._space.parameters[parameter] = _TEMPLATE_MARKER
+        encoded = builder.build().encode().replace("{", "{{").replace("}", "}}")
+        return encoded.replace(_TEMPLATE_MARKER, value)
+
+    @staticmethod
+    def columns(*columns) -> list:
+        values = [column.tolist() if hasattr(column, "tolist") else list(column) for column in columns]
+        if len({len(column) for column in values}) > 1:
+            raise KlabIllegalArgumentException("coordinate arrays of different length")
+        return values
+
+    def boxes(self, x1, x2, y1, y2) -> list:
+        """Encoded grids over the lat/lon bounding boxes, one per element of the arrays."""
+        if not self.resolution:
+            raise KlabIllegalArgumentException("grids need a resolution")
+        builder = GeometryBuilder().grid(0, 0, 0, 0, resolution=self.resolution)
+        template = self.template(builder, PARAMETER_SPACE_BOUNDINGBOX, "[{} {} {} {}]")
+        return list(map(template.format, *BulkGeometryBuilder.columns(x1, x2, y1, y2)))
+
+    def points(self, x, y, projection: str = "EPSG:4326") -> list:
+        """Encoded point regions, as `GeometryBuilder().region()` of a POINT, one per element of the arrays."""
+        builder = GeometryBuilder().region(f"{projection} POINT(0 0)")
+        template = self.template(builder, PARAMETER_SPACE_SHAPE, f"{projection} POINT({{}} {{}})")
+        return list(map(template.format, *BulkGeometryBuilder.columns(x, y)))
+
+
+_SLOT = re.compile(r"\{([A-Z][A-Z0-9_]*)\}")
+"""A slot in a geometry template, like {BOUNDING_BOX}."""
+
+
+class GeometryTemplate():
+    """
+    A geometry spec with slots to fill, parsed once:
+
+        template = GeometryTemplate("S2({GRID_RESOLUTION_XY}){bbox=[{BOUNDING_BOX}],proj=EPSG:4326}")
+        filled = template.fill(GRID_RESOLUTION_XY="520,297", BOUNDING_BOX=[-7.25, -4.4, 38.39, 40.02])
+        klab.submit(Observable.create("earth:Region"), filled.encode())
+
+    Everything but the slots is parsed with the template and copied into each geometry;
+    only the shapes and parameter values with slots are read again, when the geometry of
+    an instance is asked for.
+    """
+
+    def __init__(self, template: str) -> None:
+        self.template = template
+        self.slots = frozenset(_SLOT.findall(template))
+        self.format = GeometryTemplate.toFormat(template)
+        # slots masked with the same length, so that positions in the template and in the
+        # masked copy match and values can hold anything
+        masked = _SLOT.sub(lambda match: "\x01" * len(match.group()), template)
+        self.parts = []
+        for match in _GEOMETRY_TOKEN.finditer(masked):
+            kind = match.lastgroup
+            if kind == "invalid":
+                raise KlabIllegalArgumentException(f"unrecognized geometry dimension at {match.group()}")
+            if kind in ("multiple", "child"):
+                self.parts.append((kind, None))
+            else:
+                self.parts.append(("dimension", _DimensionTemplate(template, match)))
+
+    @staticmethod
+    def toFormat(template: str) -> str:
+        """The template as a format string: slots become fields and everything else is escaped."""
+        # split() alternates literal text and slot names
+        return "".join(piece.replace("{", "{{").replace("}", "}}") if i % 2 == 0 else "{" + piece + "}"
+                       for i, piece in enumerate(_SLOT.split(template)))
+
+    @staticmethod
+    def value(value) -> str:
+        if isinstance(value, (list, tuple)):
+            return " ".join(str(v) for v in value)
+        return str(value)
+
+    def fill(self, **values):
+        """The geometry with the slots filled by the values, lists becoming space-separated."""
+        if values.keys() != self.slots:
+            raise KlabIllegalArgumentException(f"geometry template needs values for {sorted(self.slots)}, "
+                                               f"got {sorted(values)}")
+        return FilledGeometry(self, {slot: GeometryTemplate.value(value) for slot, value in values.items()})
+
+    def build(self, values: dict) -> KlabGeometry:
+        ret = KlabGeometry()
+        current = ret
+        for kind, part in self.parts:
+            if kind == "multiple":
+                current.granularity = Granularity.MULTIPLE
+            elif kind == "child":
+                current.child = KlabGeometry()
+                current = current.child
+            else:
+                current.dimensions.append(part.fill(values))
+        return ret
+
+
+class _DimensionTemplate():
+    """A dimension of a template: parsed without its slotted shape and parameters, which are read on filling."""
+
+    def __init__(self, template: str, match) -> None:
+        shape, parameters = match.group("shape"), match.group("parameters")
+        self.shape = None
+        if shape is not None and "\x01" in shape:
+            self.shape = GeometryTemplate.toFormat(template[match.start("shape"):match.end("shape")])
+            shape = None
+        # parameter values are cut as the parser does, on the masked text where slots have no commas
+        self.parameters = {}
+        fixed = []
+        if parameters:
+            offset = match.start("parameters") - 1
+            kvs = "," + parameters
+            keys = list(_PARAMETER_KEY.finditer(kvs))
+            for i, key in enumerate(keys):
+                end = keys[i + 1].start() if i + 1 < len(keys) else len(kvs)
+                if "\x01" in kvs[key.end():end]:
+                    value = template[offset + key.end():offset + end].strip()
+                    self.parameters[key.group(1)] = GeometryTemplate.toFormat(value)
+                else:
+                    fixed.append(template[offset + key.start() + 1:offset + end])
+        spec = match.group("dimension") + match.group("size")
+        if shape is not None:
+            spec += "(" + shape + ")"
+        if fixed:
+            spec += "{" + ",".join(fixed) + "}"
+        self.dimension = KlabGeometry.readDimension(_GEOMETRY_TOKEN.match(spec))
+
+    def fill(self, values: dict) -> Dimension:
+        ret = self.dimension.copy()
+        if self.shape is not None:
+            ret.shape = KlabGeometry.readShape(self.shape.format_map(values))
+            ret.dimensionality = len(ret.shape)
+        for key, value in self.parameters.items():
+            value = value.format_map(values).strip()
+            if "&" in value:
+                value = KlabGeometry.decodeForSerialization(value)
+            ret.parameters[key] = KlabGeometry.readValue(key, value)
+        return ret
+
+
+class FilledGeometry():
+    """A geometry made from a `GeometryTemplate`: its spec right away, the parsed geometry when asked for."""
+
+    def __init__(self, template: GeometryTemplate, values: dict) -> None:
+        self.template = template
+        self.values = values
+        self.spec = template.format.format_map(values)
+        self._geometry = None
+
+    def encode(self) -> str:
+        """The filled spec, ready to submit."""
+        return self.spec
+
+    @property
+    def geometry(self) -> KlabGeometry:
+        if self._geometry is None:
+            self._geometry = self.template.build(self.values)
+        return self._geometry
+
+    def __str__(self) -> str:
+        return self.spec
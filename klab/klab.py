@@ -33,6 +33,7 @@ class Klab:
         else:
             self.engine = Engine(url)
             self.engine.authenticate()
+        self.store = None
 
     @staticmethod
     def create(remoteOrLocalEngineUrl=DEFAULT_LOCAL_ENGINE_URL, username=None, password=None, credentialsFile=None):
@@ -103,6 +104,13 @@ class Klab:
         if self.engine.isOnline():
             return self.engine.close()
 
+    def useStore(self, store):
+        """
+        Record the contexts and observations made from now on in an `ObservationStore`,
+        or stop recording them if None is passed.
+        """
+        self.store = store
+
     def submit(self, contextType: Observable,  geometry: KlabGeometry, *arguments: list) -> TicketHandler:
         """
         Call with a concept and geometry to create the context observation (accepting all costs) and
@@ -110,7 +118,8 @@ class Klab:
 
         @param contextType the type of the context. The Explorer sets that as earth:Region by
             default.
-        @param geometry the geometry for the context. Use {@link GeometryBuilder} to create fluently.
+        @param geometry the geometry for the context. Use {@link GeometryBuilder} to create fluently,
+            or pass an encoded geometry such as those made by {@link BulkGeometryBuilder}.
         @param arguments pass semantic types for further observations to be made in the context (if
             passed, the task will finish after all have been computed). Strings will be
             interpreted as scenario URNs.
@@ -118,7 +127,7 @@ class Klab:
 
         request = ContextRequest()
         request.contextType = str(contextType)
-        request.geometry = geometry.encode()
+        request.geometry = geometry if isinstance(geometry, str) else geometry.encode()
         request.estimate = False
 
         LOGGER.debug(f"klab submit with: {request}")
@@ -133,7 +142,7 @@ class Klab:
             ticket = self.engine.submitContext(request)
             if ticket:
                 LOGGER.debug(f"got ticket: {ticket}")
-                return TicketHandler(self.engine, ticket.id, None)
+                return TicketHandler(self.engine, ticket.id, None, self.store, geometry)
 
         raise KlabIllegalArgumentException(
             f"Cannot build observation request from arguments: {arguments}")
@@ -147,7 +156,7 @@ class Klab:
         ticket = self.engine.submitEstimate(estimate.estimateId)
         if ticket:
             LOGGER.debug(f"got ticket: {ticket}")
-            return TicketHandler(self.engine, ticket.id, None)
+            return TicketHandler(self.engine, ticket.id, None, self.store)
 
         raise KlabIllegalStateException("estimate cannot be used")
 
@@ -159,7 +168,8 @@ class Klab:
 
         @param contextType the type of the context. The Explorer sets that as earth:Region by
                default.
-        @param geometry the geometry for the context. Use {@link GeometryBuilder} to create fluently.
+        @param geometry the geometry for the context. Use {@link GeometryBuilder} to create fluently,
+               or pass an encoded geometry such as those made by {@link BulkGeometryBuilder}.
         @param arguments pass observables for further observations to be made in the context (if
                passed, the task will finish after all have been computed). Strings will be
                interpreted as scenario URNs.
@@ -168,7 +178,7 @@ class Klab:
         """
         request = ContextRequest()
         request.contextType = str(contextType)
-        request.geometry = geometry.encode()
+        request.geometry = geometry if isinstance(geometry, str) else geometry.encode()
         request.estimate = True
 
         LOGGER.debug(f"klab submit with: {request}")
@@ -1,91 +1,144 @@
 from .exceptions import KlabIllegalStateException
+from .shapes import numpy, requireNumpy
 from .utils import NumberUtils
+import numbers
+
+MAX_INTERNED_OBSERVABLES = 65536
+"""Maximum number of distinct observables kept by `Observable` to share equal instances."""
 
 
 class Range():
+    """
+    Immutable interval of numbers, with optionally exclusive and infinite bounds. Ranges
+    are hashable and compare by value, so they can key dicts and sets.
+    """
+
+    __slots__ = ("lowerBound", "upperBound", "lowerInfinite", "upperInfinite", "lowerExclusive",
+                 "upperExclusive", "_key")
 
     def __init__(self, lower: float = None, upper: float = None, lowerExclusive: bool = None,
                  upperExclusive: bool = None):
-        self.lowerInfinite = True
-        self.upperInfinite = True
-        self.lowerBound = NumberUtils.NEGATIVE_INFINITY
-        if lower:
-            self.lowerBound = lower
-            self.lowerInfinite = False
-
-        self.upperBound = NumberUtils.POSITIVE_INFINITY
-        if upper:
-            self.upperBound = upper
-            self.upperInfinite = False
-
-        self.lowerExclusive = False
-        if lowerExclusive:
-            self.lowerExclusive = lowerExclusive
-        self.upperExclusive = False
-        if upperExclusive:
-            self.upperExclusive = upperExclusive
-    
+        lowerInfinite = lower is None or lower == NumberUtils.NEGATIVE_INFINITY
+        upperInfinite = upper is None or upper == NumberUtils.POSITIVE_INFINITY
+        assign = object.__setattr__
+        assign(self, "lowerInfinite", lowerInfinite)
+        assign(self, "upperInfinite", upperInfinite)
+        assign(self, "lowerBound", NumberUtils.NEGATIVE_INFINITY if lowerInfinite else lower)
+        assign(self, "upperBound", NumberUtils.POSITIVE_INFINITY if upperInfinite else upper)
+        assign(self, "lowerExclusive", bool(lowerExclusive))
+        assign(self, "upperExclusive", bool(upperExclusive))
+        assign(self, "_key", (self.lowerBound, self.lowerExclusive, self.upperBound, self.upperExclusive))
+
+    def __setattr__(self, name, value):
+        raise KlabIllegalStateException("ranges cannot be modified")
+
     def getLowerBound(self):
         return self.lowerBound
-    
+
     def getUpperBound(self):
         return self.upperBound
-    
+
     def __eq__(self, other: object) -> bool:
-        if id(self) == id(other):
+        if self is other:
             return True
-        if other == None:
-            return False
         if not isinstance(other, Range):
             return False
-        if self.lowerInfinite != other.lowerInfinite:
-            return False
-        if self.lowerBound != other.lowerBound:
-            return False
-        if self.lowerExclusive != other.lowerExclusive:
-            return False
-        if self.upperInfinite != other.upperInfinite:
-            return False
-        if self.upperBound != other.upperBound:
-            return False
-        if self.upperExclusive != other.upperExclusive:
-            return False
-        return True
-    
-    def contains(self, other) -> bool:
-        if self == other:
-            return True
-        
-        if not self.lowerInfinite and not other.lowerInfinite:
-            # check lower
-            if self.lowerBound >= other.lowerBound if self.lowerExclusive else self.lowerBound > other.lowerBound:
-                return False
-
-        if not self.upperInfinite and not other.upperInfinite:
-            if self.upperBound <= other.upperBound if self.upperExclusive else self.upperBound < other.upperBound:
-                return False
-        
-        if not self.upperInfinite and other.upperInfinite:
-            return False
-        
-        if not self.lowerInfinite and other.lowerInfinite:
-            return False
-        
-        return True
-    
+        return self._key == other._key
+
+    def __hash__(self) -> int:
+        return hash(self._key)
+
+    def __reduce__(self):
+        return (Range, (self.lowerBound, self.upperBound, self.lowerExclusive, self.upperExclusive))
+
+    def __repr__(self) -> str:
+        return f"Range({self.lowerBound}, {self.upperBound}, {self.lowerExclusive}, {self.upperExclusive})"
+
+    def contains(self, other):
+        """
+        Check if a range or a number lies in this range. Arrays of numbers, (n, 2) arrays of
+        closed [lower, upper] bounds and lists of ranges are checked all at once, returning a
+        numpy array of booleans (numpy required).
+        """
+        if isinstance(other, Range):
+            return self == other or self._containsBounds(other.lowerBound, other.upperBound,
+                                                         other.lowerExclusive, other.upperExclusive)
+        if isinstance(other, (int, float)):
+            return self._containsBounds(other, other, False, False)
+        if isinstance(other, numbers.Real) or getattr(other, "ndim", None) == 0:
+            # numpy scalars, which are registered as real numbers, and 0-d arrays
+            value = float(other)
+            return self._containsBounds(value, value, False, False)
+        return self._containsBounds(*Range.boundArrays(other))
+
+    @staticmethod
+    def boundArrays(values) -> tuple:
+        """
+        Turn numbers, (n, 2) bounds or ranges into arrays of lower and upper bounds and
+        of their exclusivity, as compared by `contains`.
+        """
+        requireNumpy()
+        if len(values) and isinstance(values[0], Range):
+            keys = numpy.array([r._key for r in values], dtype=float)
+            return keys[:, 0], keys[:, 2], keys[:, 1] != 0, keys[:, 3] != 0
+        values = numpy.asarray(values, dtype=float)
+        if values.ndim == 2:
+            return values[:, 0], values[:, 1], False, False
+        return values, values, False, False
+
+    def _containsBounds(self, lower, upper, lowerExclusive, upperExclusive):
+        # a bound equal to ours is inside unless ours excludes it and the other includes it;
+        # comparing with the infinities stands in for the infinite flags
+        lowerInside = (lower > self.lowerBound) | (lower == self.lowerBound) & \
+            ((self.lowerInfinite or not self.lowerExclusive) | lowerExclusive)
+        upperInside = (upper < self.upperBound) | (upper == self.upperBound) & \
+            ((self.upperInfinite or not self.upperExclusive) | upperExclusive)
+        return lowerInside & upperInside
+
 
 class Observable():
     """
     Textual peer of a true observable with fluent API and minimal validation.
     Used to discriminate observables in inputs of the observation functions.
+
+    Observables are immutable: each modifier returns a new observable. Equal observables
+    are interned into one instance, which hashes and prints from its cached string.
     """
 
-    def __init__(self, s: str):
-        self._semantics = s
-        self._name = None
-        self._unit = None
-        self._value = None
-        self._range = None
+    __slots__ = ("_semantics", "_name", "_unit", "_value", "_range", "_string", "_key")
+
+    _interned = {}
+
+    def __new__(cls, s: str, name: str = None, unit: str = None, value: any = None, range: Range = None):
+        string = ""
+        if value:
+            string += f"{value} as "
+        string += s
+        if range:
+            string += f" {range.getLowerBound()} to {range.getUpperBound()}"
+        if unit:
+            string += f" in {unit}"
+        if name:
+            string += f" named {name}"
+
+        key = (string, range)
+        ret = Observable._interned.get(key)
+        if ret is None:
+            ret = object.__new__(cls)
+            assign = object.__setattr__
+            assign(ret, "_semantics", s)
+            assign(ret, "_name", name)
+            assign(ret, "_unit", unit)
+            assign(ret, "_value", value)
+            assign(ret, "_range", range)
+            assign(ret, "_string", string)
+            assign(ret, "_key", key)
+            if len(Observable._interned) < MAX_INTERNED_OBSERVABLES:
+                Observable._interned[key] = ret
+        return ret
+
+    def __setattr__(self, name, value):
+        raise KlabIllegalStateException("observables cannot be modified; modifiers return a new observable")
 
     @staticmethod
     def create(s):
@@ -94,45 +147,58 @@ class Observable():
     def named(self, name):
         if self._name:
             raise KlabIllegalStateException("cannot add modifiers more than once")
-        
-        self._name = name
-        return self
-    
+
+        return Observable(self._semantics, name, self._unit, self._value, self._range)
+
     def range(self, range: Range):
         if self._unit or self._range:
             raise KlabIllegalStateException("cannot add modifiers more than once")
 
-        self._range = range
-        return self
-    
+        return Observable(self._semantics, self._name, self._unit, self._value, range)
 
     def value(self, value: any):
         if self._value:
             raise KlabIllegalStateException("cannot add modifiers more than once")
-        
-        self._value = value
-        return self
+
+        return Observable(self._semantics, self._name, self._unit, value, self._range)
 
     def unit(self, unit):
         """Pass a valid unit or currency. No validation is done."""
         if self._unit or self._range:
             raise KlabIllegalStateException("cannot add modifiers more than once")
-        
-        self._unit = unit
-        return self
+
+        return Observable(self._semantics, self._name, unit, self._value, self._range)
 
     def __str__(self) -> str:
-        string = ""
-        if self._value:
-            string += f"{self._value} as "
-        string += self._semantics
-        if self._range:
-            string += f" {self._range.getLowerBound()} to {self._range.getUpperBound()}"
-        if self._unit:
-            string += f" in {self._unit}"
-        if self._name:
-            string += f" named {self._name}"
-        return string
+        return self._string
+
+    def __repr__(self) -> str:
+        return f"Observable({self._string!r})"
+
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, Observable):
+            return NotImplemented
+        return self._key == other._key
+
+    def __hash__(self) -> int:
+        return hash(self._key)
+
+    def __reduce__(self):
+        return (Observable, (self._semantics, self._name, self._unit, self._value, self._range))
 
     def getName(self):
         return self._name
+
+    def getSemantics(self) -> str:
+        return self._semantics
+
+    def getUnit(self):
+        return self._unit
+
+    def getValue(self):
+        return self._value
+
+    def getRange(self) -> Range:
+        return self._range
@@ -9,6 +9,9 @@ import klab.engine as E
 from .ticket import Estimate, Ticket
 from .types import ObservationType, ValueType
 from .references import ObservationReference
+from .codec import dumps
+from .sweep import ScenarioSweep, DEFAULT_MAX_CONCURRENCY
+from .catalog import ObservationCatalog, fetchAll
 
 
 class ObservationExportFormat():
@@ -174,8 +177,8 @@ class ObservationRequest():
             "estimate": self._estimate,
             "estimatedCost": self._estimatedCost,
             "scenarios": list(self._scenarios),  # ensure it's a list
-            "states": list(self._states),
-            "objects": list(self._objects)
+            "states": dict(self._states),
+            "objects": dict(self._objects)
         }
 
         # Include searchContextId if present
@@ -184,24 +187,8 @@ class ObservationRequest():
 
         return ret
 
-    def toJson(self):
-        es = str(self._estimate).lower()
-
-        scen = [str(s) for s in self._scenarios]
-        scen = str(scen).replace("'", "\"")
-
-        st = str(self._states).replace("'", "\"")
-        ob = str(self._objects).replace("'", "\"")
-
-        scId = ""
-        if self.searchContextId:
-            scId = """"contextSearchId":"{0}", """.format(self.searchContextId)
-
-        ret = """{{"urn":"{0}","contextId":"{1}",{2}"estimate":{3},"estimatedCost":{4},"scenarios":{5},"states":{6},"objects":{7}}}"""
-        ret = ret.format(self._urn, self._contextId, scId, es, self._estimatedCost, scen, st, ob)
-
-        ret = ret.encode('utf-8').decode('unicode-escape')
-        return ret
+    def toJson(self) -> str:
+        return dumps(self.toDict())
 
     @property
     def urn(self) -> str:
@@ -291,22 +278,10 @@ class ContextRequest():
             "scenarios": [str(s) for s in self._scenarios],
             "estimate": self._estimate,
             "estimatedCost": self._estimatedCost
-    }
-        
-    def toJson(self):
-        es = str(self._estimate).lower()
-        obs = [str(o) for o in self._observables]
-        obs = str(obs).replace("'", "\"")
-        scen = [str(s) for s in self._scenarios]
-        scen = str(scen).replace("'", "\"")
-        urn = "null" if self._urn is None else self._urn
-
-        ret = """{{"geometry":"{0}","contextType":"{1}","observables":{2},"scenarios":{3},"estimate":{4},"estimatedCost":{5}, "urn": {6}}}"""
-        ret = ret.format(self._geometry, self._contextType,
-                         obs, scen, es, self._estimatedCost, urn)
-
-        ret = ret.encode('utf-8').decode('unicode-escape')
-        return ret
+        }
+
+    def toJson(self) -> str:
+        return dumps(self.toDict())
 
     @property
     def geometry(self) -> str:
@@ -377,23 +352,35 @@ class Context(Observation):
         # observable is queried, then cleared.
         self.injectedStates = []  # supposed to be (Observable, Object)
         self.injectedObjects = []  # supposed to be (Observable, IGeometry)
+        self.observationCatalog = None
+        # the ObservationStore that the observations made in this context are recorded to
+        self.store = None
+
+    def takeInjectedStates(self) -> dict:
+        """
+        The injected states and objects as sent with an observation request, clearing them so
+        that they go with one request only. Pass the result as `states` to send the same ones
+        with several concurrent submissions.
+        """
+        # swap the lists, so that states injected meanwhile by another thread are not lost
+        injectedStates, self.injectedStates = self.injectedStates, []
+        injectedObjects, self.injectedObjects = self.injectedObjects, []
+        states = {}
+        for state in injectedStates:
+            # state is a tuple of (Observable, Object)
+            states[str(state[0])] = str(state[1])
+        for object in injectedObjects:
+            # object is a tuple of (Observable, IGeometry)
+            states[str(object[0])] = str(object[1].encode())
+        return states
 
-    def estimate(self, observable: Observable, arguments: list = []):
+    def estimate(self, observable: Observable, arguments: list = [], states: dict = None):
         request = ObservationRequest()
         request.contextId = self.reference.id
         request.estimate = False
         request.urn = str(observable)
 
-        for state in self.injectedStates:
-            # state is a tuple of (Observable, Object)
-            request.states[str(state[0])] = str(state[1])
-
-        for object in self.injectedObjects:
-            # object is a tuple of (Observable, IGeometry)
-            request.states[str(object[0])] = str(object[1].encode())
-
-        self.injectedStates.clear()
-        self.injectedObjects.clear()
+        request.states.update(self.takeInjectedStates() if states is None else states)
 
         for o in arguments:
             if isinstance(o, str):
@@ -401,28 +388,19 @@ class Context(Observation):
 
         ticket = self.engine.submitObservation(request)
         if ticket:
-            return E.TicketHandler(self.engine, ticket.id, self)
+            return E.TicketHandler(self.engine, ticket.id, self, self.store)
 
         raise KlabIllegalArgumentException(
             f"Cannot build estimate request from arguments: {arguments}")
 
-    def submit(self, observable: Observable, arguments: list = []):
+    def submit(self, observable: Observable, arguments: list = [], states: dict = None):
 
         request = ObservationRequest()
         request.contextId = self.reference.id
         request.estimate = False
         request.urn = str(observable)
 
-        for state in self.injectedStates:
-            # state is a tuple of (Observable, Object)
-            request.states[str(state[0])] = str(state[1])
-
-        for object in self.injectedObjects:
-            # object is a tuple of (Observable, IGeometry)
-            request.states[str(object[0])] = str(object[1].encode())
-
-        self.injectedStates.clear()
-        self.injectedObjects.clear()
+        request.states.update(self.takeInjectedStates() if states is None else states)
 
         for o in arguments:
             if isinstance(o, str):
@@ -430,7 +408,7 @@ class Context(Observation):
 
         ticket = self.engine.submitObservation(request)
         if ticket:
-            return E.TicketHandler(self.engine, ticket.id, self)
+            return E.TicketHandler(self.engine, ticket.id, self, self.store)
 
         raise KlabIllegalArgumentException(
             f"Cannot build observation request from arguments: {arguments}")
@@ -451,6 +429,15 @@ class Context(Observation):
 
     # }
 
+    async def sweepScenarios(self, observable: Observable, scenarioSets: list,
+                             maxConcurrency: int = DEFAULT_MAX_CONCURRENCY, timeoutSeconds: int = 900):
+        """
+        Observe the observable under each scenario set (a scenario URN or a list of them,
+        empty for the baseline) and return a `ScenarioComparison` of their data summaries.
+        Use its `export()` to fetch the data of the scenarios worth keeping.
+        """
+        return await ScenarioSweep(self, observable, maxConcurrency, timeoutSeconds).run(scenarioSets)
+
     def getDataflow(self, eformat: ExportFormat) -> str:
         if eformat != ExportFormat.ELK_GRAPH_JSON and eformat != ExportFormat.KDL_CODE:
             raise KlabIllegalArgumentException(f"cannot export a dataflow to {eformat.name}")
@@ -473,6 +460,41 @@ class Context(Observation):
         bytesBuffer = stream.getvalue()
         return bytesBuffer.decode("utf-8")
     
+    def getCatalog(self, refresh: bool = False) -> ObservationCatalog:
+        """
+        The columnar catalog of the observations in this context, for queries by type,
+        semantics and data summary. It is built on first call, fetching the structure of
+        the observations not yet retrieved in parallel, and kept up to date by later
+        observations. The fetched references are not kept once their values are in the catalog.
+        """
+        if self.observationCatalog is None or refresh:
+            if refresh:
+                self.reference = self.engine.getObservation(self.reference.id)
+            catalog = ObservationCatalog(self.loadObservations)
+            children = list(self.reference.childIds.items())
+            missing = [id for _, id in children if id not in self.catalog]
+            fetched = dict(zip(missing, fetchAll(self.fetchReference, missing)))
+            for name, id in children:
+                retrieved = self.catalog.get(id)
+                catalog.add(retrieved.reference if retrieved else fetched[id], name)
+            self.observationCatalog = catalog
+        return self.observationCatalog
+
+    def fetchReference(self, id: str) -> ObservationReference:
+        ref = self.engine.getObservation(id)
+        if not ref or not ref.id:
+            raise KlabRemoteException(f"server error retrieving observation {id}")
+        return ref
+
+    def loadObservations(self, ids: list) -> list:
+        """
+        The observations with the passed ids, in order. Those not already retrieved are
+        fetched from the engine in parallel and, unlike `getObservation`, not cached.
+        """
+        missing = [id for id in ids if id not in self.catalog]
+        fetched = dict(zip(missing, fetchAll(self.fetchReference, missing)))
+        return [self.catalog.get(id) or Observation(fetched[id], self.engine) for id in ids]
+
     def getResources(self) -> list[ObservationResource]:
         return self.engine.getResources(self.reference.id)
 
@@ -502,4 +524,6 @@ class Context(Observation):
             if ret.reference.id == self.reference.childIds.get(name):
                 self.catalogIds[name] = ret.reference.id
                 self.catalog[ret.reference.id] = ret
+                if self.observationCatalog is not None:
+                    self.observationCatalog.add(ret.reference, name)
                 break
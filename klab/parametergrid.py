@@ -0,0 +1,264 @@
+"""
+Full factorial studies over regions × resolutions × years × observables × scenarios:
+
+    grid = ParameterGrid(regions={"ruaha": wkt}, resolutions=["1 km"], years=range(2000, 2020),
+                         observables=["geography:Elevation", "landcover:LandCoverType"],
+                         scenarios=[[], ["im.scenarios:Drought"]])
+    executor = GridExecutor(klab, maxConcurrency=16, maxPerEngine=4)
+    await executor.run(grid, JsonlSink("results.jsonl"), ExportFormat.BYTESTREAM,
+                       "out/{region}_{year}_{observable}_{scenario}.tif")
+
+Every grid point sharing region, resolution and year is observed in the same context,
+which is created once. Each point runs the steps context → observation → export, each
+step waiting only for its own dependency, so points start as soon as their context is
+ready while other contexts are still being computed.
+"""
+from .geometry import GeometryBuilder
+from .observable import Observable
+from .utils import ExportFormat
+from .concurrency import asCompleted, exportObservation, observeInContext, resolveTicket, runBlocking
+from .exceptions import *
+import asyncio
+import itertools
+import json
+import re
+import time
+
+import logging
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 16
+"""Default number of engine requests or exports in progress at the same time."""
+
+DEFAULT_MAX_PER_ENGINE = 4
+"""Default number of observations or exports in progress at the same time on each engine."""
+
+LOOKAHEAD = 4
+"""Grid points in progress for each concurrency slot, so that points can wait on their context without idling slots."""
+
+
+class GridPoint():
+    """One combination of the parameters of a `ParameterGrid`."""
+
+    def __init__(self, region: str, wkt: str, resolution: str, year: int, observable: str, scenarios: tuple) -> None:
+        self.region = region
+        self.wkt = wkt
+        self.resolution = resolution
+        self.year = year
+        self.observable = observable
+        self.scenarios = scenarios
+
+    @property
+    def contextKey(self) -> tuple:
+        """Points with the same key are observed in the same context."""
+        return (self.region, self.resolution, self.year)
+
+    @property
+    def scenarioLabel(self) -> str:
+        return "+".join(self.scenarios) or "baseline"
+
+    def labels(self) -> dict:
+        """The parameters as strings usable in file names, for formatting export paths."""
+        labels = {"region": self.region, "resolution": self.resolution, "year": self.year,
+                  "observable": self.observable, "scenario": self.scenarioLabel}
+        return {key: re.sub(r"[^\w.+-]", "_", str(value)) for key, value in labels.items()}
+
+    def toDict(self) -> dict:
+        return {"region": self.region, "resolution": self.resolution, "year": self.year,
+                "observable": self.observable, "scenarios": list(self.scenarios)}
+
+    def __str__(self) -> str:
+        return f"GridPoint [region={self.region}, resolution={self.resolution}, year={self.year}, " \
+               f"observable={self.observable}, scenarios={self.scenarioLabel}]"
+
+
+class ParameterGrid():
+    """
+    The cartesian product of the passed parameters. Regions are a dict of name to WKT (or a
+    list of WKT, named by position); each scenario set is a scenario URN or a list of them,
+    and an empty list stands for the baseline. Repeated values are only used once.
+    """
+
+    def __init__(self, regions, resolutions: list, years: list, observables: list, scenarios: list = [()]) -> None:
+        if not isinstance(regions, dict):
+            regions = {f"region{i}": wkt for i, wkt in enumerate(regions)}
+        self.regions = regions
+        self.resolutions = _unique(resolutions)
+        self.years = _unique(int(year) for year in years)
+        self.observables = _unique(str(observable) for observable in observables)
+        self.scenarios = _unique((s,) if isinstance(s, str) else tuple(s) for s in scenarios)
+        if not (self.regions and self.resolutions and self.years and self.observables and self.scenarios):
+            raise KlabIllegalArgumentException("every parameter of a grid needs at least one value")
+
+    def __len__(self) -> int:
+        return len(self.regions) * len(self.resolutions) * len(self.years) * len(self.observables) * len(self.scenarios)
+
+    def contextCount(self) -> int:
+        return len(self.regions) * len(self.resolutions) * len(self.years)
+
+    def __iter__(self):
+        """Iterate the points so that those sharing a context are adjacent."""
+        for (region, wkt), resolution, year, observable, scenarios in itertools.product(
+                self.regions.items(), self.resolutions, self.years, self.observables, self.scenarios):
+            yield GridPoint(region, wkt, resolution, year, observable, scenarios)
+
+
+def _unique(values) -> list:
+    return list(dict.fromkeys(values))
+
+
+class GridResult():
+    """The outcome of one grid point; `error` is set if any of its steps failed."""
+
+    def __init__(self, point: GridPoint) -> None:
+        self.point = point
+        self.context = None
+        self.observation = None
+        self.path = None
+        self.error = None
+        self.seconds = 0.0
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+    def toDict(self) -> dict:
+        ret = self.point.toDict()
+        ret.update({"status": "done" if self.success else "failed", "seconds": round(self.seconds, 3)})
+        if self.observation is not None and not self.observation.isEmpty():
+            ret["observation"] = self.observation.reference.id
+            summary = self.observation.reference.dataSummary
+            if summary is not None:
+                ret["mean"] = summary.mean
+        if self.path:
+            ret["path"] = self.path
+        if self.error:
+            ret["error"] = self.error
+        return ret
+
+
+class JsonlSink():
+    """A result sink appending one JSON object per finished grid point to a file."""
+
+    def __init__(self, path: str) -> None:
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def __call__(self, result: GridResult):
+        self.file.write(json.dumps(result.toDict()) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class GridExecutor():
+    """
+    Runs a `ParameterGrid` against a `Klab` or `KlabCluster`. At most `maxConcurrency`
+    engine requests and exports are in progress overall, and at most `maxPerEngine` of the
+    observations and exports in the contexts of each engine.
+    """
+
+    def __init__(self, klab, maxConcurrency: int = DEFAULT_MAX_CONCURRENCY, maxPerEngine: int = DEFAULT_MAX_PER_ENGINE,
+                 contextType: str = "earth:Region", timeoutSeconds: int = 900) -> None:
+        if maxConcurrency < 1 or maxPerEngine < 1:
+            raise KlabIllegalArgumentException("concurrency limits must be at least 1")
+        self.klab = klab
+        self.maxConcurrency = maxConcurrency
+        self.maxPerEngine = maxPerEngine
+        self.contextType = Observable.create(contextType)
+        self.timeoutSeconds = timeoutSeconds
+        self.contexts = {}
+        self.engineSlots = {}
+        self.slots = None
+
+    async def stream(self, grid: ParameterGrid, eformat: ExportFormat = None, pathPattern: str = None):
+        """
+        Yield a `GridResult` for each point as soon as it is observed and, if a format is
+        passed, exported to `pathPattern` formatted with the labels of the point ({region},
+        {resolution}, {year}, {observable} and {scenario}).
+        """
+        if eformat and not pathPattern:
+            raise KlabIllegalArgumentException("exporting a grid needs a path pattern")
+
+        # semaphores belong to the running loop, so they are created for each run
+        self.slots = asyncio.Semaphore(self.maxConcurrency)
+        self.engineSlots = {}
+        self.contexts = {}
+        results = asCompleted((self.runPoint(point, eformat, pathPattern) for point in grid),
+                              self.maxConcurrency * LOOKAHEAD)
+        try:
+            async for result in results:
+                yield result
+        finally:
+            # the points are cancelled by asCompleted, the contexts they share are not
+            await results.aclose()
+            for task in self.contexts.values():
+                task.cancel()
+
+    async def run(self, grid: ParameterGrid, sink=None, eformat: ExportFormat = None, pathPattern: str = None) -> list:
+        """
+        Run the whole grid, passing each result to the sink (any callable) as it completes,
+        and return the failed results.
+        """
+        failed = []
+        results = self.stream(grid, eformat, pathPattern)
+        try:
+            async for result in results:
+                if sink:
+                    sink(result)
+                if not result.success:
+                    failed.append(result)
+        finally:
+            # stops the remaining points and contexts now if the sink raises
+            await results.aclose()
+        return failed
+
+    async def runPoint(self, point: GridPoint, eformat: ExportFormat, pathPattern: str) -> GridResult:
+        result = GridResult(point)
+        start = time.perf_counter()
+        try:
+            result.context = await self.getContext(point)
+            async with self.engineSlot(result.context), self.slots:
+                result.observation = await observeInContext(self.klab, result.context,
+                                                            Observable.create(point.observable),
+                                                            list(point.scenarios), timeoutSeconds=self.timeoutSeconds)
+            if result.observation is None or result.observation.isEmpty():
+                raise KlabRemoteException(f"could not observe {point}")
+
+            if eformat:
+                path = pathPattern.format(**point.labels())
+                async with self.engineSlot(result.context), self.slots:
+                    await runBlocking(exportObservation, result.observation, eformat, path)
+                result.path = path
+        except Exception as err:
+            LOGGER.error(f"{point} failed: {err}")
+            result.error = str(err) or type(err).__name__
+        result.seconds = time.perf_counter() - start
+        return result
+
+    def getContext(self, point: GridPoint) -> asyncio.Future:
+        task = self.contexts.get(point.contextKey)
+        if task is None:
+            task = asyncio.ensure_future(self.createContext(point))
+            self.contexts[point.contextKey] = task
+        return task
+
+    async def createContext(self, point: GridPoint):
+        # the engine of a context is only known once it exists, so creating it only counts
+        # against the global limit
+        geometry = GeometryBuilder().grid(urn=point.wkt, resolution=point.resolution).years(point.year).build()
+        async with self.slots:
+            context = await resolveTicket(self.klab.submit, self.contextType, geometry,
+                                          timeoutSeconds=self.timeoutSeconds)
+        if context is None:
+            raise KlabRemoteException(f"could not create the context for {point}")
+        return context
+
+    def engineSlot(self, context) -> asyncio.Semaphore:
+        url = context.engine.url
+        slot = self.engineSlots.get(url)
+        if slot is None:
+            slot = asyncio.Semaphore(self.maxPerEngine)
+            self.engineSlots[url] = slot
+        return slot
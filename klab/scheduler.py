@@ -0,0 +1,177 @@
+from .geometry import KlabGeometry
+from .observable import Observable
+from .concurrency import asCompleted, resolveTicket
+from .exceptions import *
+from enum import Enum
+import asyncio
+import collections
+import time
+
+import logging
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 8
+"""Default number of estimates or submissions in progress at the same time."""
+
+
+class JobStatus(Enum):
+    PENDING = "PENDING"
+    ADMITTED = "ADMITTED"
+    DONE = "DONE"
+    FAILED = "FAILED"
+    INFEASIBLE = "INFEASIBLE"
+    OVER_BUDGET = "OVER_BUDGET"
+
+
+class ScheduledJob():
+    """
+    A context to create under a budget, described with the same arguments as
+    `Klab.estimate`. Jobs with a higher `priority` are admitted first; among jobs with the
+    same priority, cheaper ones go first.
+    """
+
+    def __init__(self, contextType: Observable, geometry: KlabGeometry, arguments: list = [], priority: int = 0,
+                 id: str = None) -> None:
+        self.contextType = contextType
+        self.geometry = geometry
+        self.arguments = list(arguments)
+        self.priority = priority
+        self.id = id
+        self.status = JobStatus.PENDING
+        self.estimate = None
+        self.context = None
+        self.error = None
+
+    @property
+    def cost(self) -> float:
+        return self.estimate.cost if self.estimate else None
+
+    def __str__(self) -> str:
+        return f"ScheduledJob [id={self.id}, priority={self.priority}, cost={self.cost}, status={self.status}]"
+
+
+class SpendWindow():
+    """
+    Rate limit on the cost submitted within any `seconds` long sliding window. A single
+    cost larger than the window budget can never be admitted.
+    """
+
+    def __init__(self, budget: float, seconds: float) -> None:
+        if budget <= 0 or seconds <= 0:
+            raise KlabIllegalArgumentException("a spend window needs a positive budget and duration")
+        self.budget = budget
+        self.seconds = seconds
+        self.spent = collections.deque()
+        self.lock = asyncio.Lock()
+
+    def spending(self, now: float) -> float:
+        while self.spent and self.spent[0][0] <= now - self.seconds:
+            self.spent.popleft()
+        return sum(cost for _, cost in self.spent)
+
+    async def reserve(self, cost: float):
+        """Wait until the cost fits in the current window and record it as spent."""
+        if cost > self.budget:
+            raise KlabIllegalArgumentException(f"cost {cost} exceeds the window budget {self.budget}")
+        # the lock keeps reservations in admission order
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if self.spending(now) + cost <= self.budget:
+                    self.spent.append((now, cost))
+                    return
+                await asyncio.sleep(self.spent[0][0] + self.seconds - now)
+
+
+class BudgetScheduler():
+    """
+    Creates contexts under a cost budget. All jobs are estimated first, concurrently; jobs
+    that are not feasible, are priced in another currency than `currency` or do not fit in
+    the remaining `budget` are skipped, and the admitted ones are submitted through
+    `Klab.submitEstimate` (so the engine reuses the estimated request), optionally no
+    faster than `windowBudget` spent per `windowSeconds`.
+    """
+
+    def __init__(self, klab, budget: float, currency: str = None, windowBudget: float = None,
+                 windowSeconds: float = 3600, maxConcurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 timeoutSeconds: int = 900) -> None:
+        if budget < 0:
+            raise KlabIllegalArgumentException("the budget cannot be negative")
+        self.klab = klab
+        self.budget = budget
+        self.currency = currency
+        self.window = SpendWindow(windowBudget, windowSeconds) if windowBudget is not None else None
+        self.maxConcurrency = maxConcurrency
+        self.timeoutSeconds = timeoutSeconds
+        self.committed = 0.0
+
+    @property
+    def remaining(self) -> float:
+        return self.budget - self.committed
+
+    async def estimateAll(self, jobs: list) -> list:
+        """Estimate all jobs concurrently, setting their `estimate` or `error`."""
+        async def estimate(job: ScheduledJob) -> ScheduledJob:
+            try:
+                job.estimate = await resolveTicket(self.klab.estimate, job.contextType, job.geometry, *job.arguments,
+                                                   timeoutSeconds=self.timeoutSeconds)
+                if job.estimate is None:
+                    raise KlabRemoteException("the engine returned no estimate")
+            except Exception as err:
+                job.status = JobStatus.FAILED
+                job.error = str(err) or type(err).__name__
+            return job
+
+        return [job async for job in asCompleted((estimate(job) for job in jobs), self.maxConcurrency)]
+
+    def admit(self, jobs: list) -> list:
+        """
+        Choose the estimated jobs to run within the remaining budget, by descending priority
+        and then ascending cost, and return them in that order.
+        """
+        admitted = []
+        for job in sorted((job for job in jobs if job.estimate), key=lambda job: (-job.priority, job.cost)):
+            if not job.estimate.isFeasible:
+                job.status = JobStatus.INFEASIBLE
+            elif self.currency and job.estimate.currency != self.currency:
+                job.status = JobStatus.OVER_BUDGET
+                job.error = f"estimated in {job.estimate.currency} instead of {self.currency}"
+            elif job.cost > self.remaining or (self.window and job.cost > self.window.budget):
+                job.status = JobStatus.OVER_BUDGET
+            else:
+                job.status = JobStatus.ADMITTED
+                self.committed += job.cost
+                admitted.append(job)
+        return admitted
+
+    async def stream(self, jobs: list):
+        """Estimate and admit the jobs, then yield each admitted job once its context is created or has failed."""
+        await self.estimateAll(jobs)
+        admitted = self.admit(jobs)
+        LOGGER.debug(f"admitted {len(admitted)} of {len(jobs)} jobs for {self.committed} of {self.budget}")
+        async for job in asCompleted((self.submit(job) for job in admitted), self.maxConcurrency):
+            yield job
+
+    async def run(self, jobs: list) -> list:
+        """Schedule all jobs and return them, each with its final status."""
+        async for _ in self.stream(jobs):
+            pass
+        return jobs
+
+    async def submit(self, job: ScheduledJob) -> ScheduledJob:
+        try:
+            if self.window:
+                await self.window.reserve(job.cost)
+            job.context = await resolveTicket(self.klab.submitEstimate, job.estimate,
+                                              timeoutSeconds=self.timeoutSeconds)
+            if job.context is None:
+                raise KlabRemoteException(f"could not create the context for {job}")
+            job.status = JobStatus.DONE
+        except Exception as err:
+            LOGGER.error(f"{job} failed: {err}")
+            job.status = JobStatus.FAILED
+            job.error = str(err) or type(err).__name__
+            # a job that created nothing gives its admitted cost back to the budget
+            self.committed -= job.cost
+        return job
@@ -0,0 +1,441 @@
+"""
+Decoding and encoding of the shapes carried by geometries, as WKT (optionally preceded by
+the k.LAB projection, like "EPSG:4326 POLYGON((...))") or as WKB, raw or in hex like the
+shapes sent by the engine. Coordinates are read into a single NumPy array and written back
+from it with `numpy.frombuffer` and `tobytes`, so the cost does not depend on Python code
+running for each vertex:
+
+    shape = Shape.parse(geometry.dimensions[0].getParameters()["shape"])
+    minX, maxX, minY, maxY = shape.bounds()
+    wkt = shape.toWkt()
+
+Requires NumPy, installed with the `numpy` extra.
+"""
+from .exceptions import *
+import binascii
+import hashlib
+import re
+import struct
+import warnings
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+POINT = "POINT"
+LINESTRING = "LINESTRING"
+POLYGON = "POLYGON"
+MULTIPOINT = "MULTIPOINT"
+MULTILINESTRING = "MULTILINESTRING"
+MULTIPOLYGON = "MULTIPOLYGON"
+
+WKB_TYPES = {1: POINT, 2: LINESTRING, 3: POLYGON, 4: MULTIPOINT, 5: MULTILINESTRING, 6: MULTIPOLYGON}
+WKB_CODES = {name: code for code, name in WKB_TYPES.items()}
+MULTI_TYPES = {MULTIPOINT: POINT, MULTILINESTRING: LINESTRING, MULTIPOLYGON: POLYGON}
+
+_EWKB_Z = 0x80000000
+_EWKB_M = 0x40000000
+_EWKB_SRID = 0x20000000
+
+_WKT = re.compile(r"\s*(?:(?P<projection>[A-Za-z]+:\w+)\s+)?(?P<type>[A-Za-z]+)\s*(?P<dims>ZM|Z|M)?\s*")
+
+
+def requireNumpy():
+    if numpy is None:
+        raise KlabIllegalStateException("decoding shapes requires numpy: pip install numpy")
+    return numpy
+
+
+class Shape():
+    """
+    A point, line or polygon geometry, or a collection of one of them. All vertices are in
+    `coordinates`, an (n, dims) float array; `rings` holds the offset in `coordinates` where
+    each ring (or line, or point) starts plus the final count, and `parts` the offset in
+    `rings` where each member of a collection starts plus the final count. With three
+    dims the third coordinate is Z unless `measured` is True, then it is M; with four
+    they are Z and M.
+    """
+
+    def __init__(self, type: str, coordinates, rings, parts, projection: str = None,
+                 measured: bool = False) -> None:
+        self.type = type
+        self.coordinates = coordinates
+        self.rings = rings
+        self.parts = parts
+        self.projection = projection
+        self.measured = measured or coordinates.shape[1] == 4
+
+    @staticmethod
+    def parse(shape):
+        """Decode WKT, hex WKB or WKB bytes, telling them apart from their content."""
+        if isinstance(shape, (bytes, bytearray, memoryview)):
+            return Shape.fromWkb(shape)
+        # hex WKB starts with the byte order, WKT with a projection or a type name
+        if shape.lstrip()[:2] in ("00", "01"):
+            return Shape.fromWkb(shape)
+        return Shape.fromWkt(shape)
+
+    @property
+    def dims(self) -> int:
+        return self.coordinates.shape[1]
+
+    def __len__(self) -> int:
+        """The number of vertices."""
+        return len(self.coordinates)
+
+    def ring(self, i: int):
+        """The coordinates of the i-th ring, as a view."""
+        return self.coordinates[self.rings[i]:self.rings[i + 1]]
+
+    def ringCount(self) -> int:
+        return len(self.rings) - 1
+
+    def partCount(self) -> int:
+        return len(self.parts) - 1
+
+    def bounds(self) -> tuple:
+        """Bounding box as [minX, maxX, minY, maxY], like `KlabSpace.wktBounds`."""
+        if not len(self.coordinates):
+            raise KlabIllegalArgumentException("an empty shape has no bounds")
+        x, y = self.coordinates[:, 0], self.coordinates[:, 1]
+        return float(x.min()), float(x.max()), float(y.min()), float(y.max())
+
+    def digest(self) -> str:
+        """A hex digest of the type, structure and coordinates, equal for equal shapes however encoded."""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self.type.encode("ascii"))
+        digest.update(self._dimsTag().encode("ascii"))
+        for array, dtype in ((self.rings, "<i8"), (self.parts, "<i8"), (self.coordinates, "<f8")):
+            digest.update(numpy.ascontiguousarray(array, dtype=dtype).tobytes())
+        return digest.hexdigest()
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Shape):
+            return NotImplemented
+        return self.type == other.type and self.measured == other.measured and numpy.array_equal(self.rings, other.rings) and \
+            numpy.array_equal(self.parts, other.parts) and numpy.array_equal(self.coordinates, other.coordinates)
+
+    def __hash__(self) -> int:
+        return hash(self.digest())
+
+    def _dimsTag(self) -> str:
+        """The WKT tag of the coordinate dimensions: "", "Z", "M" or "ZM"."""
+        return {2: "", 3: "M" if self.measured else "Z", 4: "ZM"}[self.dims]
+
+    def __str__(self) -> str:
+        return f"Shape [type={self.type}, vertices={len(self)}, rings={self.ringCount()}, parts={self.partCount()}]"
+
+    @staticmethod
+    def fromWkb(data):
+        """Decode WKB (ISO or PostGIS extended, any byte order), as bytes or as a hex string."""
+        np = requireNumpy()
+        if isinstance(data, str):
+            try:
+                data = binascii.unhexlify(data.strip())
+            except binascii.Error as e:
+                raise KlabIllegalArgumentException(f"invalid hex WKB shape: {e}")
+        reader = _WkbReader(np, bytes(data))
+        shape = reader.read()
+        if reader.pos != len(reader.data):
+            raise KlabIllegalArgumentException(f"{len(reader.data) - reader.pos} bytes left after the WKB shape")
+        return shape
+
+    def toWkb(self, hex: bool = True, bigEndian: bool = True):
+        """Encode as WKB, in hex unless `hex` is False; big endian by default like the engine."""
+        order, dtype = (b"\x00", ">f8") if bigEndian else (b"\x01", "<f8")
+        prefix = ">" if bigEndian else "<"
+        flag = {"": 0, "Z": 1000, "M": 2000, "ZM": 3000}[self._dimsTag()]
+        coordinates = numpy.ascontiguousarray(self.coordinates, dtype=dtype)
+        rings, parts = self.rings.tolist(), self.parts.tolist()
+
+        def header(type: str) -> bytes:
+            return order + struct.pack(prefix + "I", WKB_CODES[type] + flag)
+
+        def ring(i: int, count: bool = True) -> list:
+            block = coordinates[rings[i]:rings[i + 1]].tobytes()
+            return [struct.pack(prefix + "I", rings[i + 1] - rings[i]), block] if count else [block]
+
+        def single(type: str, part: int) -> list:
+            first, last = parts[part], parts[part + 1]
+            if type == POINT:
+                return [header(type)] + ring(first, count=False)
+            if type == LINESTRING:
+                return [header(type)] + ring(first)
+            chunks = [header(type), struct.pack(prefix + "I", last - first)]
+            for i in range(first, last):
+                chunks.extend(ring(i))
+            return chunks
+
+        if self.type in MULTI_TYPES:
+            chunks = [header(self.type), struct.pack(prefix + "I", self.partCount())]
+            for part in range(self.partCount()):
+                chunks.extend(single(MULTI_TYPES[self.type], part))
+        elif not self.partCount():
+            # an empty point has NaN coordinates, empty lines and polygons no sequences
+            if self.type == POINT:
+                chunks = [header(self.type), numpy.full(self.dims, numpy.nan, dtype=dtype).tobytes()]
+            else:
+                chunks = [header(self.type), struct.pack(prefix + "I", 0)]
+        else:
+            chunks = single(self.type, 0)
+        data = b"".join(chunks)
+        return binascii.hexlify(data).decode("ascii").upper() if hex else data
+
+    @staticmethod
+    def fromWkt(text: str):
+        """Decode WKT, optionally preceded by a projection like EPSG:4326."""
+        np = requireNumpy()
+        match = _WKT.match(text)
+        type = match.group("type").upper() if match else None
+        if type not in WKB_CODES:
+            raise KlabIllegalArgumentException(f"cannot decode WKT shape starting with {text[:40]}")
+        dims = {None: 2, "Z": 3, "M": 3, "ZM": 4}[match.group("dims")]
+        measured = match.group("dims") in ("M", "ZM")
+        body = text[match.end():].rstrip()
+        if body.upper() == "EMPTY":
+            return Shape(type, np.empty((0, dims)), np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64),
+                         match.group("projection"), measured)
+
+        # only the parentheses are walked in Python: each innermost group is a coordinate
+        # sequence and belongs to the member of the collection opened at depth 2
+        codes = np.frombuffer(body.encode("latin-1", "replace"), dtype=np.uint8)
+        sequences, members = [], []
+        depth, start, member = 0, 0, -1
+        for position in np.flatnonzero((codes == 40) | (codes == 41)).tolist():
+            if body[position] == "(":
+                depth += 1
+                start = position + 1
+                if depth == 2:
+                    member += 1
+            else:
+                if start is not None:
+                    sequences.append(body[start:position])
+                    members.append(max(member, 0))
+                start = None
+                depth -= 1
+        if depth != 0 or not sequences:
+            raise KlabIllegalArgumentException(f"unbalanced parentheses in WKT shape {text[:40]}")
+
+        if type == MULTIPOINT and len(sequences) == 1:
+            # MULTIPOINT(0 0, 1 1): each point is a member
+            counts = [sequences[0].count(",") + 1]
+            members = None
+        else:
+            counts = [sequence.count(",") + 1 for sequence in sequences]
+
+        numbers = body.replace("(", " ").replace(")", " ").replace(",", " ")
+        with warnings.catch_warnings():
+            # numpy warns and returns what it read so far when it meets something else than a number
+            warnings.simplefilter("error", DeprecationWarning)
+            try:
+                values = np.fromstring(numbers, dtype=np.float64, sep=" ")
+            except (ValueError, DeprecationWarning) as e:
+                raise KlabIllegalArgumentException(f"invalid coordinates in WKT shape {text[:40]}: {e}")
+        total = sum(counts)
+        if total == 0 or len(values) % total:
+            raise KlabIllegalArgumentException(f"inconsistent coordinates in WKT shape {text[:40]}")
+        if match.group("dims") and len(values) != total * dims:
+            raise KlabIllegalArgumentException(f"WKT shape {text[:40]} needs {dims} coordinates per vertex")
+        dims = len(values) // total
+        coordinates = values.reshape(total, dims)
+
+        if members is None:
+            rings = np.arange(total + 1, dtype=np.int64)
+            parts = np.arange(total + 1, dtype=np.int64)
+        else:
+            rings = np.zeros(len(counts) + 1, dtype=np.int64)
+            np.cumsum(counts, out=rings[1:])
+            if type in MULTI_TYPES:
+                members = np.asarray(members)
+                # the first ring of each member, then the total
+                parts = np.append(np.flatnonzero(np.diff(members, prepend=-1)), len(members)).astype(np.int64)
+            else:
+                parts = np.array([0, len(counts)], dtype=np.int64)
+        return Shape(type, coordinates, rings, parts, match.group("projection"), measured)
+
+    def toWkt(self, projection: bool = True) -> str:
+        """Encode as WKT, preceded by the projection if there is one and `projection` is True."""
+        prefix = f"{self.projection} " if projection and self.projection else ""
+        suffix = f" {self._dimsTag()}" if self.dims > 2 else ""
+        if not len(self.coordinates):
+            return f"{prefix}{self.type}{suffix} EMPTY"
+
+        # numbers are formatted and joined by C loops (map, zip, join) over all vertices
+        columns = [map(repr, self.coordinates[:, d].tolist()) for d in range(self.dims)]
+        vertices = list(map(" ".join, zip(*columns)))
+        rings, parts = self.rings.tolist(), self.parts.tolist()
+
+        def sequence(i: int) -> str:
+            return "(" + ", ".join(vertices[rings[i]:rings[i + 1]]) + ")"
+
+        def member(part: int, type: str) -> str:
+            first, last = parts[part], parts[part + 1]
+            if type == POLYGON:
+                return "(" + ", ".join(sequence(i) for i in range(first, last)) + ")"
+            return sequence(first)
+
+        if self.type in MULTI_TYPES:
+            body = "(" + ", ".join(member(part, MULTI_TYPES[self.type]) for part in range(self.partCount())) + ")"
+        else:
+            body = member(0, self.type)
+        return f"{prefix}{self.type}{suffix}{body}"
+
+    def simplify(self, tolerance: float):
+        """
+        A copy without the vertices that move the outline by less than `tolerance` (in the
+        units of the coordinates), chosen by Douglas-Peucker. All the rings are simplified
+        together, one level of the recursion at a time. Holes and members of a collection
+        that shrink below a valid ring are dropped; the shape is returned unchanged if
+        nothing would be left.
+        """
+        np = requireNumpy()
+        if self.type in (POINT, MULTIPOINT) or tolerance <= 0 or not len(self.coordinates):
+            return Shape(self.type, self.coordinates.copy(), self.rings.copy(), self.parts.copy(), self.projection,
+                         self.measured)
+
+        x = np.ascontiguousarray(self.coordinates[:, 0])
+        y = np.ascontiguousarray(self.coordinates[:, 1])
+        keep = np.zeros(len(x), dtype=bool)
+        keep[self.rings[:-1]] = True
+        keep[self.rings[1:] - 1] = True
+        starts, ends = self.rings[:-1], self.rings[1:] - 1
+        squared = tolerance * tolerance
+        while True:
+            inner = ends - starts - 1
+            starts, ends, inner = starts[inner > 0], ends[inner > 0], inner[inner > 0]
+            if not len(starts):
+                break
+            # every inner vertex of every open segment, with the segment it belongs to
+            first = np.cumsum(inner) - inner
+            segment = np.repeat(np.arange(len(starts)), inner)
+            offset = np.arange(len(segment)) - first[segment]
+            points = starts[segment] + 1 + offset
+            distance = _squaredDistance(x[points], y[points], x[starts][segment], y[starts][segment],
+                                        x[ends][segment], y[ends][segment])
+            farthest = np.maximum.reduceat(distance, first)
+            split = starts + 1 + np.minimum.reduceat(np.where(distance == farthest[segment], offset, len(x)), first)
+            far = farthest > squared
+            keep[split[far]] = True
+            starts, ends, split = starts[far], ends[far], split[far]
+            starts, ends = np.concatenate((starts, split)), np.concatenate((split, ends))
+
+        kept = np.concatenate(([0], np.cumsum(keep)))
+        counts = kept[self.rings[1:]] - kept[self.rings[:-1]]
+        valid = counts >= (4 if self.type in (POLYGON, MULTIPOLYGON) else 2)
+        # a member goes with its exterior ring
+        member = np.repeat(np.arange(self.partCount()), np.diff(self.parts))
+        valid &= valid[self.parts[:-1]][member]
+        if not valid.any():
+            return self.simplify(0)
+        keep &= np.repeat(valid, np.diff(self.rings))
+        rings = np.zeros(valid.sum() + 1, dtype=np.int64)
+        np.cumsum(counts[valid], out=rings[1:])
+        validRings = np.concatenate(([0], np.cumsum(valid)))
+        parts = validRings[self.parts]
+        parts = np.concatenate((parts[:-1][np.diff(parts) > 0], parts[-1:])).astype(np.int64)
+        return Shape(self.type, self.coordinates[keep], rings, parts, self.projection, self.measured)
+
+
+def _squaredDistance(px, py, ax, ay, bx, by):
+    """Squared distances of each point p from the segment from a to b, or from a if the segment is empty."""
+    dx, dy = bx - ax, by - ay
+    length = dx * dx + dy * dy
+    t = numpy.clip(((px - ax) * dx + (py - ay) * dy) / numpy.where(length > 0, length, 1.0), 0.0, 1.0)
+    ex, ey = px - ax - t * dx, py - ay - t * dy
+    return ex * ex + ey * ey
+
+
+class _WkbReader():
+    """Reads one WKB geometry after the other from `data`, starting at `pos`."""
+
+    def __init__(self, np, data: bytes) -> None:
+        self.np = np
+        self.data = data
+        self.pos = 0
+        self.blocks = []
+        self.counts = []
+        self.partStarts = []
+        self.projection = None
+        self.dims = None
+        self.measured = None
+
+    def header(self) -> tuple:
+        if self.pos + 5 > len(self.data):
+            raise KlabIllegalArgumentException("truncated WKB shape")
+        prefix = ">" if self.data[self.pos] == 0 else "<"
+        code = struct.unpack_from(prefix + "I", self.data, self.pos + 1)[0]
+        self.pos += 5
+        dims = 2
+        if code & (_EWKB_Z | _EWKB_M | _EWKB_SRID):
+            measured = bool(code & _EWKB_M)
+            dims += bool(code & _EWKB_Z) + measured
+            if code & _EWKB_SRID:
+                srid = struct.unpack_from(prefix + "I", self.data, self.pos)[0]
+                self.pos += 4
+                self.projection = f"EPSG:{srid}"
+            code &= 0xFFFF
+        else:
+            dims += {0: 0, 1: 1, 2: 1, 3: 2}[code // 1000]
+            measured = code // 1000 in (2, 3)
+            code %= 1000
+        if code not in WKB_TYPES:
+            raise KlabIllegalArgumentException(f"unsupported WKB geometry type {code}")
+        if self.dims is None:
+            self.dims, self.measured = dims, measured
+        elif dims != self.dims or measured != self.measured:
+            raise KlabIllegalArgumentException("WKB members with different coordinate dimensions")
+        return prefix, WKB_TYPES[code]
+
+    def count(self, prefix: str) -> int:
+        ret = struct.unpack_from(prefix + "I", self.data, self.pos)[0]
+        self.pos += 4
+        return ret
+
+    def sequence(self, prefix: str, count: int):
+        size = count * self.dims * 8
+        if self.pos + size > len(self.data):
+            raise KlabIllegalArgumentException("truncated WKB shape")
+        self.blocks.append(self.np.frombuffer(self.data, dtype=prefix + "f8", count=count * self.dims,
+                                              offset=self.pos))
+        self.counts.append(count)
+        self.pos += size
+
+    def single(self, prefix: str, type: str):
+        self.partStarts.append(len(self.counts))
+        if type == POINT:
+            self.sequence(prefix, 1)
+        elif type == LINESTRING:
+            self.sequence(prefix, self.count(prefix))
+        else:
+            for _ in range(self.count(prefix)):
+                self.sequence(prefix, self.count(prefix))
+
+    def read(self) -> Shape:
+        np = self.np
+        prefix, type = self.header()
+        if type in MULTI_TYPES:
+            for _ in range(self.count(prefix)):
+                memberPrefix, member = self.header()
+                if member != MULTI_TYPES[type]:
+                    raise KlabIllegalArgumentException(f"{member} in a {type}")
+                self.single(memberPrefix, member)
+        else:
+            self.single(prefix, type)
+
+        # one copy into native order for all sequences
+        if self.blocks:
+            coordinates = np.concatenate(self.blocks).astype(np.float64).reshape(-1, self.dims)
+        else:
+            coordinates = np.empty((0, self.dims))
+        if type == POINT and np.isnan(coordinates).all():
+            # the empty point
+            coordinates = np.empty((0, self.dims))
+        if not len(coordinates):
+            # empty shapes decode like EMPTY in WKT, however many empty sequences they hold
+            return Shape(type, coordinates, np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64),
+                         self.projection, self.measured)
+        rings = np.zeros(len(self.counts) + 1, dtype=np.int64)
+        np.cumsum(self.counts, out=rings[1:])
+        parts = np.array(self.partStarts + [len(self.counts)], dtype=np.int64)
+        return Shape(type, coordinates, rings, parts, self.projection, self.measured)
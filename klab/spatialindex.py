@@ -0,0 +1,546 @@
+"""
+An index of the contexts already computed, by spatial extent and time period, to find the
+ones that cover a new request so that its results can be cropped from an existing export
+instead of being computed again:
+
+    index = ContextIndex()
+    index.addAll(store.find(observable="earth:Region"))
+    index.addExport(context.reference.id, "geography:Elevation", "elevation.tif")
+    ...
+    if index.cropExport(geometry, "geography:Elevation", "cropped.tif"):
+        ...  # served locally
+
+The index is an R-tree, kept in pure Python or, when the `rtree` package (libspatialindex,
+installed with the `spatial` extra) is available, in C.
+"""
+from .geometry import KlabGeometry, KlabSpace, RESOLUTION_UNITS, PARAMETER_SPACE_BOUNDINGBOX, \
+    PARAMETER_SPACE_SHAPE, PARAMETER_SPACE_GRIDRESOLUTION
+from .references import ObservationReference
+from .types import DimensionType
+from .store import geometryPeriod
+from .exceptions import *
+import itertools
+import math
+
+try:
+    import rtree
+except ImportError:
+    rtree = None
+
+MAX_ENTRIES = 16
+"""Entries in each node of the pure Python R-tree."""
+
+MIN_ENTRIES = 6
+"""Entries a split leaves at least in each of the two nodes."""
+
+_INF = math.inf
+
+
+class Extent():
+    """
+    A lat/lon box with an optional time period in milliseconds. As bounds, an extent is
+    (west, south, start, east, north, end); without a period its time interval is empty
+    (start=+inf, end=-inf), which the bounds of every extent contain and which contain no
+    period. `covers()` also requires the same period, so cached results are never reused
+    for another time.
+    """
+
+    __slots__ = ("west", "south", "east", "north", "start", "end")
+
+    def __init__(self, west: float, south: float, east: float, north: float, start: int = None,
+                 end: int = None) -> None:
+        if west > east or south > north:
+            raise KlabIllegalArgumentException(f"empty extent {west}, {south}, {east}, {north}")
+        self.west = west
+        self.south = south
+        self.east = east
+        self.north = north
+        self.start = start
+        self.end = end
+
+    @staticmethod
+    def fromBounds(bbox, start: int = None, end: int = None):
+        """An extent from a bounding box [minX, maxX, minY, maxY], as used by `SpatialTiling`."""
+        return Extent(bbox[0], bbox[2], bbox[1], bbox[3], start, end)
+
+    @staticmethod
+    def fromScale(scale):
+        """The extent of a `ScaleReference`; a period of 0 to 0 means no time."""
+        start, end = scale.start or None, scale.end or None
+        return Extent(min(scale.west, scale.east), min(scale.south, scale.north), max(scale.west, scale.east),
+                      max(scale.south, scale.north), start, end)
+
+    @staticmethod
+    def fromGeometry(geometry: KlabGeometry):
+        """The extent of the bounding box or shape of a geometry, with its time period."""
+        start, end = geometryPeriod(geometry)
+        for dimension in geometry.dimensions:
+            if dimension.getType() == DimensionType.SPACE:
+                parameters = dimension.getParameters()
+                if PARAMETER_SPACE_BOUNDINGBOX in parameters:
+                    return Extent.fromBounds(parameters[PARAMETER_SPACE_BOUNDINGBOX], start, end)
+                if PARAMETER_SPACE_SHAPE in parameters:
+                    wkt = KlabGeometry.decodeForSerialization(parameters[PARAMETER_SPACE_SHAPE])
+                    return Extent.fromBounds(KlabSpace.wktBounds(wkt), start, end)
+        raise KlabIllegalArgumentException("the geometry has no bounding box or shape to index")
+
+    @property
+    def bounds(self) -> tuple:
+        start = _INF if self.start is None else self.start
+        end = -_INF if self.end is None else self.end
+        return (self.west, self.south, start, self.east, self.north, end)
+
+    @property
+    def area(self) -> float:
+        return (self.east - self.west) * (self.north - self.south)
+
+    def samePeriod(self, other) -> bool:
+        """Whether both extents have the same period, or both have none."""
+        return self.start == other.start and self.end == other.end
+
+    def covers(self, other) -> bool:
+        """Whether this extent contains the box of the other and has the same period."""
+        return self.samePeriod(other) and _covers(self.bounds, other.bounds)
+
+    def __str__(self) -> str:
+        return f"Extent [west={self.west}, south={self.south}, east={self.east}, north={self.north}, " \
+               f"start={self.start}, end={self.end}]"
+
+
+def _covers(outer: tuple, inner: tuple) -> bool:
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and outer[2] <= inner[2] and \
+        outer[3] >= inner[3] and outer[4] >= inner[4] and outer[5] >= inner[5]
+
+
+def _intersects(a: tuple, b: tuple) -> bool:
+    return a[0] <= b[3] and b[0] <= a[3] and a[1] <= b[4] and b[1] <= a[4] and a[2] <= b[5] and b[2] <= a[5]
+
+
+def _union(a: tuple, b: tuple) -> tuple:
+    return (min(a[0], b[0]), min(a[1], b[1]), min(a[2], b[2]), max(a[3], b[3]), max(a[4], b[4]), max(a[5], b[5]))
+
+
+def _area(bounds: tuple) -> float:
+    # nodes are chosen and split on space only; time bounds are kept to prune searches
+    return (bounds[3] - bounds[0]) * (bounds[4] - bounds[1])
+
+
+class _Node():
+
+    __slots__ = ("leaf", "entries", "bounds")
+
+    def __init__(self, leaf: bool, entries: list = None) -> None:
+        self.leaf = leaf
+        # (bounds, item) in leaves, (bounds, node) otherwise
+        self.entries = entries or []
+        self.bounds = None
+        self.tighten()
+
+    def tighten(self):
+        bounds = None
+        for entryBounds, _ in self.entries:
+            bounds = entryBounds if bounds is None else _union(bounds, entryBounds)
+        self.bounds = bounds
+
+
+class PythonRTree():
+    """A Guttman R-tree with quadratic splits over (west, south, start, east, north, end) bounds."""
+
+    name = "python"
+
+    def __init__(self, maxEntries: int = MAX_ENTRIES, minEntries: int = MIN_ENTRIES) -> None:
+        if not 2 <= minEntries <= maxEntries // 2:
+            raise KlabIllegalArgumentException("an R-tree node needs 2 <= minEntries <= maxEntries / 2")
+        self.maxEntries = maxEntries
+        self.minEntries = minEntries
+        self.root = _Node(True)
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def insert(self, bounds: tuple, item):
+        self.insertEntry((tuple(bounds), item))
+        self.size += 1
+
+    def load(self, entries):
+        """
+        Add many (bounds, item) entries at once. An empty tree is packed level by level
+        with sort-tile-recursive ordering, much faster than inserting one by one and with
+        less overlap between nodes.
+        """
+        entries = [(tuple(bounds), item) for bounds, item in entries]
+        if self.size:
+            for entry in entries:
+                self.insertEntry(entry)
+        elif entries:
+            nodes = self.pack(entries, True)
+            while len(nodes) > 1:
+                nodes = self.pack([(node.bounds, node) for node in nodes], False)
+            self.root = nodes[0]
+        self.size += len(entries)
+
+    def pack(self, entries: list, leaf: bool) -> list:
+        count = math.ceil(len(entries) / self.maxEntries)
+        slabs = math.ceil(math.sqrt(count))
+        perSlab = slabs * self.maxEntries
+        entries.sort(key=lambda entry: entry[0][0] + entry[0][3])
+        nodes = []
+        for first in range(0, len(entries), perSlab):
+            slab = sorted(entries[first:first + perSlab], key=lambda entry: entry[0][1] + entry[0][4])
+            nodes.extend(_Node(leaf, slab[i:i + self.maxEntries]) for i in range(0, len(slab), self.maxEntries))
+        return nodes
+
+    def insertEntry(self, entry: tuple):
+        split = self.insertInto(self.root, entry)
+        if split is not None:
+            self.root = _Node(False, [(self.root.bounds, self.root), (split.bounds, split)])
+
+    def insertInto(self, node: _Node, entry: tuple) -> _Node:
+        """Add the entry under the node and return the new sibling if the node was split."""
+        bounds = entry[0]
+        if node.leaf:
+            node.entries.append(entry)
+        else:
+            index = min(range(len(node.entries)), key=lambda i: self.enlargement(node.entries[i][0], bounds))
+            child = node.entries[index][1]
+            split = self.insertInto(child, entry)
+            node.entries[index] = (child.bounds, child)
+            if split is not None:
+                node.entries.append((split.bounds, split))
+
+        if len(node.entries) > self.maxEntries:
+            return self.split(node)
+        node.bounds = bounds if node.bounds is None else _union(node.bounds, bounds)
+        return None
+
+    @staticmethod
+    def enlargement(bounds: tuple, added: tuple) -> tuple:
+        area = _area(bounds)
+        return (_area(_union(bounds, added)) - area, area)
+
+    def split(self, node: _Node) -> _Node:
+        entries = node.entries
+        # seeds: the pair that would waste the most area together
+        first, second = max(itertools.combinations(range(len(entries)), 2),
+                            key=lambda pair: _area(_union(entries[pair[0]][0], entries[pair[1]][0]))
+                            - _area(entries[pair[0]][0]) - _area(entries[pair[1]][0]))
+        groups = ([entries[first]], [entries[second]])
+        bounds = [entries[first][0], entries[second][0]]
+        rest = [entry for i, entry in enumerate(entries) if i not in (first, second)]
+        while rest:
+            for g in (0, 1):
+                if len(groups[g]) + len(rest) == self.minEntries:
+                    groups[g].extend(rest)
+                    rest = []
+                    break
+            else:
+                # the entry with the strongest preference for one group goes next
+                costs = [(self.enlargement(bounds[0], entry[0])[0], self.enlargement(bounds[1], entry[0])[0])
+                         for entry in rest]
+                index = max(range(len(rest)), key=lambda i: abs(costs[i][0] - costs[i][1]))
+                entry = rest.pop(index)
+                g = 0 if (costs[index][0], _area(bounds[0]), len(groups[0])) <= \
+                    (costs[index][1], _area(bounds[1]), len(groups[1])) else 1
+                groups[g].append(entry)
+                bounds[g] = _union(bounds[g], entry[0])
+
+        node.entries = groups[0]
+        node.tighten()
+        return _Node(node.leaf, groups[1])
+
+    def remove(self, bounds: tuple, item) -> bool:
+        """Remove the item inserted with the bounds; entries of underfull nodes are inserted again."""
+        orphans = []
+        if not self.removeFrom(self.root, tuple(bounds), item, orphans):
+            return False
+        self.size -= 1
+        if not self.root.leaf and len(self.root.entries) == 1:
+            self.root = self.root.entries[0][1]
+        elif not self.root.entries:
+            self.root = _Node(True)
+        for entry in orphans:
+            self.insertEntry(entry)
+        return True
+
+    def removeFrom(self, node: _Node, bounds: tuple, item, orphans: list) -> bool:
+        if node.leaf:
+            for i, (entryBounds, entryItem) in enumerate(node.entries):
+                if entryItem == item and entryBounds == bounds:
+                    del node.entries[i]
+                    node.tighten()
+                    return True
+            return False
+
+        for i, (childBounds, child) in enumerate(node.entries):
+            if _covers(childBounds, bounds) and self.removeFrom(child, bounds, item, orphans):
+                if len(child.entries) < self.minEntries:
+                    del node.entries[i]
+                    orphans.extend(self.leafEntries(child))
+                else:
+                    node.entries[i] = (child.bounds, child)
+                node.tighten()
+                return True
+        return False
+
+    def leafEntries(self, node: _Node) -> list:
+        if node.leaf:
+            return list(node.entries)
+        return [entry for _, child in node.entries for entry in self.leafEntries(child)]
+
+    def covering(self, bounds: tuple) -> list:
+        """The items whose bounds contain the passed ones."""
+        ret = []
+        stack = [self.root] if self.root.entries else []
+        while stack:
+            node = stack.pop()
+            for entryBounds, entry in node.entries:
+                if _covers(entryBounds, bounds):
+                    if node.leaf:
+                        ret.append(entry)
+                    else:
+                        stack.append(entry)
+        return ret
+
+    def intersecting(self, bounds: tuple) -> list:
+        """The items whose bounds intersect the passed ones."""
+        ret = []
+        stack = [self.root] if self.root.entries else []
+        while stack:
+            node = stack.pop()
+            for entryBounds, entry in node.entries:
+                if _intersects(entryBounds, bounds):
+                    if node.leaf:
+                        ret.append(entry)
+                    else:
+                        stack.append(entry)
+        return ret
+
+
+class LibSpatialIndexRTree():
+    """The same index kept by libspatialindex through the `rtree` package."""
+
+    name = "rtree"
+
+    # libspatialindex needs finite coordinates: empty periods are stored as this instant
+    # and searches without a period span the whole time axis
+    NO_TIME = 0.0
+    TIME_SPAN = 1e18
+
+    def __init__(self) -> None:
+        properties = rtree.index.Property()
+        properties.dimension = 3
+        self.index = rtree.index.Index(properties=properties)
+        self.items = {}
+        self.ids = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def coordinates(self, bounds: tuple, search: bool = False) -> tuple:
+        if bounds[2] <= bounds[5]:
+            return bounds
+        start, end = (-self.TIME_SPAN, self.TIME_SPAN) if search else (self.NO_TIME, self.NO_TIME)
+        return (bounds[0], bounds[1], start, bounds[3], bounds[4], end)
+
+    def load(self, entries):
+        for bounds, item in entries:
+            self.insert(bounds, item)
+
+    def insert(self, bounds: tuple, item):
+        id = next(self.ids)
+        bounds = tuple(bounds)
+        self.items[id] = (bounds, item)
+        self.index.insert(id, self.coordinates(bounds))
+
+    def remove(self, bounds: tuple, item) -> bool:
+        bounds = tuple(bounds)
+        for id, entry in self.items.items():
+            if entry[0] == bounds and entry[1] == item:
+                self.index.delete(id, self.coordinates(bounds))
+                del self.items[id]
+                return True
+        return False
+
+    def covering(self, bounds: tuple) -> list:
+        return [self.items[id][1] for id in self.index.intersection(self.coordinates(bounds, search=True))
+                if _covers(self.items[id][0], bounds)]
+
+    def intersecting(self, bounds: tuple) -> list:
+        return [self.items[id][1] for id in self.index.intersection(self.coordinates(bounds, search=True))
+                if _intersects(self.items[id][0], bounds)]
+
+
+def availableBackends() -> list:
+    """The names of the R-tree backends that can be used in this interpreter."""
+    return [PythonRTree.name] + ([LibSpatialIndexRTree.name] if rtree is not None else [])
+
+
+def createIndex(backend: str = None):
+    """A new R-tree with the named backend; by default the C one if it is installed."""
+    if backend is None:
+        backend = LibSpatialIndexRTree.name if rtree is not None else PythonRTree.name
+    if backend == PythonRTree.name:
+        return PythonRTree()
+    if backend == LibSpatialIndexRTree.name and rtree is not None:
+        return LibSpatialIndexRTree()
+    raise KlabIllegalArgumentException(f"R-tree backend {backend} is not installed; available: "
+                                       f"{', '.join(availableBackends())}")
+
+
+def resolutionKey(resolution: str) -> tuple:
+    """A grid resolution string like "1 km" as a comparable (size, unit) in meters or degrees."""
+    value, unit = KlabSpace.parseResolution(resolution)
+    meters = RESOLUTION_UNITS[unit]
+    return (round(value, 9), "deg") if meters is None else (round(value * meters, 6), "m")
+
+
+class CachedContext():
+    """A context in a `ContextIndex`, with the files its observations were exported to by observable."""
+
+    def __init__(self, reference: ObservationReference, extent: Extent, resolution: tuple, context=None) -> None:
+        self.reference = reference
+        self.extent = extent
+        self.resolution = resolution
+        self.context = context
+        self.exports = {}
+
+    @property
+    def id(self) -> str:
+        return self.reference.id
+
+    def __str__(self) -> str:
+        return f"CachedContext [id={self.id}, extent={self.extent}, resolution={self.resolution}]"
+
+
+class ContextIndex():
+    """
+    The contexts computed so far by extent, time period and grid resolution. Contexts are
+    added as `Context` objects or as their references, e.g. read from an `ObservationStore`.
+    """
+
+    def __init__(self, backend: str = None) -> None:
+        self.index = createIndex(backend)
+        self.contexts = {}
+
+    def __len__(self) -> int:
+        return len(self.contexts)
+
+    def __contains__(self, id: str) -> bool:
+        return id in self.contexts
+
+    def add(self, context) -> CachedContext:
+        """Index a context, replacing any previous entry with the same id."""
+        cached = self.cache(context)
+        self.remove(cached.id)
+        self.contexts[cached.id] = cached
+        self.index.insert(cached.extent.bounds, cached.id)
+        return cached
+
+    def cache(self, context) -> CachedContext:
+        reference = context if isinstance(context, ObservationReference) else context.reference
+        scale = reference.scaleReference if reference else None
+        if scale is None:
+            raise KlabIllegalArgumentException(f"context {reference.id if reference else None} has no scale to index")
+        resolution = None
+        for description in (scale.spaceResolutionDescription,
+                            f"{scale.spaceResolution} {scale.spaceUnit}" if scale.spaceUnit else None):
+            try:
+                resolution = resolutionKey(description)
+                break
+            except KlabIllegalArgumentException:
+                pass
+
+        return CachedContext(reference, Extent.fromScale(scale), resolution, None if context is reference else context)
+
+    def addAll(self, contexts) -> list:
+        """Index the contexts that have a scale, skipping the others, loading the index in bulk."""
+        added = []
+        for context in contexts:
+            reference = context if isinstance(context, ObservationReference) else context.reference
+            if reference.scaleReference is not None:
+                self.remove(reference.id)
+                cached = self.cache(context)
+                self.contexts[cached.id] = cached
+                added.append(cached)
+        self.index.load((cached.extent.bounds, cached.id) for cached in added)
+        return added
+
+    def remove(self, id: str) -> bool:
+        cached = self.contexts.pop(id, None)
+        if cached is None:
+            return False
+        return self.index.remove(cached.extent.bounds, id)
+
+    def addExport(self, id: str, observable: str, path: str):
+        """Record that the observation of `observable` in the context was exported to `path`."""
+        if id not in self.contexts:
+            raise KlabIllegalArgumentException(f"context {id} is not indexed")
+        self.contexts[id].exports[str(observable)] = path
+
+    def covering(self, extent, resolution: str = None) -> list:
+        """
+        The contexts covering the extent (or the extent of a `KlabGeometry`, whose grid
+        resolution is then used if none is passed) with the same time period and the same
+        resolution, smallest first, so the first one needs the least cropping. Requests
+        without a period or resolution only match contexts without one either.
+        """
+        if isinstance(extent, KlabGeometry):
+            if resolution is None:
+                resolution = _gridResolution(extent)
+            extent = Extent.fromGeometry(extent)
+        key = resolutionKey(resolution) if resolution else None
+        # the tree finds contexts containing the period; only the same period is a match
+        ret = [cached for cached in (self.contexts[id] for id in self.index.covering(extent.bounds))
+               if cached.resolution == key and cached.extent.samePeriod(extent)]
+        ret.sort(key=lambda cached: cached.extent.area)
+        return ret
+
+    def findExport(self, extent, observable: str, resolution: str = None) -> tuple:
+        """The smallest covering context with an export of the observable and the exported path, or None."""
+        observable = str(observable)
+        for cached in self.covering(extent, resolution):
+            if observable in cached.exports:
+                return cached, cached.exports[observable]
+        return None
+
+    def cropExport(self, extent, observable: str, output: str, resolution: str = None) -> str:
+        """
+        Write the part of a cached export covering the extent to `output` and return it, or
+        return None if no cached export covers it. Requires rasterio.
+        """
+        found = self.findExport(extent, observable, resolution)
+        if found is None:
+            return None
+        if isinstance(extent, KlabGeometry):
+            extent = Extent.fromGeometry(extent)
+        return crop(found[1], extent, output)
+
+
+def _gridResolution(geometry: KlabGeometry) -> str:
+    for dimension in geometry.dimensions:
+        if dimension.getType() == DimensionType.SPACE:
+            return dimension.getParameters().get(PARAMETER_SPACE_GRIDRESOLUTION)
+    return None
+
+
+def crop(path: str, extent: Extent, output: str) -> str:
+    """Copy the cells of the raster at `path` that cover the extent to a new GeoTIFF. Requires rasterio."""
+    try:
+        import rasterio
+        from rasterio.windows import Window, from_bounds
+    except ImportError:
+        raise KlabIllegalStateException("cropping exports requires rasterio: pip install rasterio")
+
+    with rasterio.open(path) as source:
+        # whole cells, so that values are copied and never resampled
+        bounds = from_bounds(extent.west, extent.south, extent.east, extent.north, transform=source.transform)
+        column, row = math.floor(bounds.col_off + 1e-9), math.floor(bounds.row_off + 1e-9)
+        window = Window(column, row, max(math.ceil(bounds.col_off + bounds.width - 1e-9) - column, 1),
+                        max(math.ceil(bounds.row_off + bounds.height - 1e-9) - row, 1))
+        profile = source.profile.copy()
+        profile.update(driver="GTiff", width=window.width, height=window.height,
+                       transform=source.window_transform(window))
+        with rasterio.open(output, "w", **profile) as destination:
+            destination.write(source.read(window=window, boundless=True, fill_value=source.nodata or 0))
+    return output
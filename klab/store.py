@@ -0,0 +1,250 @@
+"""
+A local SQLite file of the observations made through a client, so that separate worker
+processes can find contexts and observations already computed without asking the engine:
+
+    store = ObservationStore("observations.db")
+    klab.useStore(store)
+    ...
+    # in any other process
+    for reference in ObservationStore("observations.db").find(observable="geography:Elevation",
+                                                              geometry=geometry):
+        ...
+
+References are written as their tickets resolve, by a writer thread of the store so that
+the event loop polling the tickets never waits on the database. The database runs in WAL
+mode, so readers in other processes never block the writers, and each lookup goes
+through an index, which keeps it fast with millions of rows.
+"""
+from .geometry import KlabGeometry, PARAMETER_TIME_START, PARAMETER_TIME_END
+from .references import ObservationReference
+from .types import DimensionType
+from .codec import CODEC, getCodec
+from .exceptions import *
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import sqlite3
+import threading
+
+LOGGER = logging.getLogger(__name__)
+
+BUSY_TIMEOUT_SEC = 30
+"""Seconds a write waits for another process to release the database."""
+
+SCHEMA = [
+    # geometries are long strings shared by many observations, so each is stored once
+    """CREATE TABLE IF NOT EXISTS geometries (
+        id INTEGER PRIMARY KEY,
+        encoded TEXT NOT NULL UNIQUE)""",
+    """CREATE TABLE IF NOT EXISTS observations (
+        id TEXT NOT NULL UNIQUE,
+        contextId TEXT,
+        observable TEXT,
+        geometryId INTEGER,
+        periodStart INTEGER,
+        periodEnd INTEGER,
+        creationTime INTEGER,
+        reference BLOB NOT NULL)""",
+    "CREATE INDEX IF NOT EXISTS observationsByContext ON observations (contextId)",
+    # the observable ones also serve lookups by observable alone
+    "CREATE INDEX IF NOT EXISTS observationsByObservable ON observations (observable, geometryId, periodStart)",
+    "CREATE INDEX IF NOT EXISTS observationsByObservablePeriod ON observations (observable, periodStart, periodEnd)",
+    "CREATE INDEX IF NOT EXISTS observationsByGeometry ON observations (geometryId, periodStart)",
+    "CREATE INDEX IF NOT EXISTS observationsByPeriod ON observations (periodStart, periodEnd)",
+    "CREATE INDEX IF NOT EXISTS observationsByCreation ON observations (creationTime)",
+]
+
+COLUMNS = "id, contextId, observable, geometryId, periodStart, periodEnd, creationTime, reference"
+
+
+def encodeGeometry(geometry) -> str:
+    """The geometry as stored: its encoded form, also accepted as is."""
+    if geometry is None or isinstance(geometry, str):
+        return geometry
+    return geometry.encode()
+
+
+def geometryPeriod(geometry) -> tuple:
+    """The (start, end) milliseconds of the time dimension of the geometry, or (None, None)."""
+    if isinstance(geometry, str):
+        geometry = KlabGeometry.create(geometry)
+    if isinstance(geometry, KlabGeometry):
+        for dimension in geometry.dimensions:
+            if dimension.getType() == DimensionType.TIME:
+                start = dimension.getParameters().get(PARAMETER_TIME_START)
+                end = dimension.getParameters().get(PARAMETER_TIME_END)
+                return (int(start) if start is not None else None, int(end) if end is not None else None)
+    return (None, None)
+
+
+class ObservationStore():
+    """
+    Observation references kept in the SQLite database at `path`, created if missing. One
+    store can be shared by all the threads of a process; every process opens its own.
+    Ticket results are written in order by a single writer thread, see `recordLater()`.
+    """
+
+    def __init__(self, path: str, codec=None, timeoutSeconds: float = BUSY_TIMEOUT_SEC) -> None:
+        self.path = path
+        self.codec = getCodec(codec) if codec else CODEC
+        self.lock = threading.Lock()
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="klab-store")
+        self.connection = sqlite3.connect(path, timeout=timeoutSeconds, check_same_thread=False)
+        with self.lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            # durable at checkpoints only: a crash loses at most the latest records, never the file
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            with self.connection:
+                for statement in SCHEMA:
+                    self.connection.execute(statement)
+
+    def close(self):
+        """Write the results still queued by `recordLater()`, then close the database."""
+        self.writer.shutdown(wait=True)
+        with self.lock:
+            self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM observations").fetchone()[0]
+
+    def __contains__(self, id: str) -> bool:
+        with self.lock:
+            return self.connection.execute("SELECT 1 FROM observations WHERE id = ?", (id,)).fetchone() is not None
+
+    def row(self, reference: ObservationReference, geometryId: int, period: tuple) -> tuple:
+        # missing fields decode as None, so they are not stored
+        data = {key: value for key, value in reference.toDict().items() if value is not None}
+        return (reference.id, reference.contextId, reference.observable, geometryId, period[0], period[1],
+                reference.creationTime, self.codec.dumpb(data))
+
+    def geometryId(self, geometry, create: bool = False) -> int:
+        encoded = encodeGeometry(geometry)
+        if encoded is None:
+            return None
+        row = self.connection.execute("SELECT id FROM geometries WHERE encoded = ?", (encoded,)).fetchone()
+        if row:
+            return row[0]
+        if create:
+            return self.connection.execute("INSERT INTO geometries (encoded) VALUES (?)", (encoded,)).lastrowid
+        return -1
+
+    def put(self, reference: ObservationReference, geometry=None):
+        """Store the reference, replacing any with the same id."""
+        self.putAll([reference], geometry)
+
+    def putAll(self, references: list, geometry=None):
+        """
+        Store the references in one transaction. `geometry` (a `KlabGeometry` or its
+        encoded form) is the one the observations were made in; without it, observations
+        inherit the geometry and period stored for their context.
+        """
+        references = [reference for reference in references if reference and reference.id]
+        if not references:
+            return
+        period = geometryPeriod(geometry)
+        with self.lock, self.connection:
+            geometryId = self.geometryId(geometry, create=True)
+            rows = [self.row(reference, geometryId, period) for reference in references]
+            if geometry is None:
+                rows = [self.inherit(row) for row in rows]
+            self.connection.executemany(f"INSERT OR REPLACE INTO observations ({COLUMNS}) VALUES "
+                                        "(?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def inherit(self, row: tuple) -> tuple:
+        contextId = row[1]
+        if contextId is None or contextId == row[0]:
+            return row
+        context = self.connection.execute("SELECT geometryId, periodStart, periodEnd FROM observations WHERE id = ?",
+                                          (contextId,)).fetchone()
+        return row[:3] + tuple(context) + row[6:] if context else row
+
+    def record(self, result, geometry=None):
+        """
+        Store the result of a ticket: a context with the observations made along with it,
+        or an observation. Anything else (estimates, failed tickets) is ignored.
+        """
+        reference = getattr(result, "reference", None)
+        if reference is None:
+            return
+        self.put(reference, geometry)
+        children = [child.reference for child in getattr(result, "catalog", {}).values() if child.reference]
+        if children:
+            self.putAll(children)
+
+    def recordLater(self, result, geometry=None):
+        """
+        Queue `record()` on the writer thread and return its future, which never raises:
+        errors are logged, like those of the other ticket completion callbacks.
+        """
+        def write():
+            try:
+                self.record(result, geometry)
+            except Exception as err:
+                LOGGER.error(f"cannot store {result}: {err}")
+
+        return self.writer.submit(write)
+
+    def track(self, handler, geometry=None):
+        """Record the result of the ticket handler when it completes, and return the handler."""
+        return handler.onCompletion(lambda result: self.recordLater(result, geometry))
+
+    def get(self, id: str) -> ObservationReference:
+        """The stored reference with the id, or None."""
+        with self.lock:
+            row = self.connection.execute("SELECT reference FROM observations WHERE id = ?", (id,)).fetchone()
+        return ObservationReference.fromDict(self.codec.loads(row[0])) if row else None
+
+    def select(self, columns: str, contextId: str = None, observable: str = None, geometry=None, start: int = None,
+               end: int = None, createdAfter: int = None, limit: int = None) -> list:
+        conditions, parameters = [], []
+        with self.lock:
+            # -1 for a geometry never stored, which matches nothing
+            geometryId = self.geometryId(geometry)
+        for column, value in (("contextId", contextId), ("observable", observable), ("geometryId", geometryId)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                parameters.append(value)
+        if start is not None:
+            conditions.append("periodStart <= ?")
+            parameters.append(int(start))
+        if end is not None:
+            conditions.append("periodEnd >= ?")
+            parameters.append(int(end))
+        if createdAfter is not None:
+            conditions.append("creationTime > ?")
+            parameters.append(int(createdAfter))
+
+        sql = f"SELECT {columns} FROM observations"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        if createdAfter is not None:
+            sql += " ORDER BY creationTime"
+        if limit is not None:
+            sql += " LIMIT ?"
+            parameters.append(int(limit))
+        with self.lock:
+            return self.connection.execute(sql, parameters).fetchall()
+
+    def find(self, contextId: str = None, observable: str = None, geometry=None, start: int = None, end: int = None,
+             createdAfter: int = None, limit: int = None) -> list:
+        """
+        The stored references matching all the passed conditions: context id, observable,
+        geometry (a `KlabGeometry` or its encoded form), a period from `start` to `end`
+        milliseconds that they cover, and creation after `createdAfter` (in which case they
+        come in creation order).
+        """
+        rows = self.select("reference", contextId, observable, geometry, start, end, createdAfter, limit)
+        loads = self.codec.loads
+        return [ObservationReference.fromDict(loads(row[0])) for row in rows]
+
+    def ids(self, contextId: str = None, observable: str = None, geometry=None, start: int = None, end: int = None,
+            createdAfter: int = None, limit: int = None) -> list:
+        """Same as `find()`, returning only the ids of the references."""
+        rows = self.select("id", contextId, observable, geometry, start, end, createdAfter, limit)
+        return [row[0] for row in rows]
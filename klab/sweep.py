@@ -0,0 +1,249 @@
+from .geometry import GeometryBuilder
+from .observable import Observable
+from .utils import ExportFormat
+from .concurrency import asCompleted, exportObservation, observeInContext, resolveTicket, runBlocking
+from .exceptions import *
+import re
+
+import logging
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 8
+"""Default number of contexts or observations in progress at the same time in a sweep."""
+
+
+class PeriodResult():
+    """The outcome of observing one period of a `TemporalSweep`; `error` is set if it failed."""
+
+    def __init__(self, period: tuple) -> None:
+        self.period = period
+        self.context = None
+        self.observation = None
+        self.path = None
+        self.error = None
+
+    @property
+    def label(self) -> str:
+        """The period as "2010" or "2010-2015", used to name exports."""
+        return "-".join(str(year) for year in self.period)
+
+    def __str__(self) -> str:
+        return f"PeriodResult [period={self.label}, path={self.path}, error={self.error}]"
+
+
+class TemporalSweep():
+    """
+    Observes the same observable over the same region in a separate context for each of a
+    list of periods, with at most `maxConcurrency` periods in progress at a time. The region
+    is given like in `GeometryBuilder.grid`, as a bounding box or a URN/WKT, and a resolution.
+    Each period is a single year or a (start, end) pair of years as accepted by
+    `GeometryBuilder.years`.
+    """
+
+    def __init__(self, klab, observable: Observable, resolution: str, urn: str = None, bbox: tuple = None,
+                 maxConcurrency: int = DEFAULT_MAX_CONCURRENCY, contextType: str = "earth:Region",
+                 timeoutSeconds: int = 900) -> None:
+        if not urn and not bbox:
+            raise KlabIllegalArgumentException("a temporal sweep needs a region as urn or bounding box")
+        self.klab = klab
+        self.observable = observable
+        self.resolution = resolution
+        self.urn = urn
+        self.bbox = bbox
+        self.maxConcurrency = maxConcurrency
+        self.contextType = Observable.create(contextType)
+        self.timeoutSeconds = timeoutSeconds
+
+    def geometry(self, period: tuple):
+        if self.bbox:
+            builder = GeometryBuilder().grid(*self.bbox, resolution=self.resolution)
+        else:
+            builder = GeometryBuilder().grid(urn=self.urn, resolution=self.resolution)
+        return builder.years(*period).build()
+
+    async def stream(self, periods: list, eformat: ExportFormat = None, pathPattern: str = None):
+        """
+        Yield a `PeriodResult` for each period as soon as it is observed and, if a format is
+        passed, exported to `pathPattern` formatted with the period label, e.g.
+        "out/elevation_{period}.tif".
+        """
+        if eformat and not pathPattern:
+            raise KlabIllegalArgumentException("exporting a sweep needs a path pattern")
+
+        periods = [tuple(p) if isinstance(p, (tuple, list)) else (p,) for p in periods]
+        async for result in asCompleted((self.observePeriod(PeriodResult(p), eformat, pathPattern) for p in periods),
+                                        self.maxConcurrency):
+            yield result
+
+    async def run(self, periods: list, eformat: ExportFormat = None, pathPattern: str = None) -> list:
+        """Observe all periods and return their results in period order."""
+        results = [result async for result in self.stream(periods, eformat, pathPattern)]
+        return sorted(results, key=lambda result: result.period)
+
+    async def observePeriod(self, result: PeriodResult, eformat: ExportFormat, pathPattern: str) -> PeriodResult:
+        try:
+            result.context = await resolveTicket(self.klab.submit, self.contextType, self.geometry(result.period),
+                                                 timeoutSeconds=self.timeoutSeconds)
+            if result.context is None:
+                raise KlabRemoteException(f"could not create the context for {result.label}")
+
+            result.observation = await observeInContext(self.klab, result.context, self.observable,
+                                                        timeoutSeconds=self.timeoutSeconds)
+            if result.observation is None or result.observation.isEmpty():
+                raise KlabRemoteException(f"could not observe {self.observable} in {result.label}")
+
+            if eformat:
+                path = pathPattern.format(period=result.label)
+                await runBlocking(exportObservation, result.observation, eformat, path)
+                result.path = path
+        except Exception as err:
+            LOGGER.error(f"sweep of {self.observable} failed for {result.label}: {err}")
+            result.error = str(err) or type(err).__name__
+        return result
+
+
+BASELINE = "baseline"
+"""Label of the scenario set with no scenarios."""
+
+
+class ScenarioResult():
+    """The outcome of observing under one scenario set of a `ScenarioSweep`; `error` is set if it failed."""
+
+    def __init__(self, scenarios: tuple) -> None:
+        self.scenarios = scenarios
+        self.observation = None
+        self.path = None
+        self.error = None
+
+    @property
+    def label(self) -> str:
+        """The scenario URNs joined with "+", or "baseline" for an empty set."""
+        return "+".join(self.scenarios) or BASELINE
+
+    @property
+    def summary(self):
+        """The `DataSummary` of the observation, or None if it failed or is not a state."""
+        if self.observation is None or self.observation.isEmpty():
+            return None
+        return self.observation.reference.dataSummary
+
+    def __str__(self) -> str:
+        return f"ScenarioResult [scenarios={self.label}, path={self.path}, error={self.error}]"
+
+
+class ScenarioComparison():
+    """
+    Table of the data summaries of the same observable under each scenario set, in the
+    order the scenario sets were passed. Nothing is exported until `export()` is called
+    for the scenarios of interest.
+    """
+
+    COLUMNS = ("scenarios", "nodataProportion", "minValue", "maxValue", "mean")
+
+    def __init__(self, results: list) -> None:
+        self.results = results
+
+    def get(self, label: str) -> ScenarioResult:
+        for result in self.results:
+            if result.label == label:
+                return result
+        raise KlabIllegalArgumentException(f"no scenario set {label} in this comparison")
+
+    @property
+    def rows(self) -> list:
+        """One tuple per scenario set with the values in `COLUMNS`; values are None for failed ones."""
+        rows = []
+        for result in self.results:
+            summary = result.summary
+            if summary is None:
+                rows.append((result.label, None, None, None, None))
+            else:
+                rows.append((result.label, summary.nodataProportion, summary.minValue, summary.maxValue, summary.mean))
+        return rows
+
+    def failed(self) -> list:
+        return [result for result in self.results if result.error]
+
+    async def export(self, labels: list, eformat: ExportFormat, pathPattern: str,
+                     maxConcurrency: int = DEFAULT_MAX_CONCURRENCY) -> list:
+        """
+        Export the data of the selected scenario sets to `pathPattern` formatted with the
+        scenario label, e.g. "out/landcover_{scenario}.tif", and return their results.
+        """
+        selected = [self.get(label) for label in labels]
+        unusable = [result.label for result in selected if result.error]
+        if unusable:
+            raise KlabIllegalArgumentException(f"cannot export failed scenario sets {', '.join(unusable)}")
+
+        async def exportResult(result: ScenarioResult) -> ScenarioResult:
+            path = pathPattern.format(scenario=_fileLabel(result.label))
+            await runBlocking(exportObservation, result.observation, eformat, path)
+            result.path = path
+            return result
+
+        return [result async for result in asCompleted((exportResult(r) for r in selected), maxConcurrency)]
+
+    def __str__(self) -> str:
+        cells = [self.COLUMNS] + [tuple(_cell(value) for value in row) for row in self.rows]
+        widths = [max(len(row[i]) for row in cells) for i in range(len(self.COLUMNS))]
+        return "\n".join("  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip()
+                         for row in cells)
+
+
+def _cell(value) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    return str(value)
+
+
+def _fileLabel(label: str) -> str:
+    """A scenario label usable in a file name."""
+    return re.sub(r"[^\w.+-]", "_", label)
+
+
+class ScenarioSweep():
+    """
+    Observes the same observable in an existing context under each of a list of scenario
+    sets, with at most `maxConcurrency` observations in progress at a time. Each scenario
+    set is a scenario URN or a list of them; an empty list observes the baseline.
+    """
+
+    def __init__(self, context, observable: Observable, maxConcurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 timeoutSeconds: int = 900) -> None:
+        self.context = context
+        self.observable = observable
+        self.maxConcurrency = maxConcurrency
+        self.timeoutSeconds = timeoutSeconds
+
+    async def stream(self, scenarioSets: list):
+        """
+        Yield a `ScenarioResult` for each scenario set as soon as it is observed. States
+        injected in the context before the sweep are sent with every scenario set.
+        """
+        sets = [(s,) if isinstance(s, str) else tuple(s) for s in scenarioSets]
+        states = self.context.takeInjectedStates()
+        async for result in asCompleted((self.observeScenarios(ScenarioResult(s), states) for s in sets),
+                                        self.maxConcurrency):
+            yield result
+
+    async def run(self, scenarioSets: list) -> ScenarioComparison:
+        """Observe under all scenario sets and return the comparison table in the order passed."""
+        sets = [(s,) if isinstance(s, str) else tuple(s) for s in scenarioSets]
+        if len(set(sets)) != len(sets):
+            raise KlabIllegalArgumentException("duplicated scenario sets in sweep")
+        results = {result.scenarios: result async for result in self.stream(sets)}
+        return ScenarioComparison([results[s] for s in sets])
+
+    async def observeScenarios(self, result: ScenarioResult, states: dict = None) -> ScenarioResult:
+        try:
+            result.observation = await resolveTicket(self.context.submit, self.observable, list(result.scenarios),
+                                                     states, timeoutSeconds=self.timeoutSeconds)
+            if result.observation is None or result.observation.isEmpty():
+                raise KlabRemoteException(f"could not observe {self.observable} under {result.label}")
+        except Exception as err:
+            LOGGER.error(f"sweep of {self.observable} failed for {result.label}: {err}")
+            result.error = str(err) or type(err).__name__
+        return result
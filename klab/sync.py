@@ -0,0 +1,118 @@
+from .klab import Klab
+from .observable import Observable
+from .observation import Context, Observation
+from .geometry import KlabGeometry
+from .ticket import Estimate
+from .utils import DEFAULT_LOCAL_ENGINE_URL, Export, ExportFormat
+from .concurrency import resolveTicket
+from concurrent.futures import Future, ThreadPoolExecutor
+import asyncio
+import threading
+
+import logging
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 32
+"""Default number of threads available for blocking engine requests and exports."""
+
+
+class SyncKlab():
+    """
+    Synchronous facade over a `Klab` (or `KlabCluster`) for code that does not run an event
+    loop. A single event loop runs on a background thread for the lifetime of the facade;
+    every call returns immediately with a `concurrent.futures.Future`, so many requests can
+    be overlapped and collected with `concurrent.futures.wait` or `as_completed`:
+
+    ```
+    with SyncKlab.create() as klab:
+        futures = [klab.submit(region, grid) for grid in grids]
+        for future in as_completed(futures):
+            context = future.result()
+    ```
+
+    Blocking engine calls run on a thread pool of `maxWorkers` threads, which bounds the
+    number of requests actually on the wire at any time.
+    """
+
+    def __init__(self, klab: Klab, maxWorkers: int = DEFAULT_MAX_WORKERS, timeoutSeconds: int = 900):
+        self.klab = klab
+        self.timeoutSeconds = timeoutSeconds
+        self.executor = ThreadPoolExecutor(max_workers=maxWorkers, thread_name_prefix="klab-worker")
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(self.executor)
+        self.thread = threading.Thread(target=self._runLoop, name="klab-loop", daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def create(remoteOrLocalEngineUrl=DEFAULT_LOCAL_ENGINE_URL, username=None, password=None, credentialsFile=None,
+               maxWorkers: int = DEFAULT_MAX_WORKERS):
+        """Authenticate like `Klab.create` and wrap the session in a synchronous facade."""
+        return SyncKlab(Klab.create(remoteOrLocalEngineUrl, username, password, credentialsFile), maxWorkers)
+
+    def _runLoop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def run(self, coroutine) -> Future:
+        """Schedule any coroutine on the background loop and return a future for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    async def resolve(self, call, *arguments):
+        return await resolveTicket(call, *arguments, timeoutSeconds=self.timeoutSeconds)
+
+    def isOnline(self) -> bool:
+        return self.klab.isOnline()
+
+    def submit(self, contextType: Observable, geometry: KlabGeometry, *arguments: list) -> Future:
+        """Same as `Klab.submit`; the future resolves to the `Context`."""
+        return self.run(self.resolve(self.klab.submit, contextType, geometry, *arguments))
+
+    def estimate(self, contextType: Observable, geometry: KlabGeometry, *arguments: list) -> Future:
+        """Same as `Klab.estimate`; the future resolves to the `Estimate`."""
+        return self.run(self.resolve(self.klab.estimate, contextType, geometry, *arguments))
+
+    def submitEstimate(self, estimate: Estimate) -> Future:
+        """Same as `Klab.submitEstimate`; the future resolves to the `Context`."""
+        return self.run(self.resolve(self.klab.submitEstimate, estimate))
+
+    def observe(self, context: Context, observable: Observable, arguments: list = []) -> Future:
+        """Same as `Context.submit`; the future resolves to the `Observation`."""
+        if hasattr(self.klab, "observe"):
+            return self.run(self.resolve(self.klab.observe, context, observable, arguments))
+        return self.run(self.resolve(context.submit, observable, arguments))
+
+    def exportToFile(self, observation: Observation, target: Export, eformat: ExportFormat, path: str,
+                     parameters: list = []) -> Future:
+        """Same as `Observation.exportToFile`, run on the worker threads."""
+        return self.executor.submit(observation.exportToFile, target, eformat, path, parameters)
+
+    def exportToString(self, observation: Observation, target: Export, eformat: ExportFormat) -> Future:
+        """Same as `Observation.exportToString`, run on the worker threads."""
+        return self.executor.submit(observation.exportToString, target, eformat)
+
+    async def _cancelPending(self):
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def close(self):
+        """
+        Cancel the requests still pending, so that their futures raise `CancelledError`
+        instead of never resolving, then stop the background loop and the worker threads
+        and close the session.
+        """
+        if self.thread.is_alive():
+            asyncio.run_coroutine_threadsafe(self._cancelPending(), self.loop).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop.close()
+            self.executor.shutdown(wait=True)
+        return self.klab.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
@@ -1,5 +1,6 @@
 from enum import Enum
 from .exceptions import *
+from .utils import EnumLookup
 
 
 class TicketType(Enum):
@@ -13,11 +14,7 @@ class TicketType(Enum):
 
     @staticmethod
     def fromValue(value: str):
-        for ts in TicketType:
-            if ts.value.lower() == value.lower():
-                return ts
-        raise KlabIllegalArgumentException(
-            f"no TicketType available with the value {value}")
+        return _TICKET_TYPES.get(value)
 
 
 class TicketStatus(Enum):
@@ -27,11 +24,11 @@ class TicketStatus(Enum):
 
     @staticmethod
     def fromValue(value: str):
-        for ts in TicketStatus:
-            if ts.value.lower() == value.lower():
-                return ts
-        raise KlabIllegalArgumentException(
-            f"no TicketStatus available with the value {value}")
+        return _TICKET_STATUSES.get(value)
+
+
+_TICKET_TYPES = EnumLookup(TicketType)
+_TICKET_STATUSES = EnumLookup(TicketStatus)
 
 
 class Ticket():
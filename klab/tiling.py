@@ -0,0 +1,235 @@
+from .geometry import GeometryBuilder, KlabSpace
+from .observable import Observable
+from .utils import ExportFormat
+from .concurrency import asCompleted, exportObservation, observeInContext, resolveTicket, runBlocking
+from .exceptions import *
+import math
+import os
+
+import logging
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_MAX_CELLS = 1000000
+"""Default maximum number of grid cells in each tile."""
+
+MOSAIC_BLOCK_ROWS = 256
+"""Rows copied at a time when mosaicking, which bounds the memory used for each tile."""
+
+
+class Tile():
+    """
+    One tile of a region split by `SpatialTiling`. The core bounds partition the region;
+    the bounds also include the overlap with the neighbouring tiles and are the ones that
+    are observed.
+    """
+
+    def __init__(self, column: int, row: int, core: tuple, bounds: tuple) -> None:
+        self.column = column
+        self.row = row
+        self.core = core
+        self.bounds = bounds
+        self.context = None
+        self.observation = None
+        self.path = None
+        self.error = None
+
+    def __str__(self) -> str:
+        return f"Tile [column={self.column}, row={self.row}, bounds={self.bounds}]"
+
+
+class SpatialTiling():
+    """
+    Splits a lat/lon bounding box or WKT region into tiles of at most `maxCells` grid cells
+    at the passed resolution, optionally extended by `overlap` cells on each side.
+    """
+
+    def __init__(self, resolution: str, maxCells: int = DEFAULT_MAX_CELLS, overlap: int = 0) -> None:
+        if maxCells < 1 or overlap < 0:
+            raise KlabIllegalArgumentException("tiles need at least one cell and a non-negative overlap")
+        self.resolution = resolution
+        self.maxCells = maxCells
+        self.overlap = overlap
+
+    def split(self, region) -> list:
+        """
+        Return the tiles covering the region, passed as a WKT string or as a bounding box
+        [minX, maxX, minY, maxY]. For WKT regions, tiles that do not touch the shape are
+        left out.
+        """
+        rings = None
+        if isinstance(region, str):
+            rings = KlabSpace.wktRings(region)
+            x1, x2, y1, y2 = KlabSpace.wktBounds(region)
+        else:
+            x1, x2, y1, y2 = region
+
+        dx, dy = KlabSpace.resolutionToDegrees(self.resolution, (y1 + y2) / 2)
+        side = max(int(math.isqrt(self.maxCells)) - 2 * self.overlap, 1)
+        # tiles are whole numbers of cells from the north-west corner, so that all tiles
+        # share the same grid and can be mosaicked without resampling
+        width = side * dx
+        height = side * dy
+        columns = max(math.ceil((x2 - x1) / width - 1e-9), 1)
+        rows = max(math.ceil((y2 - y1) / height - 1e-9), 1)
+        ox = self.overlap * dx
+        oy = self.overlap * dy
+
+        tiles = []
+        for row in range(rows):
+            for column in range(columns):
+                core = (x1 + column * width, min(x1 + (column + 1) * width, x2),
+                        max(y2 - (row + 1) * height, y1), y2 - row * height)
+                if rings and not intersects(rings, core):
+                    continue
+                bounds = (max(core[0] - ox, x1), min(core[1] + ox, x2), max(core[2] - oy, y1), min(core[3] + oy, y2))
+                tiles.append(Tile(column, row, core, bounds))
+
+        return tiles
+
+
+def insideRing(ring: list, x: float, y: float) -> bool:
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i]
+        xj, yj = ring[j]
+        if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+def segmentsCross(a, b, c, d) -> bool:
+    def orientation(p, q, r):
+        return (q[0] - p[0]) * (r[1] - p[1]) - (q[1] - p[1]) * (r[0] - p[0])
+
+    d1 = orientation(c, d, a)
+    d2 = orientation(c, d, b)
+    d3 = orientation(a, b, c)
+    d4 = orientation(a, b, d)
+    return ((d1 > 0) != (d2 > 0)) and ((d3 > 0) != (d4 > 0))
+
+
+def intersects(rings: list, box: tuple) -> bool:
+    """Conservative test of whether a box [minX, maxX, minY, maxY] touches any of the rings."""
+    x1, x2, y1, y2 = box
+    corners = [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+    edges = list(zip(corners, corners[1:] + corners[:1]))
+    for ring in rings:
+        if any(x1 <= x <= x2 and y1 <= y <= y2 for x, y in ring):
+            return True
+        if len(ring) > 2 and any(insideRing(ring, x, y) for x, y in corners):
+            return True
+        for a, b in zip(ring, ring[1:]):
+            if any(segmentsCross(a, b, c, d) for c, d in edges):
+                return True
+    return False
+
+
+class TilingExecutor():
+    """
+    Observes an observable over a large region by splitting it into tiles, each observed in
+    its own context with at most `maxConcurrency` tiles in progress at a time, and exports
+    each tile to a file. Use `mosaic()` to assemble the exported GeoTIFF tiles.
+    """
+
+    def __init__(self, klab, observable: Observable, tiling: SpatialTiling, maxConcurrency: int = 8,
+                 contextType: str = "earth:Region", timeoutSeconds: int = 900) -> None:
+        self.klab = klab
+        self.observable = observable
+        self.tiling = tiling
+        self.maxConcurrency = maxConcurrency
+        self.contextType = Observable.create(contextType)
+        self.timeoutSeconds = timeoutSeconds
+
+    async def stream(self, region, folder: str, years: tuple = (), eformat: ExportFormat = ExportFormat.BYTESTREAM):
+        """Yield each tile as soon as it is exported (or has failed, with its `error` set)."""
+        os.makedirs(folder, exist_ok=True)
+        tiles = self.tiling.split(region)
+        LOGGER.debug(f"observing {self.observable} in {len(tiles)} tiles")
+        async for tile in asCompleted((self.observeTile(tile, folder, years, eformat) for tile in tiles),
+                                      self.maxConcurrency):
+            yield tile
+
+    async def run(self, region, folder: str, years: tuple = (), eformat: ExportFormat = ExportFormat.BYTESTREAM) -> list:
+        """Observe and export all tiles, raising if any of them failed."""
+        tiles = [tile async for tile in self.stream(region, folder, years, eformat)]
+        failed = [tile for tile in tiles if tile.error]
+        if failed:
+            raise KlabRemoteException(f"{len(failed)} of {len(tiles)} tiles failed, first: {failed[0].error}")
+        return sorted(tiles, key=lambda tile: (tile.row, tile.column))
+
+    async def observeTile(self, tile: Tile, folder: str, years: tuple, eformat: ExportFormat) -> Tile:
+        try:
+            x1, x2, y1, y2 = tile.bounds
+            builder = GeometryBuilder().grid(x1, x2, y1, y2, resolution=self.tiling.resolution)
+            if years:
+                builder.years(*years)
+            tile.context = await resolveTicket(self.klab.submit, self.contextType, builder.build(),
+                                               timeoutSeconds=self.timeoutSeconds)
+            if tile.context is None:
+                raise KlabRemoteException(f"could not create the context for {tile}")
+
+            tile.observation = await observeInContext(self.klab, tile.context, self.observable,
+                                                      timeoutSeconds=self.timeoutSeconds)
+            if tile.observation is None or tile.observation.isEmpty():
+                raise KlabRemoteException(f"could not observe {self.observable} in {tile}")
+
+            path = os.path.join(folder, f"tile_{tile.row}_{tile.column}.tif")
+            await runBlocking(exportObservation, tile.observation, eformat, path)
+            tile.path = path
+        except Exception as err:
+            tile.error = str(err) or type(err).__name__
+        return tile
+
+
+def mosaic(tiles: list, output: str, blockRows: int = MOSAIC_BLOCK_ROWS) -> str:
+    """
+    Assemble the GeoTIFF files of the passed tiles into a single raster, copying the core
+    area of each tile a block of rows at a time so that memory does not grow with the size
+    of the mosaic. Requires rasterio.
+    """
+    try:
+        import rasterio
+        from rasterio.windows import Window, from_bounds
+        from rasterio.transform import from_origin
+    except ImportError:
+        raise KlabIllegalStateException("mosaicking tiles requires rasterio: pip install rasterio")
+
+    tiles = [tile for tile in tiles if tile.path]
+    if not tiles:
+        raise KlabIllegalArgumentException("no exported tiles to mosaic")
+
+    with rasterio.open(tiles[0].path) as first:
+        profile = first.profile.copy()
+        xres, yres = first.res
+
+    minX = min(tile.core[0] for tile in tiles)
+    maxX = max(tile.core[1] for tile in tiles)
+    minY = min(tile.core[2] for tile in tiles)
+    maxY = max(tile.core[3] for tile in tiles)
+    transform = from_origin(minX, maxY, xres, yres)
+    profile.update(driver="GTiff", transform=transform, width=max(round((maxX - minX) / xres), 1),
+                   height=max(round((maxY - minY) / yres), 1), tiled=True, blockxsize=256, blockysize=256,
+                   BIGTIFF="IF_SAFER")
+
+    with rasterio.open(output, "w", **profile) as destination:
+        for tile in tiles:
+            with rasterio.open(tile.path) as source:
+                sourceWindow = from_bounds(*_bounds(tile.core), transform=source.transform).round_offsets().round_lengths()
+                targetWindow = from_bounds(*_bounds(tile.core), transform=transform).round_offsets().round_lengths()
+                width = min(sourceWindow.width, targetWindow.width, destination.width - targetWindow.col_off)
+                height = min(sourceWindow.height, targetWindow.height, destination.height - targetWindow.row_off)
+                for offset in range(0, max(height, 0), blockRows):
+                    rows = min(blockRows, height - offset)
+                    data = source.read(window=Window(sourceWindow.col_off, sourceWindow.row_off + offset, width, rows),
+                                       boundless=True, fill_value=source.nodata or 0)
+                    destination.write(data, window=Window(targetWindow.col_off, targetWindow.row_off + offset,
+                                                          width, rows))
+    return output
+
+
+def _bounds(box: tuple) -> tuple:
+    """Bounding box [minX, maxX, minY, maxY] in rasterio's (left, bottom, right, top) order."""
+    return box[0], box[2], box[1], box[3]
@@ -1,4 +1,5 @@
 from .exceptions import KlabIllegalArgumentException
+from .utils import EnumLookup
 from enum import Enum
 
 
@@ -26,10 +27,7 @@ class ShapeType(Enum):
     def fromValue(value:str):
         if not value:
             return None
-        for st in ShapeType:
-            if st.value.lower() == value.lower():
-                return st
-        raise KlabIllegalArgumentException(f"No ShapeType available by the value: {value}")
+        return _SHAPE_TYPES.get(value)
 
 
 class ObservationType(Enum):
@@ -46,11 +44,7 @@ class ObservationType(Enum):
     def fromValue(value: str):
         if not value:
             return None
-        for ot in ObservationType:
-            if ot.value.lower() == value.lower():
-                return ot
-        raise KlabIllegalArgumentException(
-            f"No ObservationType available by the value: {value}")
+        return _OBSERVATION_TYPES.get(value)
 
 
 class KimConceptType(Enum):
@@ -138,19 +132,12 @@ class KimConceptType(Enum):
     def fromValue(value:str):
         if not value:
             return None
-        for kct in KimConceptType:
-            if kct.value.lower() == value.lower():
-                return kct
-        raise KlabIllegalArgumentException(f"No KimConceptType available by the value: {value}")
+        return _KIM_CONCEPT_TYPES.get(value)
 
     @staticmethod
-    def fromListToSet(value:list):
-        kcts = set()
-        for v in value:
-            kct = KimConceptType.fromValue(v)
-            if kct:
-                kcts.add(kct)
-        return kcts
+    def fromListToSet(value: list) -> frozenset:
+        """Decode a list of values into a frozenset, shared by all equal lists."""
+        return _KIM_CONCEPT_TYPES.getSet(value)
 
 
 class ValueType(Enum):
@@ -167,11 +154,7 @@ class ValueType(Enum):
     def fromValue(value: str):
         if not value:
             return None
-        for vt in ValueType:
-            if vt.value.lower() == value.lower():
-                return vt
-        raise KlabIllegalArgumentException(
-            f"No ValueType available by the value: {value}")
+        return _VALUE_TYPES.get(value)
 
 
 class GeometryType(Enum):
@@ -231,7 +214,7 @@ class GeometryType(Enum):
     with distributed values.
     """
 
-    TABLE = "TABLE",
+    TABLE = "TABLE"
     """
     Used in requests to get the values in tabular form instead of another
     representation.
@@ -251,19 +234,12 @@ class GeometryType(Enum):
     def fromValue(value: str):
         if not value:
             return None
-        for gt in GeometryType:
-            if gt.value.lower() == value.lower():
-                return gt
-        raise KlabIllegalArgumentException(f"No GeometryType available by the value: {value}")
+        return _GEOMETRY_TYPES.get(value)
 
     @staticmethod
-    def fromListToSet(value: list):
-        gts = set()
-        for v in value:
-            gt = GeometryType.fromValue(v)
-            if gt:
-                gts.add(gt)
-        return gts
+    def fromListToSet(value: list) -> frozenset:
+        """Decode a list of values into a frozenset, shared by all equal lists."""
+        return _GEOMETRY_TYPES.getSet(value)
 
 
 class TimeResolutionType(Enum):
@@ -281,9 +257,15 @@ class TimeResolutionType(Enum):
 
     @staticmethod
     def fromValue(value: int):
-        if not value:
+        # MILLENNIUM is 0, so only None means no value
+        if value is None:
             return None
-        for trt in TimeResolutionType:
-            if trt.value == value:
-                return trt
-        raise KlabIllegalArgumentException(f"No TimeResolutionType available by the value: {value}")
+        return _TIME_RESOLUTION_TYPES.get(value)
+
+
+_SHAPE_TYPES = EnumLookup(ShapeType)
+_OBSERVATION_TYPES = EnumLookup(ObservationType)
+_KIM_CONCEPT_TYPES = EnumLookup(KimConceptType)
+_VALUE_TYPES = EnumLookup(ValueType)
+_GEOMETRY_TYPES = EnumLookup(GeometryType)
+_TIME_RESOLUTION_TYPES = EnumLookup(TimeResolutionType)
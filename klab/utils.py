@@ -1,5 +1,6 @@
 from enum import Enum
 from .exceptions import KlabIllegalArgumentException
+import array as arrays
 import re
 
 API_BASE = "/api/v2"
@@ -25,6 +26,43 @@ P_OBSERVATION = "{observation}"
 P_TICKET = "{ticket}"
 P_ESTIMATE = "{estimate}"
 
+MAX_INTERNED_SETS = 4096
+"""Maximum number of distinct decoded sets kept by each `EnumLookup`."""
+
+
+class EnumLookup():
+    """
+    Case-insensitive table from the values of an enum to its members, built once so that
+    decoding a value does not scan all members. Lists of values decoded into sets are
+    interned, so references with the same semantics share one frozenset.
+    """
+
+    def __init__(self, enumClass) -> None:
+        self.name = enumClass.__name__
+        self.members = {}
+        for member in enumClass:
+            self.members[member.value] = member
+            if isinstance(member.value, str):
+                self.members.setdefault(member.value.lower(), member)
+        self.sets = {}
+
+    def get(self, value):
+        member = self.members.get(value)
+        if member is None and isinstance(value, str):
+            member = self.members.get(value.lower())
+        if member is None:
+            raise KlabIllegalArgumentException(f"No {self.name} available by the value: {value}")
+        return member
+
+    def getSet(self, values: list) -> frozenset:
+        key = tuple(values)
+        ret = self.sets.get(key)
+        if ret is None:
+            ret = frozenset(self.get(value) for value in key if value)
+            if len(self.sets) < MAX_INTERNED_SETS:
+                self.sets[key] = ret
+        return ret
+
 
 class Export(Enum):
     STRUCTURE = "structure"
@@ -173,6 +211,10 @@ class EndPoint(Enum):
 #     """Called by users to log off from a remote engine."""
 
 
+_INT_TOKEN = re.compile(r"[+-]?[0-9]+")
+"""An array element that reads as an integer."""
+
+
 class NumberUtils():
 
     NaN = float('nan')
@@ -196,15 +238,42 @@ class NumberUtils():
             return False
 
     @staticmethod
-    def objectArrayFromString(array: str,  splitRegex: str, cls: type) -> list:
-
+    def splitArray(array: str, splitRegex: str) -> list:
         if array.startswith("["):
             array = array[1:]
-        
         if array.endswith("]"):
             array = array[:-1]
-        
-        s = re.split(splitRegex, array)
+        if splitRegex == r"\s+":
+            # the common case, without the empty strings that re.split leaves at the ends
+            return array.split()
+        return re.split(splitRegex, array)
+
+    @staticmethod
+    def numbersFromTokens(tokens: list):
+        """
+        The tokens converted all to int or all to float, or None if they are not all of
+        one type. Each attempt converts the whole list at once and stops at the first
+        token that does not fit.
+        """
+        try:
+            return list(map(int, tokens))
+        except ValueError:
+            pass
+        try:
+            floats = list(map(float, tokens))
+        except ValueError:
+            return None
+        # a mix with integer tokens is left to the generic path, which keeps them as int
+        return None if any(map(_INT_TOKEN.fullmatch, tokens)) else floats
+
+    @staticmethod
+    def objectArrayFromString(array: str,  splitRegex: str, cls: type) -> list:
+
+        s = NumberUtils.splitArray(array, splitRegex)
+        numbers = NumberUtils.numbersFromTokens(s)
+        if numbers is not None:
+            return numbers
+
         ret = []
         for i in range(0, len(s)):
                 try:
@@ -231,6 +300,11 @@ class NumberUtils():
 
     @staticmethod
     def podArrayFromString(array: str, splitRegex: str, cls):
+        s = NumberUtils.splitArray(array, splitRegex)
+        numbers = NumberUtils.numbersFromTokens(s)
+        if numbers is not None:
+            return numbers
+
         pods = NumberUtils.objectArrayFromString(array, splitRegex, cls)
         iret = [None]*len(pods)
         fret = [None]*len(pods)
@@ -252,7 +326,10 @@ class NumberUtils():
                 cl = 5
                 bret[i] = pods[i]
                 ni+=1
-            
+
+        if nd and ni == len(pods) - nd:
+            # ints mixed with floats: all floats, as a double array would have them
+            return [float(pod) for pod in pods]
         if cl == 2:
             return iret
         elif cl == 4:
@@ -261,3 +338,21 @@ class NumberUtils():
             return bret
         
         raise KlabIllegalArgumentException("cannot turn array into PODs: type not handled")
+
+    @staticmethod
+    def typedArrayFromString(array: str, splitRegex: str = r"\s+") -> arrays.array:
+        """
+        A compact array of 64-bit ints ('q') or doubles ('d') from a numeric array string
+        like "[1 2 3]", for long arrays such as time transitions. Ints mixed with floats
+        give doubles; anything else is an error. Wrap with `numpy.frombuffer` to get a
+        NumPy array without copying.
+        """
+        s = NumberUtils.splitArray(array, splitRegex)
+        try:
+            return arrays.array("q", list(map(int, s)))
+        except (ValueError, OverflowError):
+            pass
+        try:
+            return arrays.array("d", list(map(float, s)))
+        except ValueError:
+            raise KlabIllegalArgumentException(f"not a numeric array: {array[:40]}")
@@ -0,0 +1,187 @@
+from klab.klab import Klab
+from klab.observation import ObservationReference
+from klab.ticket import Ticket
+import heapq
+import itertools
+import requests
+import threading
+import time
+
+# In-process stand-in for a k.LAB engine, answering the calls the client makes through
+# Engine with canned tickets and observation references.
+
+
+class StubEngine():
+
+    def __init__(self, url: str = "http://stub/modeler", delay: float = 0.0, latency: float = 0.0,
+                 cost: float = 1.0, feasible: bool = True, online: bool = True, workers: int = None):
+        self.url = url
+        self.session_id = "stub-session"
+        self.delay = delay
+        self.latency = latency
+        self.cost = cost
+        self.feasible = feasible
+        self.online = online
+        # with a number of workers, tickets queue for a free worker instead of all running at once
+        self.workers = [0.0] * workers if workers else None
+        self.failSubmit = False
+        # an HTTP status to answer submissions with, e.g. 400 for a rejected request
+        self.rejectSubmit = None
+        self.failExport = False
+        self.requests = []
+        self.exports = []
+        self.tickets = {}
+        self.references = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def nextId(self, prefix: str) -> str:
+        with self.lock:
+            return f"{prefix}{next(self.ids)}"
+
+    def wait(self):
+        if not self.online:
+            raise ConnectionError(f"{self.url} is offline")
+        if self.latency:
+            time.sleep(self.latency)
+
+    def isOnline(self):
+        return self.online
+
+    def close(self):
+        pass
+
+    def get(self, endpoint: str, parameters: list = None):
+        self.wait()
+        return {"localSessionId": self.session_id}
+
+    def duration(self, request) -> float:
+        return self.delay(request) if callable(self.delay) else self.delay
+
+    def costOf(self, request) -> float:
+        return self.cost(request) if callable(self.cost) else self.cost
+
+    def makeTicket(self, ticketType: str, data: dict, duration: float) -> Ticket:
+        start = time.time()
+        if self.workers is not None:
+            with self.lock:
+                start = max(start, heapq.heappop(self.workers))
+                heapq.heappush(self.workers, start + duration)
+        ticket = {
+            "id": self.nextId("t"),
+            "postDate": time.time(),
+            "resolutionDate": start + duration,
+            "status": "OPEN",
+            "type": ticketType,
+            "data": data,
+            "statusMessage": None,
+            "seen": False
+        }
+        self.tickets[ticket["id"]] = ticket
+        return Ticket.fromDict(ticket)
+
+    def addReference(self, **fields) -> dict:
+        ref = {
+            "id": fields.pop("id"),
+            "semantics": [],
+            "geometryTypes": [],
+            "childIds": {},
+            "actions": [],
+            "exportFormats": []
+        }
+        ref.update(fields)
+        self.references[ref["id"]] = ref
+        return ref
+
+    def submitContext(self, request):
+        self.wait()
+        if self.failSubmit:
+            raise ConnectionError(f"{self.url} refused the request")
+        if self.rejectSubmit:
+            response = requests.Response()
+            response.status_code = self.rejectSubmit
+            raise requests.HTTPError(f"{self.rejectSubmit} from {self.url}", response=response)
+        self.requests.append(request)
+        if request.estimate:
+            data = {"estimate": self.nextId("e"), "cost": str(self.costOf(request)), "currency": "KLB",
+                    "feasible": "true" if self.feasible else "false", "request": request}
+            return self.makeTicket("ContextEstimate", data, 0.0)
+
+        return self.makeTicket("ContextObservation", {"request": request}, self.duration(request))
+
+    def submitEstimate(self, estimateId: str):
+        self.wait()
+        if self.failSubmit:
+            raise ConnectionError(f"{self.url} refused the request")
+        for ticket in self.tickets.values():
+            if ticket["data"].get("estimate") == estimateId:
+                request = ticket["data"]["request"]
+                return self.makeTicket("ContextObservation", {"request": request}, self.duration(request))
+        return None
+
+    def submitObservation(self, request):
+        self.wait()
+        if request.contextId not in self.references:
+            return None
+        self.requests.append(request)
+        return self.makeTicket("ObservationInContext", {"request": request}, self.duration(request))
+
+    def resolve(self, ticket: dict):
+        request = ticket["data"].get("request")
+        if ticket["type"] != "ContextEstimate":
+            del ticket["data"]["request"]
+        if ticket["type"] == "ContextObservation":
+            context = self.addReference(id=self.nextId("c"), observationType="SUBJECT",
+                                        observable=request.contextType)
+            context["geometry"] = request.geometry
+            artifacts = []
+            for observable in request.observables:
+                artifacts.append(self.observe(context, str(observable), request.scenarios))
+            ticket["data"]["context"] = context["id"]
+            if artifacts:
+                ticket["data"]["artifacts"] = ",".join(artifacts)
+        elif ticket["type"] == "ObservationInContext":
+            context = self.references[request.contextId]
+            ticket["data"]["artifacts"] = self.observe(context, request.urn, request.scenarios)
+        ticket["status"] = "RESOLVED"
+
+    def observe(self, context: dict, observable: str, scenarios: list) -> str:
+        name = observable.split(" named ")[-1] if " named " in observable else observable.split(":")[-1].lower()
+        value = float(sum(map(ord, observable + "".join(scenarios))) % 1000)
+        ref = self.addReference(id=self.nextId("o"), observable=observable, label=name,
+                                observationType="STATE", valueType="NUMBER", semantics=["QUALITY"],
+                                geometryTypes=["RASTER"], contextId=context["id"],
+                                rootContextId=context["id"], parentId=context["id"],
+                                dataSummary={"nodataProportion": 0.0, "minValue": value,
+                                             "maxValue": value + 100, "mean": value + 50})
+        context["childIds"] = dict(context["childIds"], **{name: ref["id"]})
+        return ref["id"]
+
+    def getTicket(self, ticketId: str):
+        self.wait()
+        ticket = self.tickets.get(ticketId)
+        if not ticket:
+            return None
+        if ticket["status"] == "OPEN" and time.time() >= ticket["resolutionDate"]:
+            self.resolve(ticket)
+        return Ticket.fromDict(ticket)
+
+    def getObservation(self, artifactId: str):
+        self.wait()
+        return ObservationReference.fromDict(self.references.get(artifactId))
+
+    def streamExport(self, observationId: str, target, format, output, parameters: list = []) -> bool:
+        self.wait()
+        self.exports.append((observationId, target, format))
+        if self.failExport:
+            return False
+        output.write(f"{target.name}:{format.name}:{observationId}".encode("utf-8"))
+        return True
+
+
+def stubKlab(engine: StubEngine) -> Klab:
+    """A Klab client bound to the stub engine, skipping authentication."""
+    klab = Klab.__new__(Klab)
+    klab.engine = engine
+    klab.store = None
+    return klab
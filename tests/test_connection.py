@@ -2,7 +2,7 @@ import unittest
 from unittest import TestCase, IsolatedAsyncioTestCase
 
 from klab.klab import Klab
-from klab.geometry import KlabGeometry, GeometryBuilder
+from klab.geometry import KlabGeometry, GeometryBuilder, GeometryTemplate
 from klab.observable import Observable, Range
 from klab.observation import Observation
 from klab.exceptions import *
@@ -57,6 +57,20 @@ class BaseTestClass():
         context = await ticketHandler.get()
         self.assertIsNotNone(context)
 
+    def test_filled_geometry_template(self):
+        asyncio.run(self._test_filled_geometry_template())
+
+    async def _test_filled_geometry_template(self):
+        filled = GeometryTemplate(self.geometryEncoding).fill(BOUNDING_BOX=self.boundingBox, TIME_PERIOD=self.timePeriod,
+                                                              GRID_RESOLUTION_XY=self.gridResolutionXY,
+                                                              WKB_SHAPE=self.wkbShape)
+        self.assertEqual(filled.geometry.encode(), KlabGeometry.create(filled.encode()).encode())
+        obs = Observable.create("earth:Region")
+
+        ticketHandler = self.klab.submit(obs, filled.geometry)
+        context = await ticketHandler.get()
+        self.assertIsNotNone(context)
+
     def test_context_observation(self):
         asyncio.run(self._test_context_observation())
 
@@ -0,0 +1,670 @@
+import unittest
+from unittest import IsolatedAsyncioTestCase
+
+from klab.batch import BatchJournal, BatchRunner, readManifest
+from klab.catalog import ObservationCatalog
+from klab.cluster import KlabCluster
+from klab.parametergrid import GridExecutor, JsonlSink, ParameterGrid
+from klab.scheduler import BudgetScheduler, JobStatus, ScheduledJob, SpendWindow
+from klab.spatialindex import ContextIndex, Extent, PythonRTree
+from klab.store import ObservationStore
+from klab.sweep import TemporalSweep
+from klab.sync import SyncKlab
+from klab.tiling import SpatialTiling, TilingExecutor, mosaic
+from klab.geometry import BulkGeometryBuilder, GeometryBuilder
+from klab.observable import Observable
+from klab.observation import Context, Observation
+from klab.exceptions import *
+from klab.references import ObservationReference
+from klab.types import GeometryType, KimConceptType, ObservationType, ValueType
+from klab.utils import Export, ExportFormat
+import klab.catalog
+from concurrent.futures import CancelledError, as_completed
+import asyncio
+import csv
+import importlib.util
+import json
+import os
+import pytest
+import requests
+import tempfile
+import threading
+import time
+from stub_engine import StubEngine, stubKlab
+
+# run with python3 -m unittest discover tests/
+
+
+class BaseExecutionTestClass():
+
+    ruaha = "EPSG:4326 POLYGON((33.796 -7.086, 35.946 -7.086, 35.946 -9.41, 33.796 -9.41, 33.796 -7.086))"
+
+    def grid(self, year: int = 2010):
+        return GeometryBuilder().grid(urn=self.ruaha, resolution="1 km").years(year).build()
+
+
+class TestCluster(BaseExecutionTestClass, IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.engines = [StubEngine(url=f"http://stub{i}/modeler") for i in range(3)]
+        self.cluster = KlabCluster([stubKlab(e) for e in self.engines])
+
+    async def test_least_loaded_routing(self):
+        region = Observable.create("earth:Region")
+        handlers = [self.cluster.submit(region, self.grid()) for _ in range(3)]
+        self.assertEqual([len(e.requests) for e in self.engines], [1, 1, 1])
+        self.assertTrue(all(node.inFlight == 1 for node in self.cluster.nodes))
+
+        for handler in handlers:
+            self.assertIsInstance(await handler.get(), Context)
+        self.assertTrue(all(node.inFlight == 0 for node in self.cluster.nodes))
+
+    async def test_context_pinning(self):
+        handler = self.cluster.submit(Observable.create("earth:Region"), self.grid())
+        context = await handler.get()
+        node = self.cluster.nodeFor(context)
+
+        for _ in range(3):
+            self.cluster.submit(Observable.create("earth:Region"), self.grid())
+
+        observation = await self.cluster.observe(context, Observable.create("geography:Elevation")).get()
+        self.assertIsInstance(observation, Observation)
+        self.assertIs(observation.engine, node.engine)
+        self.assertIsNotNone(context.getObservation("elevation"))
+
+    async def test_failover(self):
+        self.engines[0].failSubmit = True
+        self.engines[1].online = False
+        self.cluster.checkHealth()
+        self.assertFalse(self.cluster.nodes[1].healthy)
+        for node, latency in zip(self.cluster.nodes, [0.01, 0.01, 0.1]):
+            node.latency = latency
+
+        context = await self.cluster.submit(Observable.create("earth:Region"), self.grid()).get()
+        self.assertIs(context.engine, self.engines[2])
+        self.assertFalse(self.cluster.nodes[0].healthy)
+
+        self.engines[2].online = False
+        with self.assertRaises(KlabRemoteException):
+            self.cluster.submit(Observable.create("earth:Region"), self.grid())
+
+    async def test_failed_polling_releases_nodes(self):
+        handler = self.cluster.submit(Observable.create("earth:Region"), self.grid())
+        node = next(node for node in self.cluster.nodes if node.inFlight)
+        node.engine.online = False
+        with self.assertRaises(ConnectionError):
+            await handler.get()
+        self.assertEqual(node.inFlight, 0)
+
+    def test_rejected_requests_keep_engines_healthy(self):
+        for engine in self.engines:
+            engine.rejectSubmit = 400
+        with self.assertRaises(requests.HTTPError):
+            self.cluster.submit(Observable.create("earth:Region"), self.grid())
+        self.assertTrue(all(node.healthy for node in self.cluster.nodes))
+
+        for engine in self.engines:
+            engine.rejectSubmit = 503 if engine is self.engines[0] else None
+        for node in self.cluster.nodes:
+            node.latency = 0.1 if node.engine is self.engines[0] else 1.0
+        handler = self.cluster.submit(Observable.create("earth:Region"), self.grid())
+        self.assertFalse(self.cluster.nodes[0].healthy)
+        self.assertTrue(all(node.healthy for node in self.cluster.nodes[1:]))
+        self.assertIsNotNone(handler)
+
+    async def test_estimates_stay_on_engine(self):
+        estimate = await self.cluster.estimate(Observable.create("earth:Region"), self.grid()).get()
+        estimating = [e for e in self.engines if e.requests]
+        self.assertEqual(len(estimating), 1)
+
+        context = await self.cluster.submitEstimate(estimate).get()
+        self.assertIs(context.engine, estimating[0])
+
+
+class TestSyncKlab(BaseExecutionTestClass, unittest.TestCase):
+
+    def setUp(self):
+        self.engine = StubEngine(latency=0.02)
+        self.klab = SyncKlab(stubKlab(self.engine), maxWorkers=16)
+
+    def tearDown(self):
+        self.klab.close()
+        self.assertFalse(self.klab.thread.is_alive())
+
+    def test_overlapping_submissions(self):
+        region = Observable.create("earth:Region")
+        futures = [self.klab.submit(region, self.grid(year)) for year in range(2000, 2020)]
+        contexts = [future.result(timeout=10) for future in as_completed(futures)]
+        self.assertEqual(len(contexts), 20)
+        self.assertTrue(all(isinstance(context, Context) for context in contexts))
+
+        observations = [self.klab.observe(context, Observable.create("geography:Elevation")) for context in contexts]
+        exports = [self.klab.exportToString(future.result(timeout=10), Export.DATA, ExportFormat.GEOJSON_FEATURES)
+                   for future in observations]
+        self.assertTrue(all(future.result(timeout=10).startswith("DATA:") for future in exports))
+
+    def test_encoded_geometries(self):
+        specs = BulkGeometryBuilder(resolution="1 km").years(2010).boxes([33.5, 34.5], [34.0, 35.0], [-8.0, -8.0], [-7.5, -7.5])
+        contexts = [self.klab.submit(Observable.create("earth:Region"), spec).result(timeout=10) for spec in specs]
+        self.assertEqual([request.geometry for request in self.engine.requests], specs)
+        self.assertTrue(all(isinstance(context, Context) for context in contexts))
+
+    def test_close_cancels_pending(self):
+        self.engine.delay = 60
+        future = self.klab.submit(Observable.create("earth:Region"), self.grid())
+        self.klab.close()
+        with self.assertRaises(CancelledError):
+            future.result(timeout=5)
+
+    def test_estimates(self):
+        estimate = self.klab.estimate(Observable.create("earth:Region"), self.grid()).result(timeout=10)
+        self.assertTrue(estimate.isFeasible)
+        context = self.klab.submitEstimate(estimate).result(timeout=10)
+        self.assertIsInstance(context, Context)
+
+
+class TestBatchRunner(BaseExecutionTestClass, unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory(prefix="klab_batch")
+        self.manifest = os.path.join(self.folder.name, "jobs.csv")
+        with open(self.manifest, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["wkt", "resolution", "year", "observable", "format", "output"])
+            for year in (2010, 2011):
+                for observable in ("geography:Elevation", "geography:Slope", "ecology:Vegetation"):
+                    output = os.path.join(self.folder.name, "out", f"{observable.split(':')[1]}_{year}.tif")
+                    writer.writerow([self.ruaha, "1 km", year, observable, "BYTESTREAM", output])
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def run_batch(self, engine: StubEngine):
+        journal = BatchJournal(self.manifest + ".journal")
+        try:
+            runner = BatchRunner(stubKlab(engine), concurrency=4, journal=journal)
+            return asyncio.run(runner.run(readManifest(self.manifest)))
+        finally:
+            journal.close()
+
+    def test_contexts_released(self):
+        runner = BatchRunner(stubKlab(StubEngine()), concurrency=2)
+        held = []
+        runner.progress = lambda result, stats: held.append(set(runner.contexts))
+        stats = asyncio.run(runner.run(readManifest(self.manifest)))
+        self.assertEqual((stats.done, stats.contexts), (6, 2))
+        # the context of a year goes once its three jobs are done
+        self.assertEqual(held[-1], set())
+        self.assertTrue(any(len(contexts) == 1 for contexts in held))
+        self.assertEqual(runner.contexts, {})
+
+    def test_run_and_resume(self):
+        engine = StubEngine()
+        stats = self.run_batch(engine)
+        self.assertEqual((stats.done, stats.failed, stats.skipped, stats.contexts), (6, 0, 0, 2))
+        self.assertEqual(sum(1 for r in engine.requests if hasattr(r, "contextType")), 2)
+        outputs = sorted(os.listdir(os.path.join(self.folder.name, "out")))
+        self.assertEqual(len(outputs), 6)
+        self.assertTrue(all(name.endswith(".tif") for name in outputs))
+
+        engine = StubEngine()
+        stats = self.run_batch(engine)
+        self.assertEqual((stats.done, stats.skipped), (0, 6))
+        self.assertEqual(engine.requests, [])
+
+    def test_failed_jobs_are_retried(self):
+        engine = StubEngine()
+        engine.failSubmit = True
+        stats = self.run_batch(engine)
+        self.assertEqual((stats.done, stats.failed), (0, 6))
+        self.assertFalse(os.path.exists(os.path.join(self.folder.name, "out", "Elevation_2010.tif")))
+
+        stats = self.run_batch(StubEngine())
+        self.assertEqual((stats.done, stats.skipped), (6, 0))
+
+
+    def test_failed_exports_are_retried(self):
+        engine = StubEngine()
+        engine.failExport = True
+        stats = self.run_batch(engine)
+        self.assertEqual((stats.done, stats.failed), (0, 6))
+        self.assertEqual(os.listdir(os.path.join(self.folder.name, "out")), [])
+
+        stats = self.run_batch(StubEngine())
+        self.assertEqual((stats.done, stats.skipped), (6, 0))
+
+class TestTiling(BaseExecutionTestClass, IsolatedAsyncioTestCase):
+
+    def test_split_bounding_box(self):
+        tiling = SpatialTiling("0.1 deg", maxCells=100)
+        tiles = tiling.split((0.0, 2.5, 10.0, 11.0))
+        self.assertEqual(len(tiles), 3 * 1)
+        self.assertAlmostEqual(sum((t.core[1] - t.core[0]) * (t.core[3] - t.core[2]) for t in tiles), 2.5)
+
+        overlapping = SpatialTiling("0.1 deg", maxCells=144, overlap=1).split((0.0, 2.5, 10.0, 11.0))
+        self.assertEqual([t.core for t in overlapping], [t.core for t in tiles])
+        self.assertAlmostEqual(overlapping[1].bounds[0], overlapping[1].core[0] - 0.1)
+        self.assertAlmostEqual(overlapping[0].bounds[0], 0.0)
+
+    def test_split_wkt_skips_outside_tiles(self):
+        triangle = "EPSG:4326 POLYGON((0 0, 4 0, 0 4, 0 0))"
+        tiles = SpatialTiling("1 deg", maxCells=1).split(triangle)
+        self.assertEqual(len(tiles), 10)
+        self.assertNotIn((3, 0), [(t.column, t.row) for t in tiles])
+
+    def test_mosaic(self):
+        rasterio = pytest.importorskip("rasterio")
+        from rasterio.transform import from_origin
+        import numpy
+
+        # 10 x 6 cells in tiles of 4 x 4 cells plus one cell of overlap, so the tiles on the
+        # east and south edges are smaller than the others
+        tiles = SpatialTiling("0.1 deg", maxCells=36, overlap=1).split((0.0, 1.0, 10.0, 10.6))
+        self.assertEqual(len(tiles), 6)
+        rows, columns = numpy.mgrid[0:6, 0:10]
+        expected = (rows * 100 + columns).astype("float32")
+        with tempfile.TemporaryDirectory(prefix="klab_mosaic") as folder:
+            for tile in tiles:
+                x1, x2, y1, y2 = tile.bounds
+                column, row = round(x1 / 0.1), round((10.6 - y2) / 0.1)
+                width, height = round((x2 - x1) / 0.1), round((y2 - y1) / 0.1)
+                data = expected[row:row + height, column:column + width].copy()
+                # overlap cells hold a wrong value, so that copying more than the core shows
+                cx1, cx2, cy1, cy2 = tile.core
+                data[:round((y2 - cy2) / 0.1), :] = -1
+                data[round((y2 - cy1) / 0.1):, :] = -1
+                data[:, :round((cx1 - x1) / 0.1)] = -1
+                data[:, round((cx2 - x1) / 0.1):] = -1
+                tile.path = os.path.join(folder, f"tile_{tile.row}_{tile.column}.tif")
+                with rasterio.open(tile.path, "w", driver="GTiff", width=width, height=height, count=1,
+                                   dtype="float32", crs="EPSG:4326", transform=from_origin(x1, y2, 0.1, 0.1)) as file:
+                    file.write(data, 1)
+
+            output = mosaic(tiles, os.path.join(folder, "mosaic.tif"), blockRows=3)
+            with rasterio.open(output) as result:
+                self.assertEqual((result.width, result.height), (10, 6))
+                for actual, bound in zip(result.bounds, (0.0, 10.0, 1.0, 10.6)):
+                    self.assertAlmostEqual(actual, bound)
+                numpy.testing.assert_array_equal(result.read(1), expected)
+
+    async def test_tiles_observed_concurrently(self):
+        engine = StubEngine()
+        executor = TilingExecutor(stubKlab(engine), Observable.create("geography:Elevation"),
+                                  SpatialTiling("1 km", maxCells=10000), maxConcurrency=4)
+        with tempfile.TemporaryDirectory(prefix="klab_tiles") as folder:
+            tiles = await executor.run(self.ruaha, folder, years=(2010,))
+            self.assertTrue(len(tiles) > 4)
+            self.assertTrue(all(os.path.exists(tile.path) for tile in tiles))
+        contexts = [r for r in engine.requests if hasattr(r, "contextType")]
+        self.assertEqual(len(contexts), len(tiles))
+        self.assertTrue(all("bbox=" in r.geometry for r in contexts))
+
+
+class TestSweeps(BaseExecutionTestClass, IsolatedAsyncioTestCase):
+
+    async def test_temporal_sweep(self):
+        engine = StubEngine(latency=0.01)
+        sweep = TemporalSweep(stubKlab(engine), Observable.create("geography:Elevation"), "1 km", urn=self.ruaha,
+                              maxConcurrency=5)
+        with tempfile.TemporaryDirectory(prefix="klab_sweep") as folder:
+            pattern = os.path.join(folder, "elevation_{period}.tif")
+            labels = []
+            async for result in sweep.stream(list(range(2000, 2020)) + [(2020, 2023)], ExportFormat.BYTESTREAM,
+                                             pattern):
+                self.assertIsNone(result.error)
+                self.assertTrue(os.path.exists(result.path))
+                labels.append(result.label)
+
+        self.assertEqual(len(labels), 21)
+        self.assertIn("2020-2023", labels)
+        geometries = [r.geometry for r in engine.requests if hasattr(r, "contextType")]
+        self.assertEqual(len(set(geometries)), 21)
+
+    async def test_scenario_sweep(self):
+        engine = StubEngine(latency=0.01)
+        klab = stubKlab(engine)
+        context = await klab.submit(Observable.create("earth:Region"), self.grid()).get()
+        scenarios = [[], "im.scenarios:Drought", ["im.scenarios:Drought", "im.scenarios:Fire"]]
+        context.injectedStates.append((Observable.create("geography:Elevation"), 100))
+
+        comparison = await context.sweepScenarios(Observable.create("landcover:LandCoverType"), scenarios,
+                                                  maxConcurrency=3)
+        self.assertEqual([row[0] for row in comparison.rows],
+                         ["baseline", "im.scenarios:Drought", "im.scenarios:Drought+im.scenarios:Fire"])
+        self.assertTrue(all(row[4] is not None for row in comparison.rows))
+        self.assertEqual(len(str(comparison).splitlines()), 4)
+        submitted = [r.scenarios for r in engine.requests if hasattr(r, "contextId")]
+        self.assertIn(["im.scenarios:Drought", "im.scenarios:Fire"], submitted)
+        # states injected before the sweep go with every scenario set, not only the first submitted
+        self.assertEqual([r.states for r in engine.requests if hasattr(r, "contextId")],
+                         [{"geography:Elevation": "100"}] * 3)
+        self.assertEqual(context.injectedStates, [])
+        self.assertEqual(engine.exports, [])
+
+        with tempfile.TemporaryDirectory(prefix="klab_scenarios") as folder:
+            exported = await comparison.export(["im.scenarios:Drought"], ExportFormat.BYTESTREAM,
+                                               os.path.join(folder, "landcover_{scenario}.tif"))
+            self.assertEqual(len(exported), 1)
+            self.assertTrue(os.path.exists(exported[0].path))
+        self.assertEqual(len(engine.exports), 1)
+
+
+class TestParameterGrid(BaseExecutionTestClass, IsolatedAsyncioTestCase):
+
+    def test_expansion(self):
+        grid = ParameterGrid({"ruaha": self.ruaha}, ["1 km", "1 km", "500 m"], [2010, 2011],
+                             ["geography:Elevation"], [[], "im.scenarios:Drought"])
+        points = list(grid)
+        self.assertEqual(len(points), len(grid))
+        self.assertEqual(len(grid), 8)
+        self.assertEqual(grid.contextCount(), 4)
+        self.assertEqual(len({point.contextKey for point in points}), 4)
+        with self.assertRaises(KlabIllegalArgumentException):
+            ParameterGrid([self.ruaha], ["1 km"], [], ["geography:Elevation"])
+
+    async def test_grid_run(self):
+        engines = [StubEngine(url=f"http://stub{i}/modeler", latency=0.005) for i in range(2)]
+        cluster = KlabCluster([stubKlab(e) for e in engines])
+        grid = ParameterGrid([self.ruaha, self.ruaha.replace("33.796", "34.0")], ["1 km"], [2010, 2011, 2012],
+                             ["geography:Elevation", "landcover:LandCoverType"], [[], ["im.scenarios:Drought"]])
+
+        with tempfile.TemporaryDirectory(prefix="klab_grid") as folder:
+            sink = JsonlSink(os.path.join(folder, "results.jsonl"))
+            executor = GridExecutor(cluster, maxConcurrency=8, maxPerEngine=2)
+            failed = await executor.run(grid, sink, ExportFormat.BYTESTREAM,
+                                        os.path.join(folder, "{region}_{year}_{observable}_{scenario}.tif"))
+            sink.close()
+            with open(os.path.join(folder, "results.jsonl")) as file:
+                results = [json.loads(line) for line in file]
+            self.assertTrue(all(os.path.exists(result["path"]) for result in results))
+
+        self.assertEqual(failed, [])
+        self.assertEqual(len(results), 24)
+        contexts = [r for e in engines for r in e.requests if hasattr(r, "contextType")]
+        self.assertEqual(len(contexts), 6)
+        self.assertEqual(sum(len(e.exports) for e in engines), 24)
+
+
+    async def test_aborted_run_cancels_contexts(self):
+        slowYear = str(int(GeometryBuilder().startOfYear(2012)))
+        engine = StubEngine(delay=lambda request: 60 if slowYear in getattr(request, "geometry", "") else 0)
+        grid = ParameterGrid([self.ruaha], ["1 km"], [2010, 2012], ["geography:Elevation"])
+        executor = GridExecutor(stubKlab(engine))
+
+        def sink(result):
+            raise OSError("cannot write the result")
+
+        with self.assertRaises(OSError):
+            await executor.run(grid, sink)
+        await asyncio.sleep(0)
+        self.assertEqual(len(executor.contexts), 2)
+        self.assertTrue(all(task.done() for task in executor.contexts.values()))
+        self.assertTrue(any(task.cancelled() for task in executor.contexts.values()))
+
+
+class TestBudgetScheduler(BaseExecutionTestClass, IsolatedAsyncioTestCase):
+
+    async def test_admission(self):
+        costs = {self.grid(year).encode(): year - 2000.0 for year in range(2001, 2007)}
+        engine = StubEngine(latency=0.005, cost=lambda request: costs[request.geometry])
+        region = Observable.create("earth:Region")
+        jobs = [ScheduledJob(region, self.grid(year), id=str(year)) for year in range(2001, 2007)]
+        jobs[-1].priority = 1
+
+        scheduler = BudgetScheduler(stubKlab(engine), budget=10)
+        await scheduler.run(jobs)
+
+        status = {job.id: job.status for job in jobs}
+        self.assertEqual([job.id for job in jobs if job.status == JobStatus.DONE], ["2001", "2002", "2006"])
+        self.assertEqual(status["2003"], JobStatus.OVER_BUDGET)
+        self.assertEqual(scheduler.committed, 9)
+        self.assertTrue(all(isinstance(job.context, Context) for job in jobs if job.status == JobStatus.DONE))
+        # contexts are only created from the estimates, without sending the request again
+        self.assertTrue(all(request.estimate for request in engine.requests))
+
+    async def test_failed_submissions_refunded(self):
+        engine = StubEngine(latency=0.005, cost=lambda request: 4.0)
+        jobs = [ScheduledJob(Observable.create("earth:Region"), self.grid(year)) for year in (2001, 2002)]
+        scheduler = BudgetScheduler(stubKlab(engine), budget=10)
+        await scheduler.estimateAll(jobs)
+        self.assertEqual(len(scheduler.admit(jobs)), 2)
+        self.assertEqual(scheduler.remaining, 2)
+
+        engine.failSubmit = True
+        await scheduler.submit(jobs[0])
+        self.assertEqual((jobs[0].status, scheduler.committed), (JobStatus.FAILED, 4))
+        engine.failSubmit = False
+        await scheduler.submit(jobs[1])
+        self.assertEqual((jobs[1].status, scheduler.committed), (JobStatus.DONE, 4))
+
+    async def test_infeasible_jobs_skipped(self):
+        engine = StubEngine(latency=0.005, feasible=False)
+        jobs = [ScheduledJob(Observable.create("earth:Region"), self.grid())]
+        await BudgetScheduler(stubKlab(engine), budget=100).run(jobs)
+        self.assertEqual(jobs[0].status, JobStatus.INFEASIBLE)
+
+    async def test_spend_window(self):
+        window = SpendWindow(budget=3, seconds=0.2)
+        start = time.monotonic()
+        await window.reserve(2)
+        await window.reserve(1)
+        self.assertLess(time.monotonic() - start, 0.1)
+        await window.reserve(2)
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+        with self.assertRaises(KlabIllegalArgumentException):
+            await window.reserve(4)
+
+
+class TestCatalog(BaseExecutionTestClass, IsolatedAsyncioTestCase):
+
+    def reference(self, i: int, **fields) -> ObservationReference:
+        data = {"id": f"o{i}", "label": f"obs{i}", "observable": "geography:Elevation", "observationType": "STATE",
+                "valueType": "NUMBER", "semantics": ["QUALITY"], "geometryTypes": ["RASTER"],
+                "dataSummary": {"nodataProportion": i / 10, "minValue": 0.0, "maxValue": 10.0, "mean": float(i)}}
+        data.update(fields)
+        return ObservationReference.fromDict(data)
+
+    def test_queries(self):
+        catalog = ObservationCatalog()
+        for i in range(10):
+            catalog.add(self.reference(i))
+        catalog.add(self.reference(10, valueType="CATEGORY", semantics=["QUALITY", "AUTHORITY_IDENTITY"]))
+        catalog.add(self.reference(11, observationType="SUBJECT", valueType="VOID", dataSummary=None,
+                                   semantics=["SUBJECT"], geometryTypes=["SHAPE"]))
+
+        numeric = catalog.query().where(observationType=ObservationType.STATE, valueType=ValueType.NUMBER)
+        self.assertEqual(numeric.filter("nodataProportion", "<", 0.3).ids(), ["o0", "o1", "o2"])
+        self.assertEqual(catalog.query().orderBy("mean", descending=True).limit(2).ids(), ["o10", "o9"])
+        self.assertEqual(catalog.query().orderBy("mean").ids()[-1], "o11")
+        self.assertEqual(catalog.query().hasSemantics(KimConceptType.AUTHORITY_IDENTITY).ids(), ["o10"])
+        self.assertEqual(catalog.query().hasGeometry(GeometryType.SHAPE).rows()[0]["semantics"],
+                         {KimConceptType.SUBJECT})
+
+        catalog.add(self.reference(0, dataSummary={"nodataProportion": 0.9}))
+        self.assertEqual(len(catalog), 12)
+        self.assertEqual(numeric.filter("nodataProportion", "<", 0.3).count(), 2)
+        with self.assertRaises(KlabIllegalArgumentException):
+            catalog.query().filter("median", "<", 1)
+
+        # whole columns with numpy and row by row without it give the same rows
+        queries = [lambda: numeric.filter("nodataProportion", "<", 0.3).orderBy("mean", descending=True),
+                   lambda: catalog.query().hasSemantics(KimConceptType.QUALITY).where(name="obs4"),
+                   lambda: catalog.query().hasGeometry(GeometryType.RASTER).orderBy("maxValue").limit(5)]
+        withColumns = [query().matches() for query in queries]
+        np, klab.catalog.numpy = klab.catalog.numpy, None
+        try:
+            self.assertEqual([query().matches() for query in queries], withColumns)
+        finally:
+            klab.catalog.numpy = np
+
+    async def test_context_catalog(self):
+        engine = StubEngine()
+        klab = stubKlab(engine)
+        context = await klab.submit(Observable.create("earth:Region"), self.grid()).get()
+        await context.submit(Observable.create("geography:Elevation")).get()
+
+        catalog = context.getCatalog()
+        self.assertEqual(catalog.query().where(name="elevation").count(), 1)
+        await context.submit(Observable.create("geography:Slope")).get()
+        self.assertEqual(len(catalog), 2)
+
+        slope = list(catalog.query().where(name="slope"))
+        self.assertIsInstance(slope[0], Observation)
+        self.assertEqual(slope[0].reference.observable, "geography:Slope")
+
+        # observations made elsewhere are fetched for their catalog values only, and loaded
+        # (without being kept) when a query is iterated
+        for i in range(40):
+            engine.observe(engine.references[context.reference.id], f"geography:Layer{i}", [])
+        catalog = context.getCatalog(refresh=True)
+        self.assertEqual(len(catalog), 42)
+        self.assertEqual(len(context.catalog), 2)
+        query = catalog.query().where(observationType=ObservationType.STATE).orderBy("mean", descending=True)
+        layers = list(query)
+        self.assertEqual([layer.reference.id for layer in layers], query.ids())
+        self.assertEqual(len(layers), 42)
+        self.assertEqual(len(context.catalog), 2)
+
+
+class TestObservationStore(BaseExecutionTestClass, IsolatedAsyncioTestCase):
+
+    async def test_recorded_tickets(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "observations.db")
+            klab = stubKlab(StubEngine())
+            klab.useStore(ObservationStore(path))
+            geometry = self.grid(2010)
+            context = await klab.submit(Observable.create("earth:Region"), geometry,
+                                        Observable.create("geography:Elevation")).get()
+            slope = await context.submit(Observable.create("geography:Slope")).get()
+            klab.store.close()
+
+            # another process only needs the file
+            with ObservationStore(path) as store:
+                self.assertEqual(len(store), 3)
+                self.assertEqual(store.get(context.reference.id).observable, "earth:Region")
+                self.assertEqual(len(store.find(contextId=context.reference.id)), 2)
+                found = store.find(observable="geography:Slope", geometry=geometry)
+                self.assertEqual([reference.id for reference in found], [slope.reference.id])
+                self.assertEqual(found[0].dataSummary.mean, slope.reference.dataSummary.mean)
+                self.assertEqual(found[0].observationType, ObservationType.STATE)
+
+                start = int(GeometryBuilder().startOfYear(2010))
+                self.assertEqual(len(store.ids(start=start, end=start + 1000)), 3)
+                start = int(GeometryBuilder().startOfYear(2011))
+                self.assertEqual(store.ids(start=start, end=start + 1000), [])
+                self.assertEqual(store.find(geometry=self.grid(2011)), [])
+
+    async def test_writes_off_the_event_loop(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = ObservationStore(os.path.join(directory, "observations.db"))
+            threads, record = [], store.record
+            store.record = lambda *args: threads.append(threading.current_thread()) or record(*args)
+            klab = stubKlab(StubEngine())
+            klab.useStore(store)
+            context = await klab.submit(Observable.create("earth:Region"), self.grid()).get()
+            # written by the time get() returns, but not by the thread running the loop
+            self.assertEqual(len(store), 1)
+            self.assertNotIn(threading.current_thread(), threads)
+
+            context.store = None
+            await store.track(context.submit(Observable.create("geography:Slope"))).get()
+            store.close()
+            self.assertEqual(len(threads), 2)
+            with ObservationStore(store.path) as reopened:
+                self.assertEqual(len(reopened), 2)
+
+    def test_creation_order(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                ObservationStore(os.path.join(directory, "observations.db")) as store:
+            store.putAll([ObservationReference.fromDict({"id": f"o{i}", "creationTime": 100 - i})
+                          for i in range(10)], geometry="S2")
+            self.assertEqual(store.ids(createdAfter=95), ["o4", "o3", "o2", "o1", "o0"])
+            self.assertEqual(store.ids(geometry="S2", limit=3, createdAfter=0), ["o9", "o8", "o7"])
+            store.put(ObservationReference.fromDict({"id": "o0", "creationTime": 1}))
+            self.assertEqual(len(store), 10)
+            self.assertIsNone(store.get("o0").dataSummary)
+            self.assertIsNone(store.get("missing"))
+
+
+class TestContextIndex(BaseExecutionTestClass, unittest.TestCase):
+
+    def context(self, id: str, west: float, south: float, east: float, north: float, year: int = 2010,
+                resolution: str = "1 km") -> ObservationReference:
+        builder = GeometryBuilder()
+        return ObservationReference.fromDict({"id": id, "observable": "earth:Region", "scaleReference": {
+            "west": west, "south": south, "east": east, "north": north, "spaceResolutionDescription": resolution,
+            "start": int(builder.startOfYear(year)), "end": int(builder.startOfYear(year + 1))}})
+
+    def test_rtree(self):
+        tree = PythonRTree(maxEntries=4, minEntries=2)
+        boxes = [Extent(x, y, x + 3, y + 3).bounds for x in range(10) for y in range(10)]
+        for i, bounds in enumerate(boxes):
+            tree.insert(bounds, i)
+        query = Extent(5.5, 5.5, 6.5, 6.5).bounds
+        expected = sorted(i for i, bounds in enumerate(boxes) if Extent(*bounds[:2], *bounds[3:5]).covers(
+            Extent(5.5, 5.5, 6.5, 6.5)))
+        self.assertEqual(sorted(tree.covering(query)), expected)
+        for i in expected[:4]:
+            self.assertTrue(tree.remove(boxes[i], i))
+        self.assertEqual(sorted(tree.covering(query)), expected[4:])
+        self.assertEqual(len(tree), len(boxes) - 4)
+
+    def test_covering_contexts(self):
+        index = ContextIndex(backend="python")
+        index.addAll([self.context("wide", 30, -12, 40, -5), self.context("tight", 33, -10, 36, -7),
+                      self.context("coarse", 33, -10, 36, -7, resolution="5 km"),
+                      self.context("other year", 33, -10, 36, -7, year=2011),
+                      ObservationReference.fromDict({"id": "no scale"})])
+        self.assertEqual(len(index), 4)
+
+        geometry = GeometryBuilder().grid(33.5, 35.5, -9.5, -7.5, resolution="1000 m").years(2010).build()
+        self.assertEqual([cached.id for cached in index.covering(geometry)], ["tight", "wide"])
+        builder = GeometryBuilder()
+        year = (int(builder.startOfYear(2010)), int(builder.startOfYear(2011)))
+        self.assertEqual([cached.id for cached in index.covering(Extent(31, -11, 32, -10, *year), "1 km")], ["wide"])
+        self.assertEqual([cached.id for cached in index.covering(Extent(33.5, -9.5, 35.5, -7.5, *year), "5 km")],
+                         ["coarse"])
+
+        # the period and the resolution must be the same, not only contained or unspecified
+        twoYears = (year[0], int(builder.startOfYear(2012)))
+        self.assertEqual(index.covering(Extent(33.5, -9.5, 35.5, -7.5, *twoYears), "1 km"), [])
+        self.assertEqual(index.covering(Extent(33.5, -9.5, 35.5, -7.5, year[0] + 1, year[1] - 1), "1 km"), [])
+        self.assertEqual(index.covering(Extent(33.5, -9.5, 35.5, -7.5), "1 km"), [])
+        self.assertEqual(index.covering(Extent(33.5, -9.5, 35.5, -7.5, *year)), [])
+        self.assertFalse(Extent(0, 0, 10, 10, 0, 100).covers(Extent(1, 1, 2, 2, 10, 20)))
+        self.assertFalse(Extent(0, 0, 10, 10, 0, 100).covers(Extent(1, 1, 2, 2)))
+        self.assertTrue(Extent(0, 0, 10, 10, 0, 100).covers(Extent(1, 1, 2, 2, 0, 100)))
+
+        self.assertIsNone(index.findExport(geometry, "geography:Elevation"))
+        index.addExport("wide", "geography:Elevation", "wide.tif")
+        self.assertEqual(index.findExport(geometry, "geography:Elevation")[1], "wide.tif")
+        index.remove("wide")
+        self.assertIsNone(index.findExport(geometry, "geography:Elevation"))
+
+    @unittest.skipUnless(importlib.util.find_spec("rasterio"), "cropping needs rasterio")
+    def test_crop_export(self):
+        import numpy
+        import rasterio
+        from rasterio.transform import from_origin
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "elevation.tif")
+            with rasterio.open(path, "w", driver="GTiff", width=10, height=10, count=1, dtype="float32",
+                               crs="EPSG:4326", transform=from_origin(30, -5, 1, 1)) as raster:
+                raster.write(numpy.arange(100, dtype="float32").reshape(1, 10, 10))
+
+            index = ContextIndex()
+            index.add(self.context("wide", 30, -15, 40, -5))
+            index.addExport("wide", "geography:Elevation", path)
+            geometry = GeometryBuilder().grid(32.5, 35, -9, -7, resolution="1 km").years(2010).build()
+            output = index.cropExport(geometry, "geography:Elevation", os.path.join(directory, "crop.tif"))
+            with rasterio.open(output) as cropped:
+                self.assertEqual((cropped.width, cropped.height), (3, 2))
+                self.assertEqual(cropped.bounds, (32, -9, 35, -7))
+                self.assertEqual(cropped.read(1)[0].tolist(), [22, 23, 24])
+            self.assertIsNone(index.cropExport(Extent(20, -9, 22, -7), "geography:Elevation", output))
+
+
+if __name__ == "__main__":
+    unittest.main()
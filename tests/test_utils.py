@@ -1,6 +1,20 @@
 import unittest
 
-from klab.utils import ExportFormat, Export
+from klab.engine import Engine
+from klab.codec import availableCodecs
+from klab.exceptions import KlabIllegalArgumentException, KlabIllegalStateException
+from klab.geometry import BulkGeometryBuilder, GeometryBuilder, GeometryTemplate, KlabGeometry, KlabSpace, KlabTime
+from klab.observable import Observable, Range
+from klab.observation import ContextRequest, ObservationRequest
+from klab.references import DataSummary, ObservationReference
+from klab.shapes import Shape
+from klab.ticket import TicketStatus
+from klab.types import DimensionType, GeometryType, Granularity, KimConceptType, ObservationType, ShapeType, TimeResolutionType, ValueType
+from klab.utils import ExportFormat, Export, EndPoint, NumberUtils, P_EXPORT, P_OBSERVATION, P_TICKET
+import datetime
+import importlib.util
+import json
+import math
 
 # run with python3 -m unittest discover tests/
 
@@ -12,4 +26,428 @@ class TestUtilsAndMinors(unittest.TestCase):
        self.assertTrue(ExportFormat.PNG_IMAGE.isExportAllowed(Export.LEGEND))
        self.assertFalse(ExportFormat.PNG_IMAGE.isExportAllowed(Export.STRUCTURE))
        self.assertFalse(ExportFormat.PNG_IMAGE.isText())
-       self.assertTrue(ExportFormat.JSON_CODE.isText())
\ No newline at end of file
+       self.assertTrue(ExportFormat.JSON_CODE.isText())
+
+    def test_number_arrays(self):
+        self.assertEqual(NumberUtils.podArrayFromString("[1 2 3]", r"\s+", None), [1, 2, 3])
+        self.assertEqual(NumberUtils.podArrayFromString("[-7.25 -4.4 38.39 40.02]", r"\s+", None), [-7.25, -4.4, 38.39, 40.02])
+        # ints among floats make a float array, while the object array keeps each as read
+        self.assertEqual(NumberUtils.podArrayFromString("[1 2.5]", r"\s+", None), [1.0, 2.5])
+        self.assertEqual(NumberUtils.objectArrayFromString("[1 2.5 x]", r"\s+", None), [1, 2.5, True])
+        self.assertEqual(NumberUtils.podArrayFromString("[]", r"\s+", None), [])
+
+        transitions = NumberUtils.typedArrayFromString("[1640995200000 1672531200000 1704067200000]")
+        self.assertEqual((transitions.typecode, list(transitions)), ("q", [1640995200000, 1672531200000, 1704067200000]))
+        self.assertEqual(NumberUtils.typedArrayFromString("[1 2.5]").typecode, "d")
+        with self.assertRaises(KlabIllegalArgumentException):
+            NumberUtils.typedArrayFromString("[1 x]")
+
+    def test_observables_and_ranges(self):
+        named = Observable.create("geography:Elevation").unit("m").named("elevation")
+        self.assertIs(named, Observable("geography:Elevation", name="elevation", unit="m"))
+        self.assertEqual(str(named), "geography:Elevation in m named elevation")
+        self.assertEqual(len({named, Observable.create("geography:Elevation"), Observable.create("geography:Elevation")}), 2)
+        with self.assertRaises(KlabIllegalStateException):
+            named.named("other")
+        with self.assertRaises(KlabIllegalStateException):
+            named._name = "other"
+
+        ranged = Observable.create("geography:Elevation").range(Range(0, 1000))
+        self.assertEqual(str(ranged), "geography:Elevation 0 to 1000")
+        self.assertIsNot(ranged, Observable.create("geography:Elevation").range(Range(0, 1000, upperExclusive=True)))
+        self.assertEqual({Range(0, 10): 1}[Range(0, 10)], 1)
+        self.assertFalse(Range(lower=0).lowerInfinite)
+
+        closed, exclusive = Range(0, 10), Range(0, 10, True, True)
+        self.assertTrue(closed.contains(exclusive) and exclusive.contains(exclusive) and closed.contains(10))
+        self.assertFalse(exclusive.contains(closed) or exclusive.contains(0) or closed.contains(Range(upper=5)))
+        if importlib.util.find_spec("numpy"):
+            self.assertEqual(closed.contains([-1, 0, 5, 10, 11]).tolist(), [False, True, True, True, False])
+            import numpy
+            self.assertIs(closed.contains(numpy.int64(10)), True)
+            self.assertIs(exclusive.contains(numpy.float32(0)), False)
+            self.assertIs(closed.contains(numpy.array(5.0)), True)
+            self.assertEqual(closed.contains([[0, 10], [1, 11]]).tolist(), [True, False])
+            self.assertEqual(exclusive.contains([Range(0, 5, True), Range(0, 5), Range(1, 10, False, True)]).tolist(),
+                             [True, False, True])
+
+class TestRequestSerialization(unittest.TestCase):
+
+    def test_context_request(self):
+        request = ContextRequest()
+        request.contextType = "earth:Region"
+        request.geometry = 'S2{shape=EPSG:4326 POLYGON((33.7 -7.0, 35.9 -7.0, 33.7 -7.0))}'
+        request.observables = ["geography:Elevation"]
+        request.scenarios = ['im.scenarios:"Quoted"', "im.scenarios:Sécheresse"]
+        for codec in availableCodecs().values():
+            decoded = json.loads(codec.dumpb(request.toDict()))
+            self.assertEqual(decoded, request.toDict())
+            self.assertIsNone(decoded["urn"])
+        self.assertEqual(json.loads(request.toJson())["scenarios"][1], "im.scenarios:Sécheresse")
+
+    def test_observation_request(self):
+        request = ObservationRequest("geography:Elevation", "c1")
+        request.states["geography:Slope"] = "12.5"
+        request.scenarios.append("im.scenarios:Drought")
+        decoded = json.loads(request.toJson())
+        self.assertEqual(decoded["states"], {"geography:Slope": "12.5"})
+        self.assertEqual(decoded["objects"], {})
+        self.assertFalse(decoded["estimate"])
+        self.assertNotIn("contextSearchId", decoded)
+
+
+class TestResponseDecoding(unittest.TestCase):
+
+    class Response():
+
+        def __init__(self, content: bytes) -> None:
+            self.content = content
+
+        def raise_for_status(self):
+            pass
+
+    class Session():
+
+        def __init__(self, content: bytes) -> None:
+            self.content = content
+
+        def get(self, url, headers=None):
+            return TestResponseDecoding.Response(self.content)
+
+    def test_codecs_and_statistics(self):
+        ticket = {"id": "t1", "status": "OPEN", "data": {"label": "Sécheresse"}}
+        for name in availableCodecs():
+            engine = Engine("http://stub/modeler", codec=name)
+            engine.session = TestResponseDecoding.Session(json.dumps(ticket).encode("utf-8"))
+            self.assertEqual(engine.get(EndPoint.TICKET_INFO.value.replace(P_TICKET, "t1")), ticket)
+            engine.get(EndPoint.TICKET_INFO.value.replace(P_TICKET, "t2"))
+            engine.get(EndPoint.EXPORT_DATA.value.replace(P_EXPORT, "structure").replace(P_OBSERVATION, "o1"))
+
+            stats = engine.decodeStatistics()
+            self.assertEqual(stats["TICKET_INFO"].count, 2)
+            self.assertEqual(stats["EXPORT_DATA:structure"].count, 1)
+            self.assertGreater(stats["TICKET_INFO"].bytes, 0)
+
+        with self.assertRaises(KlabIllegalArgumentException):
+            Engine("http://stub/modeler", codec="ujson")
+
+
+class TestReferences(unittest.TestCase):
+
+    def test_lazy_decoding(self):
+        data = {"id": "o1", "observationType": "STATE", "valueType": "NUMBER", "semantics": ["QUALITY"],
+                "dataSummary": {"minValue": 1.0, "maxValue": 5.0, "mean": 2.5},
+                "exportFormats": [{"label": "GeoTIFF", "value": "tiff", "extension": "tif"}]}
+        reference = ObservationReference.fromDict(data)
+        self.assertFalse(hasattr(reference, "__dict__"))
+        self.assertEqual(reference.id, "o1")
+        self.assertEqual(reference.contextTime, None)
+        self.assertEqual(reference._pending["dataSummary"], data["dataSummary"])
+
+        self.assertEqual(reference.dataSummary.mean, 2.5)
+        self.assertNotIn("dataSummary", reference._pending)
+        self.assertEqual(reference.observationType, ObservationType.STATE)
+        self.assertEqual(reference.semantics, {KimConceptType.QUALITY})
+        self.assertEqual(reference.exportFormats[0].extension, "tif")
+        self.assertIsNone(reference.scaleReference)
+
+        reference.valueType = ValueType.BOOLEAN
+        encoded = reference.toDict()
+        self.assertEqual(encoded["valueType"], "BOOLEAN")
+        self.assertEqual(encoded["dataSummary"]["maxValue"], 5.0)
+        self.assertEqual(encoded["semantics"], ["QUALITY"])
+        self.assertEqual(ObservationReference.fromDict(encoded).dataSummary.minValue, 1.0)
+
+    def test_new_references(self):
+        reference = ObservationReference()
+        self.assertEqual(reference.shapeType, ShapeType.EMPTY)
+        self.assertEqual(reference.semantics, set())
+        self.assertEqual(reference.contextTime, -1)
+        reference.traits.append("t")
+        self.assertEqual(ObservationReference().traits, [])
+        self.assertTrue(math.isnan(DataSummary().mean))
+
+
+class TestEnumLookup(unittest.TestCase):
+
+    def test_lookup(self):
+        self.assertIs(KimConceptType.fromValue("quality"), KimConceptType.QUALITY)
+        self.assertIs(GeometryType.fromValue("Table"), GeometryType.TABLE)
+        self.assertIs(GeometryType.fromValue("GROUP"), GeometryType.GROUP)
+        self.assertIs(TimeResolutionType.fromValue(0), TimeResolutionType.MILLENNIUM)
+        self.assertIs(TicketStatus.fromValue("resolved"), TicketStatus.RESOLVED)
+        self.assertIsNone(ValueType.fromValue(None))
+        with self.assertRaises(KlabIllegalArgumentException):
+            ObservationType.fromValue("NOT_A_TYPE")
+
+    def test_interned_sets(self):
+        first = KimConceptType.fromListToSet(["QUALITY", "observable"])
+        self.assertEqual(first, {KimConceptType.QUALITY, KimConceptType.OBSERVABLE})
+        self.assertIs(first, KimConceptType.fromListToSet(["QUALITY", "observable"]))
+        self.assertIsInstance(first, frozenset)
+
+
+class TestGeometryParsing(unittest.TestCase):
+
+    wkbShape = "00000000030000000100000007C01D06C14FE6DEF24043B5F39D8BB550C0160A7B8B2DC6224044036D7B41B470C011A2AFE79D99"
+
+    def test_parse(self):
+        spec = "\u03c41(1){period=[1640995200000 1672531200000],tscope=1.0,ttype=LOGICAL,tunit=YEAR}" \
+               f"S2(520,297){{bbox=[-7.25 -4.4 38.39 40.02],proj=EPSG:4326,shape={self.wkbShape}}}"
+        geometry = KlabGeometry.create(spec)
+        time, space = geometry.dimensions
+        self.assertEqual((time.getType(), time.isGeneric(), time.isRegular()), (DimensionType.TIME, True, False))
+        self.assertEqual(time.getParameters()["period"], [1640995200000, 1672531200000])
+        self.assertEqual(time.getParameters()["tscope"], 1.0)
+        self.assertEqual(space.shape, [520, 297])
+        self.assertEqual(space.getParameters()["shape"], self.wkbShape)
+        self.assertEqual(space.getParameters()["proj"], "EPSG:4326")
+        self.assertEqual(geometry.encode(), spec)
+
+        multiple = KlabGeometry.create("#S2{a=1},T1(\u221e){b=x&comma;y}")
+        self.assertEqual(multiple.granularity, Granularity.MULTIPLE)
+        self.assertEqual(multiple.dimensions[0].getParameters(), {"a": 1})
+        self.assertEqual(multiple.child.dimensions[0].getParameters(), {"b": "x,y"})
+        with self.assertRaises(KlabIllegalArgumentException):
+            KlabGeometry.create("S2Q1")
+
+    def test_parameters(self):
+        # unescaped WKT commas stay in the value, tokens without a key are rejected
+        wkt = "EPSG:4326 POLYGON((0 0,1 0, 1 1,0 0))"
+        self.assertEqual(KlabGeometry.readParameters(f"shape={wkt},proj=EPSG:4326"),
+                         {"shape": wkt, "proj": "EPSG:4326"})
+        for kvs in ("a=1,b,c=2", "a=1,b", "b,a=1", "a=1,,c=2", "a=1,"):
+            with self.assertRaises(KlabIllegalArgumentException):
+                KlabGeometry.readParameters(kvs)
+
+    def test_round_trip_and_cache(self):
+        built = GeometryBuilder().grid(urn="EPSG:4326 POLYGON((33.7 -7.0, 35.9 -7.0, 33.7 -7.0))",
+                                       resolution="1 km").years(2010).build()
+        spec = built.encode()
+        parsed = KlabGeometry.create(spec)
+        self.assertEqual(parsed.encode(), spec)
+        self.assertEqual(parsed.dimensions[1].getParameters()["shape"],
+                         "EPSG:4326 POLYGON((33.7 -7.0, 35.9 -7.0, 33.7 -7.0))")
+
+        # cached geometries are copied, so changing one does not leak into the next
+        parsed.dimensions[1].getParameters()["sgrid"] = "5 km"
+        self.assertEqual(KlabGeometry.create(spec).dimensions[1].getParameters()["sgrid"], "1 km")
+
+    def test_encoding_cache_and_equality(self):
+        def build(resolution: str = "1 km"):
+            return GeometryBuilder().grid(urn="EPSG:4326 POLYGON((33.7 -7.0, 35.9 -7.0, 33.7 -7.0))",
+                                          resolution=resolution).years(2010).build()
+
+        geometry = build()
+        encoded = geometry.encode()
+        self.assertIs(geometry.encode(), encoded)
+        self.assertEqual(geometry, build())
+        self.assertEqual(len({geometry: 1, build(): 2}), 1)
+        self.assertEqual(len(geometry.digest()), 32)
+
+        # any change to a dimension or to the dimensions is seen by the next encode()
+        geometry.dimensions[0].getParameters()["sgrid"] = "5 km"
+        self.assertEqual(geometry.encode(), build("5 km").encode())
+        self.assertEqual(geometry, build("5 km"))
+        self.assertNotEqual(geometry.digest(), build().digest())
+        geometry.dimensions[0].regular = False
+        self.assertTrue(geometry.encode().startswith("t1(1)"))
+        self.assertIn("}s2{", geometry.encode())
+        geometry.dimensions.pop()
+        self.assertEqual(geometry.encode(), "s2{sgrid=5 km,shape=EPSG:4326 POLYGON((33.7 -7.0, 35.9 -7.0, 33.7 -7.0))}")
+        self.assertEqual(KlabGeometry().encode(), "X")
+
+    def test_bulk_builder(self):
+        x1, y1 = [33.5, 34.25, 35.0], [-7.5, -8.125, -9.0]
+        x2, y2 = [x + 0.5 for x in x1], [y + 0.5 for y in y1]
+        builder = BulkGeometryBuilder(resolution="1 km").years(2010, 2012)
+        self.assertEqual(builder.boxes(x1, x2, y1, y2),
+                         [GeometryBuilder().grid(*box, resolution="1 km").years(2010, 2012).build().encode()
+                          for box in zip(x1, x2, y1, y2)])
+        self.assertEqual(builder.points(x1, y1),
+                         [GeometryBuilder().region(f"EPSG:4326 POINT({x} {y})").years(2010, 2012).build().encode()
+                          for x, y in zip(x1, y1)])
+        self.assertEqual(KlabGeometry.create(builder.boxes(x1, x2, y1, y2)[1]).dimensions[1].getParameters()["bbox"],
+                         [34.25, 34.75, -8.125, -7.625])
+        if importlib.util.find_spec("numpy"):
+            import numpy
+            self.assertEqual(builder.boxes(numpy.array(x1), numpy.array(x2), numpy.array(y1), numpy.array(y2)),
+                             builder.boxes(x1, x2, y1, y2))
+        with self.assertRaises(KlabIllegalArgumentException):
+            builder.boxes(x1, x2, y1, y2[:2])
+        with self.assertRaises(KlabIllegalArgumentException):
+            BulkGeometryBuilder().boxes(x1, x2, y1, y2)
+
+    def test_template(self):
+        template = GeometryTemplate("\u03c40(1){ttype=LOGICAL,period=[{TIME_PERIOD}],tscope=1.0,tunit=YEAR}"
+                                    "S2({GRID_RESOLUTION_XY}){bbox=[{BOUNDING_BOX}],shape={WKB_SHAPE},proj=EPSG:4326}")
+        self.assertEqual(template.slots, {"TIME_PERIOD", "GRID_RESOLUTION_XY", "BOUNDING_BOX", "WKB_SHAPE"})
+        filled = template.fill(TIME_PERIOD=[1640995200000, 1672531200000], GRID_RESOLUTION_XY="520,297",
+                               BOUNDING_BOX="-7.25 -4.4 38.39 40.02", WKB_SHAPE=self.wkbShape)
+        spec = ("\u03c40(1){ttype=LOGICAL,period=[1640995200000 1672531200000],tscope=1.0,tunit=YEAR}"
+                f"S2(520,297){{bbox=[-7.25 -4.4 38.39 40.02],shape={self.wkbShape},proj=EPSG:4326}}")
+        self.assertEqual(filled.encode(), spec)
+        self.assertEqual(filled.geometry, KlabGeometry.create(spec))
+        self.assertEqual(filled.geometry.dimensions[1].shape, [520, 297])
+        self.assertIs(filled.geometry, filled.geometry)
+
+        # values with commas and escapes read as the parser reads them
+        shapes = GeometryTemplate("S2{shape={SHAPE},sgrid=1 km}")
+        wkt = "EPSG:4326 POLYGON((33.7 -7.0, 35.9 -7.0, 33.7 -7.0))"
+        for value in (wkt, KlabGeometry.encodeForSerialization(wkt)):
+            self.assertEqual(shapes.fill(SHAPE=value).geometry.dimensions[0].getParameters()["shape"], wkt)
+
+        with self.assertRaises(KlabIllegalArgumentException):
+            template.fill(TIME_PERIOD="0 1")
+        with self.assertRaises(KlabIllegalArgumentException):
+            GeometryTemplate("S{N}")
+
+    def test_time_boundaries(self):
+        def millis(*date):
+            return int(datetime.datetime(*date, tzinfo=datetime.timezone.utc).timestamp() * 1000)
+
+        for date in ((1970, 1, 1), (2000, 2, 29), (2024, 12, 31), (1900, 3, 1), (1, 1, 1), (9999, 12, 31)):
+            self.assertEqual(KlabTime.startOfDay(*date), millis(*date))
+        self.assertEqual(GeometryBuilder().startOfYear(2010), 1262304000000.0)
+        self.assertEqual(KlabTime.boundaries(TimeResolutionType.MONTH, 3, year=2019, month=11),
+                         [millis(2019, 11, 1), millis(2019, 12, 1), millis(2020, 1, 1), millis(2020, 2, 1)])
+        self.assertEqual(KlabTime.boundaries(TimeResolutionType.DECADE, 2, year=2000),
+                         [millis(2000, 1, 1), millis(2010, 1, 1), millis(2020, 1, 1)])
+        self.assertEqual(KlabTime.boundaries(TimeResolutionType.DAY, 2, 7, 2020, 2, 28),
+                         [millis(2020, 2, 28), millis(2020, 3, 6), millis(2020, 3, 13)])
+        # days past the end of shorter months stop at their last day
+        self.assertEqual(KlabTime.boundaries(TimeResolutionType.MONTH, 3, year=2020, month=1, day=31),
+                         [millis(2020, 1, 31), millis(2020, 2, 29), millis(2020, 3, 31), millis(2020, 4, 30)])
+        self.assertEqual(KlabTime.stepStart(TimeResolutionType.MONTH, 1, 2021, 1, 31), millis(2021, 2, 28))
+        self.assertEqual(KlabTime.stepStart(TimeResolutionType.YEAR, 1, 2020, 2, 29), millis(2021, 2, 28))
+
+        builder = GeometryBuilder()
+        builder.time().steps(TimeResolutionType.MONTH, 12, year=2020)
+        time = KlabGeometry.create(builder.build().encode()).dimensions[0]
+        self.assertEqual(time.shape, [12])
+        self.assertEqual(time.getParameters()["transitions"], KlabTime.boundaries(TimeResolutionType.MONTH, 12, year=2020))
+        self.assertEqual((time.getParameters()["tstart"], time.getParameters()["tend"]), (millis(2020, 1, 1), millis(2021, 1, 1)))
+        # the same types as years() writes
+        years = KlabGeometry.create(GeometryBuilder().years(2020, 2021).build().encode()).dimensions[0]
+        for key in ("tstart", "tend"):
+            self.assertIs(type(time.getParameters()[key]), type(years.getParameters()[key]))
+
+        if importlib.util.find_spec("numpy"):
+            periods = KlabTime.periods(TimeResolutionType.YEAR, 3, year=2010)
+            self.assertEqual(periods.tolist(), [[millis(y, 1, 1), millis(y + 1, 1, 1)] for y in (2010, 2011, 2012)])
+
+    @unittest.skipUnless(importlib.util.find_spec("numpy"), "cell coordinates need numpy")
+    def test_grid_cells(self):
+        import numpy
+        space = KlabGeometry.create("S2(520,297){bbox=[-7.25 -4.4 38.39 40.02],proj=EPSG:4326}").dimensions[0]
+        self.assertEqual(space.size(), 520 * 297)
+        # offsets start from the north-west corner, y indices from the south
+        self.assertEqual((space.getOffset(0, 296), space.getOffset(519, 0)), (0, space.size() - 1))
+        self.assertEqual(space.getCell(space.getOffset(3, 5)), (3, 5))
+
+        offsets = numpy.arange(space.size())
+        x, y = space.getCell(offsets)
+        self.assertTrue((space.getOffset(x, y) == offsets).all())
+        centers = space.getCellCenter(x, y)
+        self.assertTrue((space.getOffsetAt(*centers) == offsets).all())
+        self.assertAlmostEqual(float(centers[0][0]), -7.25 + space.getCellSize()[0] / 2)
+
+        # edges are inside, anything past them is not
+        self.assertEqual(space.getOffsetAt([-7.25, -4.4, -8.0, -4.3], [40.02, 38.39, 39.0, 39.0]).tolist(),
+                         [0, space.size() - 1, -1, -1])
+        # NaN coordinates, fractional indices and indices past the grid are errors, not cells
+        for bad in (lambda: space.getOffsetAt([numpy.nan], [39.0]), lambda: space.getOffset(520, 0),
+                    lambda: space.getOffset(numpy.array([0, -1]), numpy.array([0, 0])),
+                    lambda: space.getOffset(0.5, 0), lambda: space.getOffset(numpy.array([0.5]), numpy.array([0])),
+                    lambda: space.getCell(space.size())):
+            with self.assertRaises(KlabIllegalArgumentException):
+                bad()
+
+        # client-built grids take their shape from the bounding box and the resolution
+        built = GeometryBuilder().grid(33.0, 34.0, -8.0, -7.5, resolution="1 km").build().dimensions[0]
+        self.assertEqual(built.gridShape(), (111, 56))
+        self.assertEqual(built.getOffsetAt([33.0, 34.0], [-7.5, -8.0]).tolist(), [0, 111 * 56 - 1])
+        projected = KlabGeometry.create("S2{bbox=[0 1000 0 500],sgrid=100 m,proj=EPSG:32737}").dimensions[0]
+        self.assertEqual(projected.gridShape(), (10, 5))
+        with self.assertRaises(KlabIllegalStateException):
+            GeometryBuilder().grid(33.0, 34.0, -8.0, -7.5).build().dimensions[0].getCellSize()
+
+
+@unittest.skipUnless(importlib.util.find_spec("numpy"), "shapes need numpy")
+class TestShapes(unittest.TestCase):
+    wkbShape = "00000000030000000100000007C01D06C14FE6DEF24043B5F39D8BB550C0160A7B8B2DC6224044036D7B41B470C011A2AFE79D99FB4043B5C0443B5A7CC014D2EFCFADC624404355FA189A597CC0199C599EE6C5B8404332D7E635CC84C01C3D49F12A6BC440437995016B4E6CC01D06C14FE6DEF24043B5F39D8BB550"
+
+    def test_wkb_round_trip(self):
+        shape = Shape.parse(self.wkbShape)
+        self.assertEqual((shape.type, len(shape), shape.ringCount()), ("POLYGON", 7, 1))
+        self.assertEqual(shape.toWkb(), self.wkbShape)
+        self.assertEqual(Shape.fromWkb(shape.toWkb(hex=False, bigEndian=False)), shape)
+        self.assertEqual(Shape.parse(shape.toWkt()), shape)
+        self.assertEqual(shape.digest(), Shape.parse(shape.toWkt()).digest())
+        minX, maxX, minY, maxY = shape.bounds()
+        self.assertAlmostEqual(minX, -7.2566, places=4)
+        self.assertTrue(minX < maxX and minY < maxY)
+
+        # PostGIS extended WKB carries the projection
+        point = Shape.parse("0101000020E6100000000000000000F03F0000000000000040")
+        self.assertEqual((point.projection, point.coordinates.tolist()), ("EPSG:4326", [[1.0, 2.0]]))
+
+    def test_wkt(self):
+        shape = Shape.parse("EPSG:4326 MULTIPOLYGON(((0 0, 1 0, 1 1, 0 0)), ((2 2, 3 2, 3 3, 2 2), "
+                            "(2.1 2.1, 2.2 2.1, 2.2 2.2, 2.1 2.1)))")
+        self.assertEqual(shape.projection, "EPSG:4326")
+        self.assertEqual((shape.rings.tolist(), shape.parts.tolist()), ([0, 4, 8, 12], [0, 1, 3]))
+        self.assertEqual(shape.bounds(), (0.0, 3.0, 0.0, 3.0))
+        self.assertEqual(Shape.parse(shape.toWkt()), shape)
+        self.assertEqual(Shape.parse(shape.toWkb()), shape)
+        self.assertTrue(shape.toWkt().startswith("EPSG:4326 MULTIPOLYGON(((0.0 0.0, 1.0 0.0"))
+
+        self.assertEqual(Shape.parse("MULTIPOINT(0 0, 1 1)"), Shape.parse("MULTIPOINT((0 0), (1 1))"))
+        self.assertEqual(Shape.parse("POINT Z (1 2 3)").toWkt(), "POINT Z(1.0 2.0 3.0)")
+        self.assertEqual(Shape.parse("LINESTRING EMPTY").toWkt(), "LINESTRING EMPTY")
+        with self.assertRaises(KlabIllegalArgumentException):
+            Shape.parse("POLYGON((0 0, 1 0, 1 1)")
+
+    def test_empty_and_measured(self):
+        for wkt in ("POINT EMPTY", "LINESTRING EMPTY", "POLYGON EMPTY", "MULTIPOLYGON EMPTY", "POLYGON Z EMPTY"):
+            shape = Shape.parse(wkt)
+            self.assertEqual(Shape.parse(shape.toWkb()), shape)
+            self.assertEqual(Shape.parse(shape.toWkb()).toWkt(), wkt)
+
+        # M is written as M, not as Z, in WKT, ISO WKB and PostGIS extended WKB
+        point = Shape.parse("POINT M (1 2 3)")
+        self.assertEqual(point.toWkt(), "POINT M(1.0 2.0 3.0)")
+        self.assertEqual(point.toWkb()[:10], "00000007D1")
+        self.assertEqual(Shape.parse(point.toWkb()), point)
+        self.assertNotEqual(point, Shape.parse("POINT Z (1 2 3)"))
+        self.assertEqual(Shape.parse("0101000040000000000000F03F00000000000000400000000000000840"), point)
+        line = Shape.parse("LINESTRING ZM (0 0 1 2, 1 1 3 4)")
+        self.assertEqual(line.toWkb()[:10], "0000000BBA")
+        self.assertEqual(Shape.parse(line.toWkt()), line)
+        with self.assertRaises(KlabIllegalArgumentException):
+            Shape.parse("POINT ZM (1 2 3)")
+
+    def test_simplify(self):
+        line = Shape.parse("LINESTRING(0 0, 1 0.1, 2 -0.1, 3 5, 4 6, 5 7, 6 8.1, 7 9)")
+        self.assertEqual(line.simplify(0.5).toWkt(), "LINESTRING(0.0 0.0, 2.0 -0.1, 3.0 5.0, 7.0 9.0)")
+        self.assertEqual(line.simplify(0), line)
+
+        # islands smaller than the tolerance go, the rest keeps its rings
+        shape = Shape.parse("MULTIPOLYGON(((0 0, 0.5 0.001, 1 0, 1 1, 0 1, 0 0)), ((5 5, 5.01 5, 5.01 5.01, 5 5)))")
+        simplified = shape.simplify(0.05)
+        self.assertEqual(simplified.toWkt(), "MULTIPOLYGON(((0.0 0.0, 1.0 0.0, 1.0 1.0, 0.0 1.0, 0.0 0.0)))")
+        self.assertEqual(simplified.parts.tolist(), [0, 1])
+
+    def test_builder_simplify(self):
+        points = [f"{34 + math.cos(a / 1000):.6f} {-8 + math.sin(a / 1000) + 0.0001 * (a % 2):.6f}"
+                  for a in range(6283)]
+        wkt = f"EPSG:4326 POLYGON(({', '.join(points + points[:1])}))"
+        geometry = GeometryBuilder().grid(urn=wkt, resolution="1 km").years(2010).simplify().build()
+        shape = Shape.parse(geometry.dimensions[0].getParameters()["shape"].replace("&comma;", ","))
+        self.assertLess(len(shape), 300)
+        self.assertEqual(shape.projection, "EPSG:4326")
+        for original, simplified in zip(KlabSpace.wktBounds(wkt), shape.bounds()):
+            self.assertAlmostEqual(original, simplified, places=2)
+        self.assertEqual(KlabSpace.simplifyShape(self.wkbShape, tolerance=0.0), self.wkbShape)
+        with self.assertRaises(KlabIllegalArgumentException):
+            GeometryBuilder().region(wkt).simplify().build()